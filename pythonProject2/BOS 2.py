@@ -1,43 +1,80 @@
 import cv2 as cv
 import numpy as np
 import time
-
-def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5):
+from BOS_AutoGain import AutoGain
+from BOS_Pacing import FrameScheduler
+from BOS_Startup import StartupTimer, wait_for_camera
+from BOS_Static import StaticFrameGate, difference_energy
+from BOS_Trigger import TriggerRecorder
+
+def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5, fps=None, static_threshold=None,
+                  pretrigger_seconds=None, posttrigger_seconds=5.0, trigger_threshold=None, stride=1, auto_gain=False):
     """
     Synthetic Schlieren System using a webcam and OpenCV.
 
     Parameters:
         channel (int): Camera channel (0 for default camera).
         gain (int): Gain factor to amplify the intensity of the difference images.
-        delay (int): Delay in milliseconds between frames.
+        delay (int): Frame period in milliseconds, used when neither `fps` nor the source gives a frame rate.
         update_interval (int): Number of frames after which the reference frame updates.
         alpha (float): Blending factor for smoothing reference frame updates (0 to 1).
+        fps (float): Target frame rate (defaults to the source FPS). Processing and display are skipped
+            when the loop falls behind. Live sources are not delayed.
+        static_threshold (float): `BOS_Static.StaticFrameGate` threshold (None disables the gate).
+        pretrigger_seconds (float): If set, keep this many seconds of raw frames in memory and save them,
+            plus the following frames, whenever a recording is triggered (R key or `trigger_threshold`).
+        posttrigger_seconds (float): Seconds recorded after the last trigger.
+        trigger_threshold (float): Difference energy that triggers a recording automatically.
+        stride (int): Only process every `stride`-th frame. Skipped frames are advanced with `grab()` and never
+            retrieved, and the reference only sees the retained frames. The target FPS is divided accordingly.
+        auto_gain (bool): Choose the gain automatically so the 99.5th percentile of the smoothed difference maps to
+            full scale, from a subsampled histogram averaged over recent frames (`gain` is the starting value).
+            Pass a `BOS_AutoGain.AutoGain` to tune it.
     """
+    # Time the start-up until the first processed frame
+    startup = StartupTimer()
+
     # Open the camera
     webcam = cv.VideoCapture(0, cv.CAP_DSHOW)  # Use 0 for the default camera
 
-
-
     # Check if the camera is opened successfully
     if not webcam.isOpened():
         print(f"Error: Unable to open camera with channel {channel}.")
         return
     else:
         print("Camera initialized successfully.")
+    startup.mark("camera opened")
 
-    # Warm up the camera
-    print("Warming up the camera...")
-    time.sleep(1)
-
-    # Set camera properties
+    # Set camera properties (before the warm-up, as changing the resolution restarts the stream)
     webcam.set(cv.CAP_PROP_FRAME_WIDTH, 1080)
     webcam.set(cv.CAP_PROP_FRAME_HEIGHT, 720)
 
+    # Warm up the camera: wait until it delivers settled frames instead of sleeping a fixed time
+    print("Warming up the camera...")
+    wait_for_camera(webcam)
+    startup.mark("camera ready")
+
     # Initialize variables
     frame_count = 0
     reference_frame_bw = None  # Placeholder for the reference frame
     new_reference_frame_bw = None  # Placeholder for the new reference frame
 
+    # Pace the loop against a target frame period instead of a fixed delay
+    target_fps = fps or (webcam.get(cv.CAP_PROP_FPS) or 1000.0 / delay) / stride
+    scheduler = FrameScheduler(target_fps, live=True)
+
+    # Early-out for frames without flow
+    static_gate = StaticFrameGate(static_threshold)
+
+    # Automatic gain from the recent high percentile of the difference
+    auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+
+    # Pre-trigger ring buffer for event-triggered recording of raw frames
+    recorder = None
+    if pretrigger_seconds:
+        recorder = TriggerRecorder(target_fps, pretrigger_seconds, posttrigger_seconds, trigger_threshold,
+                                   prefix="schlieren_event")
+
     # Define the ROI dimensions
     lx, ly = 1920, 1080  # Width and height of the region of interest
 
@@ -53,11 +90,17 @@ def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5):
 
     # Start processing the video stream
     while True:
-        ret, frame = webcam.read()
+        # Grab the frames skipped by the stride without retrieving them, then retrieve the retained one
+        ret = all(webcam.grab() for _ in range(stride))
+        if ret:
+            ret, frame = webcam.retrieve()
         if not ret:
             print("Error: Unable to capture video.")
             break
 
+        # Skip processing and display (never capture) when behind schedule
+        process_frame = scheduler.should_process()
+
         # Convert the current frame to grayscale
         frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
 
@@ -73,39 +116,62 @@ def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5):
             else:
                 reference_frame_bw = cv.addWeighted(reference_frame_bw, 1 - alpha, new_reference_frame_bw, alpha, 0)
 
-        # Ensure the reference frame exists before computing the difference
-        if reference_frame_bw is not None:
-            # Compute the absolute difference
-            diff = cv.absdiff(frame_bw, reference_frame_bw)
+        # Keep the raw frame for event recording and check the energy trigger
+        if recorder is not None:
+            energy = None
+            if trigger_threshold is not None and reference_frame_bw is not None:
+                energy = difference_energy(frame_bw, reference_frame_bw)
+            recorder.update(frame, energy)
 
-            # Crop the ROI
-            diff_cropped = crop_image(diff, lx, ly)
-
-            # Smooth the difference image and amplify intensity
-            diff_smoothed = cv.medianBlur(diff_cropped, 5)
-            diff_amplified = cv.multiply(diff_smoothed, gain)
-
-            # Apply a color map for visualization
-            diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+        # Ensure the reference frame exists before computing the difference
+        if reference_frame_bw is not None and process_frame:
+            # Reuse the previous output and skip the expensive stages when the frame is static
+            diff_colored = static_gate.check(frame_bw, reference_frame_bw)
+            if diff_colored is None:
+                # Compute the absolute difference
+                diff = cv.absdiff(frame_bw, reference_frame_bw)
+
+                # Crop the ROI
+                diff_cropped = crop_image(diff, lx, ly)
+
+                # Smooth the difference image and amplify intensity
+                diff_smoothed = cv.medianBlur(diff_cropped, 5)
+                if auto_gain is not None:
+                    gain = auto_gain.update(diff_smoothed)
+                diff_amplified = cv.multiply(diff_smoothed, gain)
+
+                # Apply a color map for visualization
+                diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+                static_gate.store(diff_colored)
 
             # Display the processed image
             cv.imshow("Schlieren Effect", diff_colored)
+            startup.frame_processed()
 
         # Increment the frame counter
         frame_count += 1
 
         # Key handling
-        key = cv.waitKey(delay)
+        key = scheduler.wait_key()
         if key == 27:  # ESC key to exit
             break
         elif key == 13:  # Enter key to save the frame
             filename = f'schlieren_frame_{int(time.time())}.jpg'
             cv.imwrite(filename, diff_colored)
             print(f"Frame saved as {filename}")
+        elif key in (ord('r'), ord('R')) and recorder is not None:  # R key to trigger a recording
+            recorder.trigger()
+
+    print(scheduler.report())
+    if static_threshold is not None:
+        print(static_gate.report())
+    if recorder is not None:
+        recorder.close()
 
     # Release resources
     webcam.release()
     cv.destroyAllWindows()
 
-# Run the Schlieren System
-schlieren_cam(channel=0, gain=1, delay=10, update_interval=2, alpha=0.2)
+# Run the Schlieren System (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    schlieren_cam(channel=0, gain=1, delay=10, update_interval=2, alpha=0.2)
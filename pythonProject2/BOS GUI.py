@@ -1,29 +1,40 @@
 
 import sys
+import argparse
+import queue
 import cv2
 import numpy as np
 from PyQt5 import QtCore, QtGui, QtWidgets
+from BOS_AutoGain import AutoGain
+from BOS_SharedPipeline import LiveProcessor, ProcessPipeline, RingReader
+from BOS_Streams import FramePool, StreamStats
+from BOS_Startup import StartupTimer
 
 class VideoThread(QtCore.QThread):
     frameRaw = QtCore.pyqtSignal(np.ndarray)
     frameBOS = QtCore.pyqtSignal(np.ndarray)
     error    = QtCore.pyqtSignal(str)
 
-    def __init__(self, rtsp_url):
+    def __init__(self, rtsp_url, pool=None):
         super().__init__()
         self.rtsp_url = rtsp_url
-        self.running = False
+        self.pool     = pool
+        self.running  = False
+
+        # Optional MJPEG broadcaster fed with every processed frame
+        self.broadcaster       = None
+        self.broadcast_channel = "0"
 
-        # Processing parameters (defaults)
-        self.filter_name        = "Gaussian Blur"
-        self.param_value        = 5
-        self.bg_update_interval = 0
-        self.gain               = 1.0
-        self.colormap           = None
+        # Processing parameters and reference state (shared with the multi-process mode)
+        self.processor = LiveProcessor()
 
-        # Internal state
-        self._background_gray = None
-        self._frame_count     = 0
+    def set_parameter(self, name, value):
+        setattr(self.processor, name, value)
+
+    def automatic_gain(self):
+        """Current automatic gain, or None when the gain is fixed."""
+        auto_gain = self.processor.auto_gain
+        return auto_gain.gain if auto_gain is not None else None
 
     def run(self):
         self.running = True
@@ -36,8 +47,7 @@ class VideoThread(QtCore.QThread):
                     QtCore.QThread.msleep(1000)
                     continue
                 self.error.emit("")
-                self._background_gray = None
-                self._frame_count     = 0
+                self.processor.reset()
 
             ret, frame = cap.read()
             if not ret:
@@ -45,104 +55,168 @@ class VideoThread(QtCore.QThread):
                 cap = None
                 continue
 
-            frame_color = frame  # raw BGR frame
-            if self._background_gray is None:
-                self._background_gray = cv2.cvtColor(frame_color, cv2.COLOR_BGR2GRAY)
-                continue
-
-            gray = cv2.cvtColor(frame_color, cv2.COLOR_BGR2GRAY)
-            if self.bg_update_interval > 0:
-                self._frame_count += 1
-                if self._frame_count >= self.bg_update_interval:
-                    self._background_gray = gray.copy()
-                    self._frame_count     = 0
-
-            diff = cv2.absdiff(gray, self._background_gray)
-            bos  = diff
-
-            # Apply selected filter
-            p = self.param_value
-            try:
-                if self.filter_name == "Gaussian Blur":
-                    k = max(1, int(p)) | 1
-                    bos = cv2.GaussianBlur(diff, (k, k), 0)
-                elif self.filter_name == "Median Filter":
-                    k = max(1, int(p)) | 1
-                    bos = cv2.medianBlur(diff, k)
-                elif self.filter_name == "Bilateral Filter":
-                    sigma = max(1, int(p))
-                    bos = cv2.bilateralFilter(diff, 9, sigma, sigma)
-                elif self.filter_name == "Sobel Edges":
-                    k = max(1, int(p)) | 1
-                    k = min(k, 7)
-                    sx = cv2.Sobel(diff, cv2.CV_64F, 1, 0, ksize=k)
-                    sy = cv2.Sobel(diff, cv2.CV_64F, 0, 1, ksize=k)
-                    mag = np.hypot(sx, sy)
-                    bos = cv2.convertScaleAbs(mag)
-                elif self.filter_name == "Laplacian Edges":
-                    k = max(1, int(p)) | 1
-                    k = min(k, 7)
-                    lap = cv2.Laplacian(diff, cv2.CV_64F, ksize=k)
-                    bos = cv2.convertScaleAbs(lap)
-                elif self.filter_name == "Unsharp Masking":
-                    amount = float(p) / 50.0
-                    blur   = cv2.GaussianBlur(diff, (5, 5), 0)
-                    high   = diff.astype(np.float32) - blur.astype(np.float32)
-                    sharp  = diff.astype(np.float32) + amount * high
-                    bos    = np.clip(sharp, 0, 255).astype(np.uint8)
-                elif self.filter_name == "Ratio":
-                    eps        = 1e-6
-                    curr_f     = gray.astype(np.float32)
-                    bg_f       = self._background_gray.astype(np.float32)
-                    ratio_diff = np.abs(curr_f / (bg_f + eps) - 1.0)
-                    bos        = np.clip(ratio_diff * 255 * float(p), 0, 255).astype(np.uint8)
-            except:
-                bos = diff
-
-            # Apply gain
-            bos_f = bos.astype(np.float32) * self.gain
-            bos8  = np.clip(bos_f, 0, 255).astype(np.uint8)
-
-            # Apply colormap
-            if self.colormap is not None:
-                bos_color = cv2.applyColorMap(bos8, self.colormap)
+            # Hand the frame to the shared pool, or process it on this thread
+            if self.pool is not None:
+                self.pool.submit(self, frame)
             else:
-                bos_color = cv2.cvtColor(bos8, cv2.COLOR_GRAY2BGR)
-
-            # Emit frames
-            self.frameRaw.emit(frame_color)
-            self.frameBOS.emit(bos_color)
+                self.process(frame)
 
         if cap:
             cap.release()
 
+    def process(self, frame):
+        bos_color = self.processor.bos_frame(frame)
+        if bos_color is None:
+            return  # first frame after a (re)connect becomes the background
+
+        # Emit frames
+        self.frameRaw.emit(frame)
+        self.frameBOS.emit(bos_color)
+        if self.broadcaster is not None:
+            self.broadcaster.publish(bos_color, self.broadcast_channel)
+
     def stop(self):
         self.running = False
         self.wait(1000)
 
+class ProcessStream(QtCore.QObject):
+    """
+    Multi-process counterpart of VideoThread: capture and processing run in their own processes
+    (see BOS_SharedPipeline) and this object only shows the newest result, read in place from
+    the shared memory rings, from a timer on the GUI thread.
+    """
+    frameRaw = QtCore.pyqtSignal(np.ndarray)
+    frameBOS = QtCore.pyqtSignal(np.ndarray)
+    error    = QtCore.pyqtSignal(str)
+
+    def __init__(self, rtsp_url, pipeline):
+        super().__init__()
+        self.rtsp_url = rtsp_url
+        self.pipeline = pipeline
+        self.stats    = StreamStats()
+
+        # Optional MJPEG broadcaster fed with every processed frame
+        self.broadcaster       = None
+        self.broadcast_channel = "0"
+
+        self._parameters = {}
+        self._gain       = None
+        self._skipped    = 0  # results replaced by a newer one before they were shown
+        self._control    = None
+        self._events     = None
+        self._stop       = None
+        self._reader     = RingReader()
+        self._timer      = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.poll)
+
+    def set_parameter(self, name, value):
+        self._parameters[name] = value
+        if self._control is not None:
+            self._control.put((name, value))
+
+    def automatic_gain(self):
+        """Current automatic gain, or None when the gain is fixed."""
+        return self._gain if self._parameters.get("auto_gain") is not None else None
+
+    def start(self):
+        self._control, self._events, self._stop = self.pipeline.start(self.rtsp_url)
+        for item in self._parameters.items():
+            self._control.put(item)
+        self._timer.start(5)
+
+    def poll(self):
+        # Drain the events; only the newest frame is shown
+        latest = None
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "error":
+                self.error.emit(event[1])
+            else:
+                if latest is not None:
+                    self._skipped += 1
+                latest = event
+        if latest is None:
+            return
+
+        _, raw_descriptor, raw_slot, raw_seq, bos_descriptor, bos_slot, bos_seq, stats = latest
+        try:
+            raw_ring = self._reader.ring(raw_descriptor)
+            bos_ring = self._reader.ring(bos_descriptor)
+        except FileNotFoundError:
+            return  # the producer has already replaced this ring
+        self._reader.forget((raw_descriptor[0], bos_descriptor[0]))
+
+        # Copy the frames out of the rings, then check that the producers did not overwrite the
+        # slots during the copy; a torn frame is dropped instead of being shown or broadcast
+        raw = raw_ring.view(raw_slot, raw_seq)
+        if raw is not None:
+            raw = raw.copy()
+            if raw_ring.valid(raw_slot, raw_seq):
+                self.frameRaw.emit(raw)
+        bos_color = bos_ring.view(bos_slot, bos_seq)
+        if bos_color is not None:
+            bos_color = bos_color.copy()
+            if not bos_ring.valid(bos_slot, bos_seq):
+                bos_color = None
+        if bos_color is not None:
+            self.frameBOS.emit(bos_color)
+            if self.broadcaster is not None:
+                self.broadcaster.publish(bos_color, self.broadcast_channel)
+            self.stats.tick()
+        else:
+            self._skipped += 1
+
+        # Counters of the capture and processing processes
+        self._gain = stats["gain"]
+        self.stats.captured  = stats["captured"]
+        self.stats.processed = stats["processed"]
+        self.stats.dropped   = stats["dropped"] + self._skipped
+
+    def stop(self):
+        self._timer.stop()
+        if self._stop is not None:
+            self.pipeline.stop(self._stop)
+        self._reader.close()
+
 class MainWindow(QtWidgets.QWidget):
-    def __init__(self):
+    def __init__(self, sources=("rtsp://10.5.0.2:8554/mystream",), workers=None, broadcast_port=None, processes=False):
         super().__init__()
         self.setWindowTitle("Real-Time BOS Viewer")
 
+        # Time the start-up until the first processed frame is shown
+        self.startup = StartupTimer()
+
         # Layouts
         vbox = QtWidgets.QVBoxLayout(self)
-        hbox = QtWidgets.QHBoxLayout()
+        grid = QtWidgets.QGridLayout()
         ctrl = QtWidgets.QGridLayout()
-        vbox.addLayout(hbox)
+        vbox.addLayout(grid)
         vbox.addLayout(ctrl)
 
-        # Video display labels (expandable)
-        self.raw_lbl = QtWidgets.QLabel()
-        self.bos_lbl = QtWidgets.QLabel()
-        for lbl in (self.raw_lbl, self.bos_lbl):
-            lbl.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
-            lbl.setScaledContents(True)
-            lbl.setAlignment(QtCore.Qt.AlignCenter)
-        hbox.addWidget(self.raw_lbl)
-        hbox.addWidget(self.bos_lbl)
-        hbox.setStretch(0, 1)
-        hbox.setStretch(1, 1)
+        # One row of expandable raw/BOS labels plus a status line per stream
+        self.raw_lbls    = []
+        self.bos_lbls    = []
+        self.stream_lbls = []
+        for i in range(len(sources)):
+            raw_lbl = QtWidgets.QLabel()
+            bos_lbl = QtWidgets.QLabel()
+            for lbl in (raw_lbl, bos_lbl):
+                lbl.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+                lbl.setScaledContents(True)
+                lbl.setAlignment(QtCore.Qt.AlignCenter)
+            stream_lbl = QtWidgets.QLabel("")
+            grid.addWidget(raw_lbl, 2 * i, 0)
+            grid.addWidget(bos_lbl, 2 * i, 1)
+            grid.addWidget(stream_lbl, 2 * i + 1, 0, 1, 2)
+            grid.setRowStretch(2 * i, 1)
+            self.raw_lbls.append(raw_lbl)
+            self.bos_lbls.append(bos_lbl)
+            self.stream_lbls.append(stream_lbl)
+        grid.setColumnStretch(0, 1)
+        grid.setColumnStretch(1, 1)
 
         # Filter selector
         ctrl.addWidget(QtWidgets.QLabel("Filter:"), 0, 0)
@@ -180,6 +254,8 @@ class MainWindow(QtWidgets.QWidget):
         self.gain_value_label = QtWidgets.QLabel("1.0")
         ctrl.addWidget(self.gain_slider, 3, 1)
         ctrl.addWidget(self.gain_value_label, 3, 2)
+        self.auto_gain_check = QtWidgets.QCheckBox("Auto")
+        ctrl.addWidget(self.auto_gain_check, 3, 3)
 
         # Colormap selector
         ctrl.addWidget(QtWidgets.QLabel("Colormap:"), 4, 0)
@@ -187,16 +263,43 @@ class MainWindow(QtWidgets.QWidget):
         self.cmap_combo.addItems(["None", "JET", "HOT", "BONE", "VIRIDIS", "INFERNO"])
         ctrl.addWidget(self.cmap_combo, 4, 1)
 
+        # Vibration compensation
+        self.stabilize_check = QtWidgets.QCheckBox("Stabilize (phase correlation)")
+        ctrl.addWidget(self.stabilize_check, 5, 0, 1, 3)
+
         # Status label
         self.status_label = QtWidgets.QLabel("")
-        ctrl.addWidget(self.status_label, 5, 0, 1, 3)
-
-        # Start video thread
-        self.thread = VideoThread("rtsp://10.5.0.2:8554/mystream")
-        self.thread.frameRaw.connect(self.update_raw)
-        self.thread.frameBOS.connect(self.update_bos)
-        self.thread.error.connect(self.on_error)
-        self.thread.start()
+        ctrl.addWidget(self.status_label, 6, 0, 1, 3)
+
+        # Optionally serve the BOS output of every stream to remote viewers
+        self.broadcaster = None
+        if broadcast_port:
+            from BOS_Broadcast import FrameBroadcaster  # asyncio server, only loaded when used
+            self.broadcaster = FrameBroadcaster(port=broadcast_port)
+            if not self.broadcaster.start():
+                self.broadcaster = None
+
+        # Start one capture thread per stream, all processed on a shared worker pool
+        # (or, with `processes`, one capture and one processing process per stream)
+        self.pool = ProcessPipeline() if processes else FramePool(workers)
+        self.threads = []
+        self.stream_errors = [""] * len(sources)
+        for i, source in enumerate(sources):
+            thread = ProcessStream(source, self.pool) if processes else VideoThread(source, self.pool)
+            thread.broadcaster       = self.broadcaster
+            thread.broadcast_channel = str(i)
+            thread.frameRaw.connect(lambda frame, i=i: self.update_raw(i, frame))
+            thread.frameBOS.connect(lambda frame, i=i: self.update_bos(i, frame))
+            thread.error.connect(lambda msg, i=i: self.on_error(i, msg))
+            thread.start()
+            self.threads.append(thread)
+
+        # Refresh the per-stream FPS and drop counters once per second
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+        unit = "process(es)" if processes else "worker(s)"
+        self.status_label.setText(f"{len(sources)} stream(s) on {self.pool.workers} {unit}")
 
         # Connect controls
         self.filter_combo.currentTextChanged.connect(self.on_filter)
@@ -204,6 +307,8 @@ class MainWindow(QtWidgets.QWidget):
         self.bg_slider.valueChanged.connect(self.on_bg)
         self.gain_slider.valueChanged.connect(self.on_gain)
         self.cmap_combo.currentTextChanged.connect(self.on_cmap)
+        self.stabilize_check.toggled.connect(self.on_stabilize)
+        self.auto_gain_check.toggled.connect(self.on_auto_gain)
 
         # Initialize control states
         self.on_filter(self.filter_combo.currentText())
@@ -211,25 +316,44 @@ class MainWindow(QtWidgets.QWidget):
         self.on_bg(self.bg_slider.value())
         self.on_gain(self.gain_slider.value())
         self.on_cmap(self.cmap_combo.currentText())
+        self.startup.mark("window created")
 
-    @QtCore.pyqtSlot(np.ndarray)
-    def update_raw(self, frame):
+    def update_raw(self, index, frame):
         h, w, ch = frame.shape
         img = QtGui.QImage(frame.data, w, h, ch * w, QtGui.QImage.Format_BGR888)
-        self.raw_lbl.setPixmap(QtGui.QPixmap.fromImage(img))
+        self.raw_lbls[index].setPixmap(QtGui.QPixmap.fromImage(img))
 
-    @QtCore.pyqtSlot(np.ndarray)
-    def update_bos(self, frame):
+    def update_bos(self, index, frame):
         h, w, ch = frame.shape
         img = QtGui.QImage(frame.data, w, h, ch * w, QtGui.QImage.Format_BGR888)
-        self.bos_lbl.setPixmap(QtGui.QPixmap.fromImage(img))
-
-    @QtCore.pyqtSlot(str)
-    def on_error(self, msg):
-        self.status_label.setText(msg)
+        self.bos_lbls[index].setPixmap(QtGui.QPixmap.fromImage(img))
+        if self.startup.first_frame is None:
+            self.startup.frame_processed()
+            self.status_label.setText(f"{self.status_label.text()}, first frame {self.startup.first_frame:.2f} s after launch")
+
+    def on_error(self, index, msg):
+        self.stream_errors[index] = msg
+        self.update_stats()
+
+    def update_stats(self):
+        for i, thread in enumerate(self.threads):
+            stats = self.pool.stats(thread)
+            text = (f"{thread.rtsp_url}: {stats['fps']:.1f} fps, "
+                    f"{stats['processed']} processed, {stats['dropped']} dropped")
+            if stats["failed"]:
+                text += f", {stats['failed']} failed"
+            auto_gain = thread.automatic_gain()
+            if auto_gain is not None:
+                text += f", auto gain {auto_gain:.1f}"
+            if self.broadcaster is not None:
+                text += f", {self.broadcaster.client_count(str(i))} viewer(s)"
+            if self.stream_errors[i]:
+                text += f" - {self.stream_errors[i]}"
+            self.stream_lbls[i].setText(text)
 
     def on_filter(self, text):
-        self.thread.filter_name = text
+        for thread in self.threads:
+            thread.set_parameter("filter_name", text)
         # adjust slider range if needed
         if text in ["Gaussian Blur", "Median Filter"]:
             self.param_slider.setRange(1, 21)
@@ -250,16 +374,28 @@ class MainWindow(QtWidgets.QWidget):
 
     def on_param(self, v):
         self.param_value_label.setText(str(v))
-        self.thread.param_value = v
+        for thread in self.threads:
+            thread.set_parameter("param_value", v)
 
     def on_bg(self, v):
         self.bg_value_label.setText(f"{v} (off)" if v == 0 else str(v))
-        self.thread.bg_update_interval = v
+        for thread in self.threads:
+            thread.set_parameter("bg_update_interval", v)
 
     def on_gain(self, v):
         gain = v / 10.0
         self.gain_value_label.setText(f"{gain:.1f}")
-        self.thread.gain = gain
+        for thread in self.threads:
+            thread.set_parameter("gain", gain)
+
+    def on_auto_gain(self, checked):
+        self.gain_slider.setEnabled(not checked)
+        for thread in self.threads:
+            thread.set_parameter("auto_gain", AutoGain(gain=self.gain_slider.value() / 10.0) if checked else None)
+
+    def on_stabilize(self, checked):
+        for thread in self.threads:
+            thread.set_parameter("stabilize", checked)
 
     def on_cmap(self, name):
         cmap_map = {
@@ -270,15 +406,29 @@ class MainWindow(QtWidgets.QWidget):
             "VIRIDIS": cv2.COLORMAP_VIRIDIS,
             "INFERNO": cv2.COLORMAP_INFERNO,
         }
-        self.thread.colormap = cmap_map.get(name)
+        for thread in self.threads:
+            thread.set_parameter("colormap", cmap_map.get(name))
 
     def closeEvent(self, event):
-        self.thread.stop()
+        self.stats_timer.stop()
+        for thread in self.threads:
+            thread.stop()
+        self.pool.close()
+        if self.broadcaster is not None:
+            self.broadcaster.stop()
         super().closeEvent(event)
 
 if __name__ == "__main__":
-    app = QtWidgets.QApplication(sys.argv)
-    win = MainWindow()
+    # Stream URLs or video files (as local stand-ins) may be given on the command line
+    parser = argparse.ArgumentParser(description="Real-Time BOS Viewer")
+    parser.add_argument("sources", nargs="*", default=["rtsp://10.5.0.2:8554/mystream"])
+    parser.add_argument("--broadcast", type=int, metavar="PORT", help="serve the BOS output as MJPEG on this port")
+    parser.add_argument("--processes", action="store_true",
+                        help="capture and process every stream in separate processes (shared memory frames)")
+    args, qt_args = parser.parse_known_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    win = MainWindow(args.sources, broadcast_port=args.broadcast, processes=args.processes)
     win.show()
     win.resize(1200, 700)
     sys.exit(app.exec_())
@@ -1,23 +1,52 @@
 import cv2 as cv
 import numpy as np
 import time
+from BOS_AutoGain import AutoGain
+from BOS_Export import SequenceExporter
+from BOS_Pacing import FrameScheduler
+from BOS_Startup import StartupTimer
+from BOS_Static import StaticFrameGate, difference_energy
+from BOS_Trigger import TriggerRecorder
 
 
 def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5, target_width=1920, target_height=1080,
-                  start_frame=0):
+                  start_frame=0, fps=None, static_threshold=None,
+                  pretrigger_seconds=None, posttrigger_seconds=5.0, trigger_threshold=None, stride=1, auto_gain=False,
+                  export_dir=None, export_format="png", export_compression=3):
     """
     Synthetic Schlieren System using a webcam and OpenCV.
 
     Parameters:
         channel (int): Camera channel (0 for default camera).
         gain (int): Gain factor to amplify the intensity of the difference images.
-        delay (int): Delay in milliseconds between frames.
+        delay (int): Frame period in milliseconds, used when neither `fps` nor the source gives a frame rate.
         update_interval (int): Number of frames after which the reference frame updates.
         alpha (float): Blending factor for smoothing reference frame updates (0 to 1).
         target_width (int): Target screen width (default is 1920).
         target_height (int): Target screen height (default is 1080).
         start_frame (int): Frame number to start processing from (default is 0).
+        fps (float): Target frame rate (defaults to the source FPS). Processing and display are skipped
+            when the loop falls behind. Playback runs at the source FPS.
+        static_threshold (float): `BOS_Static.StaticFrameGate` threshold (None disables the gate).
+        pretrigger_seconds (float): If set, keep this many seconds of raw frames in memory and save them,
+            plus the following frames, whenever a recording is triggered (R key or `trigger_threshold`).
+        posttrigger_seconds (float): Seconds recorded after the last trigger.
+        trigger_threshold (float): Difference energy that triggers a recording automatically.
+        stride (int): Only process every `stride`-th frame, e.g. to view a high-speed recording at a lower rate.
+            Skipped frames are advanced with `grab()` and never retrieved, and the reference only sees the
+            retained frames. Playback runs at the source FPS divided by `stride`.
+        auto_gain (bool): Choose the gain automatically so the 99.5th percentile of the smoothed difference maps to
+            full scale, from a subsampled histogram averaged over recent frames (`gain` is the starting value).
+            Pass a `BOS_AutoGain.AutoGain` to tune it.
+        export_dir (str): If set, also write every processed frame (at processing resolution) to this folder as a
+            lossless numbered image sequence, encoded by a thread pool (see `BOS_Export.SequenceExporter`).
+            Frames are dropped from the export, never from the display, when the encoders fall behind.
+        export_format (str): "png" or "tif".
+        export_compression (int): PNG compression level (0-9); for TIFF, 0 is uncompressed and anything else LZW.
     """
+    # Time the start-up until the first processed frame
+    startup = StartupTimer()
+
     # Open the video file or camera
     webcam = cv.VideoCapture('temp_video.mp4')
 
@@ -42,13 +71,41 @@ def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5, t
     reference_frame_bw = None  # Placeholder for the reference frame
     new_reference_frame_bw = None  # Placeholder for the new reference frame
 
+    # Pace the loop against a target frame period instead of a fixed delay
+    target_fps = fps or (webcam.get(cv.CAP_PROP_FPS) or 1000.0 / delay) / stride
+    scheduler = FrameScheduler(target_fps, live=False)
+
+    # Early-out for frames without flow
+    static_gate = StaticFrameGate(static_threshold)
+
+    # Automatic gain from the recent high percentile of the difference
+    auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+
+    # Lossless sequence export and Enter snapshots are encoded in background threads
+    if export_dir:
+        exporter = SequenceExporter(export_dir, "schlieren", export_format, export_compression)
+    else:
+        exporter = SequenceExporter(".", workers=1)  # snapshots only
+
+    # Pre-trigger ring buffer for event-triggered recording of raw frames
+    recorder = None
+    if pretrigger_seconds:
+        recorder = TriggerRecorder(target_fps, pretrigger_seconds, posttrigger_seconds, trigger_threshold,
+                                   prefix="schlieren_event")
+
     # Start processing the video stream
     while True:
-        ret, frame = webcam.read()
+        # Grab the frames skipped by the stride without retrieving them, then retrieve the retained one
+        ret = all(webcam.grab() for _ in range(stride))
+        if ret:
+            ret, frame = webcam.retrieve()
         if not ret:
             print("Error: Unable to capture video.")
             break
 
+        # Skip processing and display (never capture) when behind schedule
+        process_frame = scheduler.should_process()
+
         # Convert the current frame to grayscale
         frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
 
@@ -64,57 +121,89 @@ def schlieren_cam(channel=0, gain=10, delay=100, update_interval=4, alpha=0.5, t
             else:
                 reference_frame_bw = cv.addWeighted(reference_frame_bw, 1 - alpha, new_reference_frame_bw, alpha, 0)
 
+        # Keep the raw frame for event recording and check the energy trigger
+        if recorder is not None:
+            energy = None
+            if trigger_threshold is not None and reference_frame_bw is not None:
+                energy = difference_energy(frame_bw, reference_frame_bw)
+            recorder.update(frame, energy)
+
         # Ensure the reference frame exists before computing the difference
-        if reference_frame_bw is not None:
-            # Compute the absolute difference
-            diff = cv.absdiff(frame_bw, reference_frame_bw)
-
-            # Smooth the difference image and amplify intensity
-            diff_smoothed = cv.medianBlur(diff, 5)
-            diff_amplified = cv.multiply(diff_smoothed, gain)
-
-            # Apply a color map for visualization
-            diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
-
-            # Resize the output frame to fit within the screen resolution while maintaining the aspect ratio
-            frame_height, frame_width = diff_colored.shape[:2]
-            aspect_ratio = frame_width / frame_height
-
-            # Calculate the new size keeping the aspect ratio
-            if frame_width > target_width or frame_height > target_height:
-                if aspect_ratio > 1:  # Wider than tall
-                    new_width = target_width
-                    new_height = int(target_width / aspect_ratio)
-                else:  # Taller than wide or square
-                    new_height = target_height
-                    new_width = int(target_height * aspect_ratio)
-
-                # Resize to fit the screen
-                diff_colored_resized = cv.resize(diff_colored, (1920, 1080))
-            else:
-                diff_colored_resized = diff_colored  # If the frame is already smaller than the target resolution
+        if reference_frame_bw is not None and process_frame:
+            # Reuse the previous output and skip the expensive stages when the frame is static
+            diff_colored_resized = static_gate.check(frame_bw, reference_frame_bw)
+            if diff_colored_resized is None:
+                # Compute the absolute difference
+                diff = cv.absdiff(frame_bw, reference_frame_bw)
+
+                # Smooth the difference image and amplify intensity
+                diff_smoothed = cv.medianBlur(diff, 5)
+                if auto_gain is not None:
+                    gain = auto_gain.update(diff_smoothed)
+                diff_amplified = cv.multiply(diff_smoothed, gain)
+
+                # Apply a color map for visualization
+                diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+
+                # Resize the output frame to fit within the screen resolution while maintaining the aspect ratio
+                frame_height, frame_width = diff_colored.shape[:2]
+                aspect_ratio = frame_width / frame_height
+
+                # Calculate the new size keeping the aspect ratio
+                if frame_width > target_width or frame_height > target_height:
+                    if aspect_ratio > 1:  # Wider than tall
+                        new_width = target_width
+                        new_height = int(target_width / aspect_ratio)
+                    else:  # Taller than wide or square
+                        new_height = target_height
+                        new_width = int(target_height * aspect_ratio)
+
+                    # Resize to fit the screen
+                    diff_colored_resized = cv.resize(diff_colored, (1920, 1080))
+                else:
+                    diff_colored_resized = diff_colored  # If the frame is already smaller than the target resolution
+                static_gate.store(diff_colored_resized)
+
+            # Queue the full-resolution frame for export (the latest computed one if this frame was static)
+            if export_dir:
+                exporter.write(diff_colored, frame_count)
 
             # Display the processed and resized image
             cv.imshow("Schlieren Effect", diff_colored_resized)
+            startup.frame_processed()
 
         # Increment the frame counter
         frame_count += 1
 
         # Key handling
-        key = cv.waitKey(delay)
+        key = scheduler.wait_key()
         if key == 27:  # ESC key to exit
             break
         elif key == 13:  # Enter key to save the frame
             filename = f'schlieren_frame_{int(time.time())}.jpg'
-            cv.imwrite(filename, diff_colored_resized)
-            print(f"Frame saved as {filename}")
+            if exporter.save(filename, diff_colored_resized):
+                print(f"Frame saved as {filename}")
+            else:
+                print("Frame not saved: the encoders are still busy.")
+        elif key in (ord('r'), ord('R')) and recorder is not None:  # R key to trigger a recording
+            recorder.trigger()
+
+    print(scheduler.report())
+    if static_threshold is not None:
+        print(static_gate.report())
+    if recorder is not None:
+        recorder.close()
+    exporter.close()
+    if export_dir:
+        print(exporter.report())
 
     # Release resources
     webcam.release()
     cv.destroyAllWindows()
 
 
-# Run the Schlieren System
-schlieren_cam(channel=0, gain=10, delay=10, update_interval=1, alpha=0.05, target_width=1920, target_height=1080,
-              start_frame=9000)
+# Run the Schlieren System (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    schlieren_cam(channel=0, gain=10, delay=10, update_interval=1, alpha=0.05, target_width=1920, target_height=1080,
+                  start_frame=9000)
 
@@ -0,0 +1,169 @@
+import cv2 as cv
+import numpy as np
+import os
+
+
+def abel_projection_matrix(radius):
+    """
+    Build the onion-peeling projection matrix for an axisymmetric field.
+
+    Ring j spans radii [j - 0.5, j + 0.5] (clipped at 0) and the line of sight at
+    offset i crosses it with chord length L[i, j], so that projection = L @ field.
+
+    Parameters:
+        radius (int): Number of radial samples (pixels from the axis to the edge, inclusive).
+
+    Returns:
+        ndarray: (radius, radius) upper-triangular float64 projection matrix.
+    """
+    edges = np.maximum(np.arange(radius + 1, dtype=np.float64) - 0.5, 0.0)
+    offsets = np.arange(radius, dtype=np.float64)[:, None] ** 2
+
+    # Chord length of the line of sight y = i through the disk of radius edges[j]
+    chords = 2.0 * np.sqrt(np.clip(edges[None, :] ** 2 - offsets, 0.0, None))
+    return chords[:, 1:] - chords[:, :-1]
+
+
+def load_abel_matrix(width, axis, cache_dir="abel_cache"):
+    """
+    Return the inverse Abel (onion-peeling) matrix for a frame width and axis column.
+
+    The matrix is computed once and cached on disk as a .npy file, so later runs with
+    the same geometry load it instead of inverting it again.
+
+    Parameters:
+        width (int): Frame width in pixels.
+        axis (int): Column index of the symmetry axis.
+        cache_dir (str): Folder used to cache the inverse matrices.
+
+    Returns:
+        ndarray: (radius, radius) float32 matrix mapping half-row projections to radial profiles.
+    """
+    if not 0 <= axis < width:
+        raise ValueError(f"Axis column {axis} is outside a frame of width {width}.")
+
+    cache_path = os.path.join(cache_dir, f"abel_onion_w{width}_a{axis}.npy")
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+
+    # Use the largest radius that fits on both sides of the axis
+    radius = min(axis, width - 1 - axis) + 1
+    inverse = np.linalg.inv(abel_projection_matrix(radius)).astype(np.float32)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(cache_path, inverse)
+    print(f"Abel matrix for width {width}, axis {axis} cached as {cache_path}")
+    return inverse
+
+
+def abel_invert_block(frames, axis, inverse):
+    """
+    Reconstruct radial profiles for every row of a block of frames.
+
+    The left and right halves of each row are averaged into one projection and all rows
+    of all frames are inverted with a single matrix multiply.
+
+    Parameters:
+        frames (ndarray): (N, H, W) or (H, W) projected field, e.g. a BOS difference.
+        axis (int): Column index of the symmetry axis.
+        inverse (ndarray): Matrix returned by `load_abel_matrix` for this width and axis.
+
+    Returns:
+        ndarray: (N, H, radius) or (H, radius) float32 radial profiles, radius 0 at the axis.
+    """
+    radius = inverse.shape[0]
+    frames = np.asarray(frames, dtype=np.float32)
+
+    right = frames[..., axis:axis + radius]
+    left = frames[..., axis - radius + 1:axis + 1][..., ::-1]
+    projection = 0.5 * (left + right)
+
+    rows = projection.reshape(-1, radius)
+    profiles = rows @ inverse.T
+    return profiles.reshape(projection.shape)
+
+
+def abel_from_video(input_file, output_file, axis=None, gain=10, block_size=32, cache_dir="abel_cache",
+                    display=False):
+    """
+    Abel-invert the BOS difference of an axisymmetric recording (hair dryer, jets).
+
+    Each frame is differenced against the first frame, frames are grouped into blocks of
+    `block_size` and each block is inverted with one matrix multiply. The output video shows
+    the reconstructed field mirrored about the axis.
+
+    Parameters:
+        input_file (str): Path to the input video file.
+        output_file (str): Path to save the reconstructed video.
+        axis (int): Column of the symmetry axis (defaults to the frame centre).
+        gain (int): Gain factor applied to the reconstructed field for display.
+        block_size (int): Number of frames inverted per matrix multiply.
+        cache_dir (str): Folder used to cache the inverse matrices.
+        display (bool): Whether to display the reconstruction during processing.
+    """
+    video = cv.VideoCapture(input_file)
+    if not video.isOpened():
+        print(f"Error: Unable to open video file {input_file}.")
+        return
+
+    ret, first_frame = video.read()
+    if not ret:
+        print("Error: Could not read the reference frame.")
+        video.release()
+        return
+    reference_bw = cv.cvtColor(first_frame, cv.COLOR_BGR2GRAY).astype(np.float32)
+    height, width = reference_bw.shape
+
+    if axis is None:
+        axis = width // 2
+    inverse = load_abel_matrix(width, axis, cache_dir)
+    radius = inverse.shape[0]
+
+    frame_rate = video.get(cv.CAP_PROP_FPS) or 30
+    fourcc = cv.VideoWriter_fourcc(*'mp4v')
+    out = cv.VideoWriter(output_file, fourcc, frame_rate, (2 * radius - 1, height))
+
+    block = np.empty((block_size, height, width), dtype=np.float32)
+    frame_index = 0
+    stop = False
+
+    while not stop:
+        # Fill a block with signed differences against the reference
+        count = 0
+        while count < block_size:
+            ret, frame = video.read()
+            if not ret:
+                break
+            frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+            np.subtract(frame_bw, reference_bw, out=block[count], dtype=np.float32)
+            count += 1
+        if count == 0:
+            break
+
+        profiles = abel_invert_block(block[:count], axis, inverse)
+
+        for profile in profiles:
+            # Mirror the radial profile back into a full symmetric image
+            field = np.concatenate((profile[:, :0:-1], profile), axis=1)
+            field8 = np.clip(np.abs(field) * gain, 0, 255).astype(np.uint8)
+            field_colored = cv.applyColorMap(field8, cv.COLORMAP_JET)
+            out.write(field_colored)
+
+            if display:
+                cv.imshow("Abel Inversion", field_colored)
+                if cv.waitKey(1) == 27:  # ESC key to exit display
+                    stop = True
+                    break
+
+        frame_index += count
+        print(f"Inverted {frame_index} frames...")
+
+    video.release()
+    out.release()
+    cv.destroyAllWindows()
+    print(f"Abel-inverted video saved as {output_file}")
+
+
+if __name__ == "__main__":
+    abel_from_video('Hair Dryer  - original video.mp4', 'Hair_Dryer_Abel.mp4', gain=10, block_size=32,
+                    display=True)
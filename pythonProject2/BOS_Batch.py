@@ -0,0 +1,244 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2 as cv
+from BOS_Mono16 import PhotronRaw
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Processing function for each kind of input, and the script that defines it
+RUNNERS = {
+    "images": ("Oprimized_BOS_Frame_By_Frame.py", "bos_from_images"),
+    "video":  ("Optimzed and raw data.py", "bos_from_video"),
+}
+
+
+def _load_function(script, name):
+    # The scripts have spaces in their names, so load them by path
+    spec = importlib.util.spec_from_file_location(os.path.splitext(script)[0].replace(" ", "_"),
+                                                  os.path.join(SCRIPT_DIR, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+def read_manifest(manifest_path):
+    """
+    Read a batch manifest.
+
+    The manifest is a JSON file holding either a list of jobs or an object with `jobs` and
+    optional `defaults` (parameters applied to every job). Each job has an `input` (image
+    folder, video file or Photron .cih/.cihx header), an `output` video path, an optional
+    `name`, and any keyword arguments of `bos_from_images` / `bos_from_video`:
+
+        {"defaults": {"gain": 10},
+         "jobs": [{"input": "C001H001S0002 50 CM", "output": "50_CM_BOS.mp4", "start_frame": 1},
+                  {"input": "run2.mp4", "output": "run2_BOS.mp4", "update_interval": 8}]}
+
+    Parameters:
+        manifest_path (str): Path to the JSON manifest.
+
+    Returns:
+        list: Job dicts with `name`, `input`, `output`, `kind` and `params`.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for number, entry in enumerate(manifest["jobs"]):
+        entry = dict(entry)
+        source = os.path.join(base, entry.pop("input"))
+        output = os.path.join(base, entry.pop("output"))
+        name = entry.pop("name", None) or os.path.basename(os.path.normpath(source))
+        params = dict(defaults, **entry)
+        params["display"] = False  # nobody is watching
+        jobs.append({"number": number, "name": name, "input": source, "output": output,
+                     "kind": "images" if os.path.isdir(source) or source.lower().endswith(('.cih', '.cihx')) else "video",
+                     "params": params})
+    return jobs
+
+
+def measure_job(job):
+    """
+    Fill in the frame count and frame size of a job from its input, without decoding it all.
+
+    Sets `frames`, `width`, `height` and `work` (pixels to process) on the job, or `error`
+    if the input cannot be read.
+    """
+    frames = width = height = 0
+    if job["input"].lower().endswith(('.cih', '.cihx')):
+        try:
+            sequence = PhotronRaw(job["input"])
+            frames = max(0, len(sequence) - job["params"].get("start_frame", 0))
+            width, height = sequence.width, sequence.height
+        except (OSError, ValueError):
+            pass
+    elif job["kind"] == "images":
+        images = sorted(img for img in os.listdir(job["input"]) if img.endswith(('.png', '.jpg', '.tif')))
+        frames = max(0, len(images) - job["params"].get("start_frame", 0))
+        if images:
+            first = cv.imread(os.path.join(job["input"], images[0]), cv.IMREAD_UNCHANGED)
+            if first is not None:
+                height, width = first.shape[:2]
+    elif os.path.exists(job["input"]):
+        video = cv.VideoCapture(job["input"])
+        if video.isOpened():
+            frames = int(video.get(cv.CAP_PROP_FRAME_COUNT))
+            width = int(video.get(cv.CAP_PROP_FRAME_WIDTH))
+            height = int(video.get(cv.CAP_PROP_FRAME_HEIGHT))
+        video.release()
+
+    job.update(frames=frames, width=width, height=height, work=frames * width * height)
+    if job["work"] == 0:
+        job["error"] = f"Unable to read input {job['input']}"
+    return job
+
+
+def job_memory(job):
+    """
+    Rough peak memory of one job in bytes.
+
+    About 16 bytes per pixel for the per-frame chain (BGR frame, gray, reference, difference
+    stages and colored output), six more per pixel and frame of a block, plus the interpreter
+    and OpenCV themselves.
+    """
+    pixels = job["width"] * job["height"]
+    block = job["params"].get("block_size") or 0
+    return 200 * 2**20 + pixels * (16 + 6 * block)
+
+
+def available_memory():
+    """Physical memory currently available in bytes (None if it cannot be determined)."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def pool_size(jobs, max_workers=None, memory_limit=None):
+    """
+    Number of worker processes that fit the CPU count and the memory limit.
+
+    Parameters:
+        jobs (list): Measured jobs.
+        max_workers (int): Upper bound (defaults to the CPU count).
+        memory_limit (int): Bytes the batch may use (defaults to 80% of the available memory).
+
+    Returns:
+        int: Worker count, at least 1.
+    """
+    workers = min(max_workers or os.cpu_count() or 1, max(1, len(jobs)))
+    if memory_limit is None:
+        available = available_memory()
+        memory_limit = int(available * 0.8) if available else None
+    if memory_limit and jobs:
+        workers = min(workers, max(1, memory_limit // max(job_memory(job) for job in jobs)))
+    return workers
+
+
+def _init_worker(opencv_threads):
+    # Share the cores between processes instead of every process starting one thread per core
+    cv.setNumThreads(opencv_threads)
+
+
+def _run_job(job):
+    script, name = RUNNERS[job["kind"]]
+    process = _load_function(script, name)
+    output_folder = os.path.dirname(job["output"])
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
+    start = time.perf_counter()
+    process(job["input"], job["output"], **job["params"])
+    return time.perf_counter() - start
+
+
+def run_batch(manifest_path, summary_path=None, max_workers=None, memory_limit_gb=None):
+    """
+    Run every job of a manifest in a process pool and write a summary.
+
+    Jobs are measured first and submitted largest first (longest-processing-time-first
+    scheduling), so the long recordings start immediately and the short ones fill the gaps at
+    the end, which keeps the total run time close to the longest single job. A failing job is
+    recorded in the summary and does not stop the others.
+
+    Parameters:
+        manifest_path (str): Path to the JSON manifest (see `read_manifest`).
+        summary_path (str): CSV file for the per-job summary (defaults to `<manifest>_summary.csv`).
+        max_workers (int): Maximum number of worker processes (defaults to the CPU count).
+        memory_limit_gb (float): Memory the batch may use (defaults to 80% of the available memory).
+
+    Returns:
+        list: Per-job result dicts as written to the summary.
+    """
+    jobs = [measure_job(job) for job in read_manifest(manifest_path)]
+    runnable = sorted((job for job in jobs if "error" not in job), key=lambda job: job["work"], reverse=True)
+
+    memory_limit = int(memory_limit_gb * 2**30) if memory_limit_gb else None
+    workers = pool_size(runnable, max_workers, memory_limit)
+    opencv_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Running {len(runnable)} of {len(jobs)} jobs on {workers} process(es), "
+          f"{opencv_threads} OpenCV thread(s) each")
+
+    results = {}
+    for job in jobs:
+        if "error" in job:
+            print(f"Skipping {job['name']}: {job['error']}")
+            results[job["number"]] = dict(job, status="failed", seconds=0.0)
+
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(opencv_threads,)) as executor:
+        futures = {executor.submit(_run_job, job): job for job in runnable}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                seconds = future.result()
+                ok = os.path.exists(job["output"]) and os.path.getsize(job["output"]) > 0
+                status = "ok" if ok else "failed"
+                error = "" if ok else "no output written"
+            except Exception as exc:
+                seconds, status, error = 0.0, "failed", f"{type(exc).__name__}: {exc}"
+            results[job["number"]] = dict(job, status=status, seconds=seconds, error=error)
+            print(f"[{len(results)}/{len(jobs)}] {job['name']}: {status} in {seconds:.1f} s {error}")
+    makespan = time.perf_counter() - batch_start
+
+    # Summary in manifest order
+    summary_path = summary_path or os.path.splitext(manifest_path)[0] + "_summary.csv"
+    rows = [results[number] for number in sorted(results)]
+    with open(summary_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "input", "output", "status", "frames", "width", "height",
+                         "seconds", "fps", "megapixels_per_s", "error"])
+        for r in rows:
+            fps = r["frames"] / r["seconds"] if r["seconds"] else 0.0
+            mpps = r["work"] / r["seconds"] / 1e6 if r["seconds"] else 0.0
+            writer.writerow([r["name"], r["input"], r["output"], r["status"], r["frames"], r["width"],
+                             r["height"], f"{r['seconds']:.2f}", f"{fps:.1f}", f"{mpps:.1f}", r.get("error", "")])
+
+    failed = sum(r["status"] != "ok" for r in rows)
+    busy = sum(r["seconds"] for r in rows)
+    print(f"Batch finished in {makespan:.1f} s ({busy:.1f} s of job time, {failed} failed); summary saved as {summary_path}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run BOS processing for every recording in a manifest.")
+    parser.add_argument("manifest", help="JSON manifest with the jobs")
+    parser.add_argument("--summary", help="CSV file for the per-job summary")
+    parser.add_argument("--workers", type=int, help="maximum number of worker processes")
+    parser.add_argument("--memory-gb", type=float, help="memory the batch may use")
+    args = parser.parse_args()
+    run_batch(args.manifest, args.summary, args.workers, args.memory_gb)
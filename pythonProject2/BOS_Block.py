@@ -0,0 +1,193 @@
+import cv2 as cv
+import numpy as np
+
+
+def read_frames(video, stride=1):
+    """
+    Yield frames from an opened `cv.VideoCapture` until the stream ends.
+
+    With a stride, every frame is advanced with `grab()` but only every `stride`-th frame is
+    retrieved, so the skipped frames are never converted to BGR, copied or processed.
+
+    Parameters:
+        video (cv.VideoCapture): Opened capture object.
+        stride (int): Yield every `stride`-th frame, starting with the first one.
+
+    Yields:
+        ndarray: Decoded BGR frames.
+    """
+    index = 0
+    while video.grab():
+        if index % stride == 0:
+            ret, frame = video.retrieve()
+            if not ret:
+                return
+            yield frame
+        index += 1
+
+
+def update_reference(frame_bw, previous_reference_bw, blend_factor):
+    """
+    Return the new reference frame: the frame itself the first time, otherwise a blend
+    `blend_factor * frame + (1 - blend_factor) * previous` as in the per-frame loops.
+    """
+    if previous_reference_bw is None:
+        return frame_bw.copy()
+    return cv.addWeighted(frame_bw, blend_factor, previous_reference_bw, 1 - blend_factor, 0)
+
+
+def median_blur_stack(stack, ksize=5):
+    """
+    Median-blur every frame of an (N, H, W) uint8 stack with a single OpenCV call.
+
+    The frames are stacked into one tall image with `ksize // 2` replicated rows between
+    them, which reproduces the BORDER_REPLICATE handling of a per-frame `cv.medianBlur`
+    exactly. The result keeps the padding rows; slice `[:, pad:pad + H]` to drop them.
+
+    Parameters:
+        stack (ndarray): (N, H, W) uint8 frames.
+        ksize (int): Median aperture size (odd).
+
+    Returns:
+        ndarray: (N, H + 2 * pad, W) uint8 blurred frames including the padding rows.
+    """
+    n, height, width = stack.shape
+    pad = ksize // 2
+
+    padded = np.empty((n, height + 2 * pad, width), dtype=np.uint8)
+    padded[:, pad:pad + height] = stack
+    padded[:, :pad] = stack[:, :1]
+    padded[:, pad + height:] = stack[:, -1:]
+
+    blurred = cv.medianBlur(padded.reshape(-1, width), ksize)
+    return blurred.reshape(padded.shape)
+
+
+def bos_block(frames_bw, references_bw, gain, colormap=cv.COLORMAP_JET, auto_gain=None):
+    """
+    Run the absdiff -> medianBlur(5) -> multiply(gain) -> applyColorMap chain on a block of frames.
+
+    Every stage runs once over the whole block, and the output is bit-identical to applying
+    the chain to each frame separately. With `auto_gain`, the gain is updated from each
+    frame's smoothed difference in order, as the per-frame loops do, and applied frame by frame.
+
+    Parameters:
+        frames_bw (ndarray): (N, H, W) uint8 grayscale frames.
+        references_bw (ndarray): (N, H, W) uint8 reference frame for each frame.
+        gain (int): Gain factor to amplify the intensity of the difference images.
+        colormap (int): OpenCV colormap used for visualization.
+        auto_gain (AutoGain): Optional `BOS_AutoGain.AutoGain` choosing the gain of every frame.
+
+    Returns:
+        ndarray: (N, H, W, 3) BGR view of the colored BOS frames.
+    """
+    n, height, width = frames_bw.shape
+    pad = 2
+
+    diff = cv.absdiff(frames_bw.reshape(-1, width), references_bw.reshape(-1, width))
+    diff_smoothed = median_blur_stack(diff.reshape(n, height, width), 5)
+
+    # Amplify and color the padded stack in one pass, then drop the padding rows
+    if auto_gain is None:
+        diff_amplified = cv.multiply(diff_smoothed.reshape(-1, width), gain)
+    else:
+        # The gain of each frame follows from its difference without the padding rows
+        diff_amplified = np.empty_like(diff_smoothed)
+        for i in range(n):
+            cv.multiply(diff_smoothed[i], auto_gain.update(diff_smoothed[i, pad:pad + height]), dst=diff_amplified[i])
+        diff_amplified = diff_amplified.reshape(-1, width)
+    diff_colored = cv.applyColorMap(diff_amplified, colormap)
+    return diff_colored.reshape(n, height + 2 * pad, width, 3)[:, pad:pad + height]
+
+
+def bos_blocks(frames, start_index, block_size, should_update, blend_factor, gain, reference_bw=None, auto_gain=None):
+    """
+    Process a stream of BGR frames in blocks of `block_size` frames.
+
+    Frames are converted straight into a preallocated contiguous (N, H, W) block, the
+    reference model is stepped exactly like the per-frame loops, and the difference, blur,
+    gain and colormap stages run once per block through `bos_block`.
+
+    Parameters:
+        frames (iterable): BGR frames.
+        start_index (int): Frame index of the first frame.
+        block_size (int): Number of frames processed per block.
+        should_update (callable): `should_update(frame_index, reference_bw)` returns True
+            when the reference frame updates at this frame.
+        blend_factor (float): Factor for blending the current reference frame with the previous one (0 to 1).
+        gain (int): Gain factor to amplify the intensity of the difference images.
+        reference_bw (ndarray): Initial reference frame, or None to start from the first update.
+        auto_gain (AutoGain): Optional `BOS_AutoGain.AutoGain` choosing the gain of every frame (see `bos_block`).
+
+    Yields:
+        tuple: (frame_index, diff_colored) for every frame, in order.
+    """
+    frames = iter(frames)
+    end = object()
+    block = references = None
+    previous_reference_bw = None
+    frame_index = start_index
+
+    while True:
+        count = 0
+        while count < block_size:
+            frame = next(frames, end)
+            if frame is end:
+                break
+            if block is None:
+                height, width = frame.shape[:2]
+                block = np.empty((block_size, height, width), dtype=np.uint8)
+                references = np.empty_like(block)
+
+            frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY, dst=block[count])
+
+            # Step the reference model exactly as the per-frame loop does
+            if should_update(frame_index, reference_bw):
+                reference_bw = update_reference(frame_bw, previous_reference_bw, blend_factor)
+            references[count] = reference_bw
+            previous_reference_bw = reference_bw
+
+            count += 1
+            frame_index += 1
+
+        if count == 0:
+            return
+
+        diff_colored = bos_block(block[:count], references[:count], gain, auto_gain=auto_gain)
+        yield from zip(range(frame_index - count, frame_index), diff_colored)
+
+
+def smoothed_differences(gray_frames, start_index, should_update, blend_factor, reference_bw=None, block_size=64):
+    """
+    Yield the median-smoothed absolute difference of every frame of a grayscale stack.
+
+    This is the part of the BOS chain upstream of gain and colormap, computed block by block
+    with the same reference model as the per-frame loops.
+
+    Parameters:
+        gray_frames (ndarray): (N, H, W) uint8 grayscale frames (a memory map is fine).
+        start_index (int): Frame index of the first frame.
+        should_update (callable): `should_update(frame_index, reference_bw)` as in `bos_blocks`.
+        blend_factor (float): Factor for blending the current reference frame with the previous one (0 to 1).
+        reference_bw (ndarray): Initial reference frame, or None to start from the first update.
+        block_size (int): Number of frames processed per block.
+
+    Yields:
+        ndarray: (H, W) uint8 smoothed difference for each frame, in order.
+    """
+    n, height, width = gray_frames.shape
+    references = np.empty((min(block_size, n), height, width), dtype=np.uint8)
+    previous_reference_bw = None
+
+    for b0 in range(0, n, block_size):
+        block = np.ascontiguousarray(gray_frames[b0:b0 + block_size])
+        count = len(block)
+        for i in range(count):
+            if should_update(start_index + b0 + i, reference_bw):
+                reference_bw = update_reference(block[i], previous_reference_bw, blend_factor)
+            references[i] = reference_bw
+            previous_reference_bw = reference_bw
+
+        diff = cv.absdiff(block.reshape(-1, width), references[:count].reshape(-1, width))
+        diff_smoothed = median_blur_stack(diff.reshape(count, height, width), 5)
+        yield from diff_smoothed[:, 2:2 + height]
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import cv2 as cv
+
+
+class _Client:
+    """One connected viewer: a single-slot queue holding the newest frame not yet sent."""
+
+    def __init__(self):
+        self.queue   = asyncio.Queue(maxsize=1)
+        self.sent    = 0
+        self.dropped = 0
+
+
+class FrameBroadcaster:
+    """
+    Local MJPEG-over-HTTP server that fans processed BOS frames out to any number of viewers.
+
+    Each frame is JPEG-encoded once by the publishing thread (and only while someone is
+    watching), then handed to an asyncio loop running on its own thread. Every client owns a
+    one-frame queue: if a viewer is still sending the previous frame, the waiting frame is
+    replaced instead of buffered, so slow viewers skip frames and never delay the others.
+
+    Open http://<host>:<port>/<channel> in a browser or VLC to watch a channel.
+
+    Parameters:
+        host (str): Interface to listen on (localhost by default).
+        port (int): TCP port of the HTTP server.
+        quality (int): JPEG quality (0-100).
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, quality=80):
+        self.host    = host
+        self.port    = port
+        self.quality = quality
+
+        self.frames_encoded = 0
+
+        self._clients = {}   # channel -> set of _Client, only touched on the event loop
+        self._loop    = asyncio.new_event_loop()
+        self._thread  = threading.Thread(target=self._run, daemon=True)
+        self._ready   = threading.Event()
+        self._server  = None
+        self._error   = None
+
+    def start(self):
+        """
+        Start the server thread and wait until it is listening.
+
+        Returns:
+            bool: True once the server listens, False if it could not bind (e.g. the port is in use)
+                or did not start within 5 seconds.
+        """
+        self._thread.start()
+        if not self._ready.wait(5.0):
+            print(f"Error: The broadcast server on port {self.port} did not start in time.")
+            return False
+        if self._error is not None:
+            print(f"Error: Unable to broadcast on {self.host}:{self.port}: {self._error}")
+            return False
+        print(f"Broadcasting BOS frames on http://{self.host}:{self.port}/")
+        return True
+
+    def stop(self):
+        """Disconnect all viewers and stop the server thread."""
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(2.0)
+
+    def client_count(self, channel="0"):
+        return len(self._clients.get(channel, ()))
+
+    def publish(self, frame, channel="0"):
+        """
+        Encode `frame` once and queue it for every viewer of `channel`.
+
+        Safe to call from any thread. Does nothing while the channel has no viewers.
+
+        Returns:
+            bool: True if the frame was encoded and sent to the viewers.
+        """
+        if not self._clients.get(channel):
+            return False
+
+        ok, jpeg = cv.imencode(".jpg", frame, [cv.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return False
+        self.frames_encoded += 1
+        self._loop.call_soon_threadsafe(self._fan_out, channel, jpeg.tobytes())
+        return True
+
+    def _fan_out(self, channel, jpeg):
+        for client in self._clients.get(channel, ()):
+            # Replace the unsent frame of a slow viewer instead of queueing behind it
+            if client.queue.full():
+                client.queue.get_nowait()
+                client.dropped += 1
+            client.queue.put_nowait(jpeg)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as exc:
+            # Reported by start(); the thread ends without serving
+            self._error = exc
+            self._loop.close()
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        parts   = request.split(b" ", 2)
+        path    = parts[1].decode("latin-1") if len(parts) > 1 else "/"
+        channel = path.split("?", 1)[0].strip("/") or "0"
+
+        # Only one frame may sit in the socket buffer, so drain() waits for slow viewers
+        writer.transport.set_write_buffer_limits(high=0)
+
+        client = _Client()
+        self._clients.setdefault(channel, set()).add(client)
+        try:
+            writer.write(b"HTTP/1.0 200 OK\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Connection: close\r\n"
+                         b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n\r\n")
+            while True:
+                jpeg = await client.queue.get()
+                writer.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg))
+                writer.write(jpeg)
+                writer.write(b"\r\n")
+                await writer.drain()
+                client.sent += 1
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients[channel].discard(client)
+            writer.close()
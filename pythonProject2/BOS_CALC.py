@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.optimize import minimize
 
 # Given parameters for the BOS setup
 f = 0.06  # Focal length of the lens in meters (60 mm)
@@ -10,6 +9,9 @@ epsilon_y = 1e-3  # Deflection angle (radians)
 
 # Optimize ZD, ZA, ZB for maximum sensitivity and focus
 def optimize_distances():
+    # Imported here, so importing the constants does not pay for loading scipy
+    from scipy.optimize import minimize
+
     def lens_equation(params):
         ZD, ZA = params  # Distances to optimize
         ZB = ZD + ZA  # Total distance to the background
@@ -0,0 +1,129 @@
+import glob
+import hashlib
+import os
+import numpy as np
+
+
+def input_signature(paths):
+    """
+    Hash identifying a set of input files by path, size and modification time.
+
+    Stat-based rather than content-based, so signing a 100k-frame folder costs no reads;
+    editing or replacing any file changes the signature.
+
+    Parameters:
+        paths (list): Input file paths.
+
+    Returns:
+        str: Hex digest.
+    """
+    h = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of intermediate frame stacks, keyed by a hash of the inputs and stage parameters.
+
+    Each entry is a raw (N, H, W) array written frame by frame, so a stage never has to hold a
+    whole recording in memory, and it is read back as a read-only memory map. The total size is
+    kept under `max_bytes` by evicting the least recently used entries.
+
+    Parameters:
+        folder (str): Cache folder.
+        max_bytes (int): Maximum total size of the cache on disk.
+    """
+
+    def __init__(self, folder="bos_cache", max_bytes=20 * 2**30):
+        self.folder    = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """Hash any repr-able stage description (input signature, parameters, ...)."""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+
+    def _find(self, key):
+        matches = glob.glob(os.path.join(self.folder, f"{key}_*.raw"))
+        return matches[0] if matches else None
+
+    def load(self, key):
+        """
+        Return the cached stack for `key` as a read-only memory map, or None on a miss.
+        """
+        path = self._find(key)
+        if path is None:
+            return None
+
+        # File name: <key>_<dtype>_<H>x<W>.raw
+        _, dtype, size = os.path.basename(path)[:-4].rsplit("_", 2)
+        height, width = (int(v) for v in size.split("x"))
+        frame_bytes = np.dtype(dtype).itemsize * height * width
+        count = os.path.getsize(path) // frame_bytes
+        if count == 0:
+            return None
+
+        os.utime(path)  # mark as recently used
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count, height, width))
+
+    def store(self, key, frames):
+        """
+        Write an iterable of equally sized frames under `key` and return it as a memory map.
+
+        A stack larger than `max_bytes` is still returned for the current run, but it is not
+        kept in the cache: its file is removed as soon as it is mapped (or, where a mapped file
+        cannot be removed, by the next eviction).
+        """
+        tmp_path = os.path.join(self.folder, f"{key}.tmp")
+        shape = dtype = None
+        with open(tmp_path, "wb") as f:
+            for frame in frames:
+                if shape is None:
+                    shape, dtype = frame.shape, frame.dtype
+                f.write(np.ascontiguousarray(frame).data)
+
+        if shape is None:
+            os.remove(tmp_path)
+            return None
+        path = os.path.join(self.folder, f"{key}_{dtype}_{shape[0]}x{shape[1]}.raw")
+        os.replace(tmp_path, path)
+
+        # An entry that alone exceeds the budget would stay forever and keep the cache over it
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            print(f"Warning: The stack ({size / 2**30:.2f} GB) is larger than the cache limit "
+                  f"({self.max_bytes / 2**30:.2f} GB); it is used for this run but not cached.")
+            stack = self.load(key)
+            try:
+                os.remove(path)  # the memory map keeps the data until it is closed
+            except OSError:
+                pass  # removed by the next evict()
+            self.evict()
+            return stack
+
+        self.evict(keep=key)
+        return self.load(key)
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for path in glob.glob(os.path.join(self.folder, "*.raw")):
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.basename(path).startswith(f"{keep}_"):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # still memory-mapped by a running job
+            total -= size
+            print(f"Evicted {os.path.basename(path)} from the cache")
@@ -0,0 +1,134 @@
+import os
+import pickle
+import shutil
+import subprocess
+import cv2 as cv
+
+
+class CheckpointedOutput:
+    """
+    Drop-in replacement for `cv.VideoWriter` that writes the output in segments and saves a
+    checkpoint of the processing state after every `interval` frames.
+
+    A video file is only readable once it is closed, so each checkpoint closes the current
+    segment (<name>.part0000.mp4, ...) and then atomically saves the state next to the output
+    (<output>.ckpt). After a crash, `resume=True` restores the state and the list of finished
+    segments, and processing continues with the next segment. `release()` joins the segments
+    into the final file and removes the checkpoint. Segment boundaries depend only on
+    `interval`, so a resumed run writes exactly the same segments as an uninterrupted one.
+
+    Parameters:
+        output_path (str): Final output video.
+        fourcc (int): Codec of the segments.
+        fps (float): Frame rate of the output.
+        size (tuple): (width, height) of the frames.
+        interval (int): Frames between checkpoints.
+        params (tuple): Run parameters; a checkpoint is only resumed with identical parameters.
+        resume (bool): Continue from an existing checkpoint instead of starting over.
+    """
+
+    def __init__(self, output_path, fourcc, fps, size, interval, params, resume=False):
+        self.output_path     = output_path
+        self.checkpoint_path = output_path + ".ckpt"
+        self.fourcc   = fourcc
+        self.fps      = fps
+        self.size     = size
+        self.interval = interval
+        self.params   = repr(params)
+
+        self.state    = None   # processing state restored from the checkpoint
+        self.segments = []
+        self.frames   = 0
+        self._writer  = None
+
+        if resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "rb") as f:
+                checkpoint = pickle.load(f)
+            if checkpoint["params"] != self.params:
+                raise ValueError(f"Checkpoint {self.checkpoint_path} was written with different parameters; "
+                                 f"delete it or run without resume.")
+            self.state    = checkpoint["state"]
+            self.segments = checkpoint["segments"]
+            self.frames   = checkpoint["frames"]
+            print(f"Resuming from checkpoint after {self.frames} frames ({len(self.segments)} segment(s) kept).")
+        elif os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _segment_path(self, number):
+        stem, ext = os.path.splitext(self.output_path)
+        return f"{stem}.part{number:04d}{ext}"
+
+    def write(self, frame):
+        if self._writer is None:
+            path = self._segment_path(len(self.segments))
+            self._writer = cv.VideoWriter(path, self.fourcc, self.fps, self.size)
+            self.segments.append(path)
+        self._writer.write(frame)
+
+    def step(self, get_state):
+        """
+        Count a processed frame and checkpoint when the interval is reached.
+
+        Parameters:
+            get_state (callable): Returns the state dict to save; only called at checkpoints.
+        """
+        self.frames += 1
+        if self.frames % self.interval:
+            return
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"params": self.params, "state": get_state(), "segments": self.segments,
+                         "frames": self.frames}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def release(self):
+        """Close the last segment, join all segments into the output and remove the checkpoint."""
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        if self.segments:
+            join_segments(self.segments, self.output_path, self.fourcc, self.fps, self.size)
+        for path in self.segments:
+            if os.path.exists(path):
+                os.remove(path)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def join_segments(segments, output_path, fourcc, fps, size):
+    """
+    Concatenate video segments into one file.
+
+    Uses ffmpeg's concat demuxer without re-encoding when ffmpeg is installed; otherwise the
+    segments are decoded and re-encoded with OpenCV.
+    """
+    if len(segments) == 1:
+        shutil.copyfile(segments[0], output_path)
+        return
+
+    if shutil.which("ffmpeg"):
+        list_path = output_path + ".segments.txt"
+        with open(list_path, "w") as f:
+            for path in segments:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        result = subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                                 "-i", list_path, "-c", "copy", output_path])
+        os.remove(list_path)
+        if result.returncode == 0:
+            return
+        print("Warning: ffmpeg could not join the segments, re-encoding them instead.")
+
+    out = cv.VideoWriter(output_path, fourcc, fps, size)
+    for path in segments:
+        video = cv.VideoCapture(path)
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                break
+            out.write(frame)
+        video.release()
+    out.release()
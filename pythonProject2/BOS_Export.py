@@ -0,0 +1,106 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2 as cv
+
+
+class SequenceExporter:
+    """
+    Lossless export of processed frames as a numbered PNG or TIFF sequence.
+
+    `write()` only copies the frame and hands it to a thread pool; encoding and writing happen
+    in the pool threads (OpenCV releases the GIL while encoding), so several frames are encoded
+    in parallel and the processing loop does not wait for the much slower PNG compression.
+    At most `max_pending` frames wait in memory. When the pool falls that far behind, a live
+    loop (`block=False`) drops the frame and counts it instead of stalling, while an offline
+    run (`block=True`) waits for a free place so every frame is written.
+
+    Parameters:
+        directory (str): Output folder (created if missing).
+        prefix (str): File name prefix; files are named <prefix>_<number>.<format>.
+        image_format (str): "png" or "tif".
+        compression (int): PNG compression level (0 fastest to 9 smallest). For TIFF, 0 writes
+            uncompressed files and any other value LZW-compressed ones.
+        workers (int): Number of encoding threads (defaults to the CPU count).
+        max_pending (int): Frames that may wait for encoding before `write()` drops or blocks.
+        block (bool): Wait for a free place instead of dropping frames when the pool is behind.
+    """
+
+    def __init__(self, directory, prefix="bos", image_format="png", compression=3, workers=None, max_pending=64,
+                 block=False):
+        image_format = image_format.lower().lstrip(".")
+        if image_format not in ("png", "tif", "tiff"):
+            raise ValueError(f"Unsupported export format {image_format!r}; use 'png' or 'tif'.")
+        if image_format == "png":
+            self.params = [cv.IMWRITE_PNG_COMPRESSION, int(compression)]
+        else:
+            self.params = [cv.IMWRITE_TIFF_COMPRESSION, 5 if compression else 1]  # libtiff codes: LZW, none
+
+        self.directory    = directory
+        self.prefix       = prefix
+        self.image_format = image_format
+        self.block        = block
+
+        self.written = 0
+        self.dropped = 0
+        self.failed  = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._next     = 0
+        self._slots    = threading.BoundedSemaphore(max_pending)
+        self._lock     = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers or os.cpu_count(), thread_name_prefix="export")
+
+    def path(self, number):
+        return os.path.join(self.directory, f"{self.prefix}_{number:06d}.{self.image_format}")
+
+    def write(self, frame, number=None):
+        """
+        Queue a frame for export.
+
+        Parameters:
+            frame (ndarray): Processed frame (BGR or grayscale); it is copied, so the caller may reuse it.
+            number (int): Sequence number in the file name (defaults to one more than the previous frame).
+
+        Returns:
+            bool: True if the frame was queued, False if it was dropped.
+        """
+        if number is None:
+            number = self._next
+        self._next = number + 1
+        return self.save(self.path(number), frame)
+
+    def save(self, filename, frame):
+        """Queue a single frame for writing to `filename` (any format `cv.imwrite` supports)."""
+        if not self._slots.acquire(blocking=self.block):
+            self.dropped += 1
+            return False
+        self._executor.submit(self._encode, filename, frame.copy())
+        return True
+
+    def _encode(self, filename, frame):
+        try:
+            params = self.params if filename.endswith("." + self.image_format) else []
+            ok = cv.imwrite(filename, frame, params)
+        except cv.error:
+            ok = False
+        finally:
+            self._slots.release()
+        with self._lock:
+            if ok:
+                self.written += 1
+            else:
+                self.failed += 1
+                print(f"Error: Unable to write {filename}.")
+
+    def close(self):
+        """Wait for all queued frames to be written."""
+        self._executor.shutdown(wait=True)
+
+    def report(self):
+        text = f"Exported {self.written} frame(s) to {self.directory}"
+        if self.dropped:
+            text += f", dropped {self.dropped} while the encoders were behind"
+        if self.failed:
+            text += f", {self.failed} failed"
+        return text
@@ -0,0 +1,220 @@
+import abc
+import time
+import cv2 as cv
+import numpy as np
+from BOS_Ratio import RatioBackground
+
+
+class _Filter(abc.ABC):
+    """
+    Base class of the GUI filters applied to the BOS difference image.
+
+    Each filter declares the depth it works in (`depth`) and keeps its full-frame scratch
+    buffers between frames, so the hot path allocates nothing once the frame size is known.
+    `apply` returns a uint8 image that stays valid until the next call on the same instance.
+    """
+
+    depth = cv.CV_8U
+
+    def __init__(self):
+        self._scratch = {}
+
+    def _buffer(self, key, shape, dtype=np.uint8):
+        buf = self._scratch.get(key)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._scratch[key] = buf
+        return buf
+
+    @abc.abstractmethod
+    def apply(self, diff, p, gray, background_gray):
+        """
+        Filter the difference image.
+
+        Parameters:
+            diff (ndarray): uint8 absolute difference between the frame and the background.
+            p (int): Filter parameter from the GUI slider.
+            gray (ndarray): Grayscale frame.
+            background_gray (ndarray): Grayscale background frame.
+
+        Returns:
+            ndarray: uint8 filtered image.
+        """
+
+
+class GaussianFilter(_Filter):
+    def apply(self, diff, p, gray, background_gray):
+        k = max(1, int(p)) | 1
+        return cv.GaussianBlur(diff, (k, k), 0, dst=self._buffer("out", diff.shape))
+
+
+class MedianFilter(_Filter):
+    def apply(self, diff, p, gray, background_gray):
+        k = max(1, int(p)) | 1
+        return cv.medianBlur(diff, k, dst=self._buffer("out", diff.shape))
+
+
+class BilateralFilter(_Filter):
+    def apply(self, diff, p, gray, background_gray):
+        sigma = max(1, int(p))
+        return cv.bilateralFilter(diff, 9, sigma, sigma, dst=self._buffer("out", diff.shape))
+
+
+class SobelFilter(_Filter):
+    """
+    Gradient magnitude of the difference image.
+
+    Parameters:
+        magnitude (str): "approx" computes the derivatives in CV_16S and combines them as
+            max + min / 2 (at most 11.8% above the true magnitude, never below); "exact"
+            computes them in CV_32F and uses `cv.magnitude`.
+    """
+
+    def __init__(self, magnitude="approx"):
+        super().__init__()
+        if magnitude not in ("approx", "exact"):
+            raise ValueError(f"Unknown magnitude mode '{magnitude}' (use 'approx' or 'exact').")
+        self.magnitude = magnitude
+        self.depth = cv.CV_16S if magnitude == "approx" else cv.CV_32F
+
+    def apply(self, diff, p, gray, background_gray):
+        k = min(max(1, int(p)) | 1, 7)
+        dtype = np.int16 if self.depth == cv.CV_16S else np.float32
+        sx = cv.Sobel(diff, self.depth, 1, 0, dst=self._buffer("sx", diff.shape, dtype), ksize=k)
+        sy = cv.Sobel(diff, self.depth, 0, 1, dst=self._buffer("sy", diff.shape, dtype), ksize=k)
+        out = self._buffer("out", diff.shape)
+
+        if self.magnitude == "exact":
+            mag = cv.magnitude(sx, sy, self._buffer("mag", diff.shape, np.float32))
+            return cv.convertScaleAbs(mag, dst=out)
+
+        # Alpha-max-plus-beta-min on the saturated absolute derivatives; saturation keeps 255 exact
+        ax = cv.convertScaleAbs(sx, dst=self._buffer("ax", diff.shape))
+        ay = cv.convertScaleAbs(sy, dst=self._buffer("ay", diff.shape))
+        high = cv.max(ax, ay, dst=self._buffer("high", diff.shape))
+        low = cv.min(ax, ay, dst=self._buffer("low", diff.shape))
+        return cv.addWeighted(high, 1.0, low, 0.5, 0, dst=out)
+
+
+class LaplacianFilter(_Filter):
+    depth = cv.CV_16S
+
+    def apply(self, diff, p, gray, background_gray):
+        # Integer result; CV_16S saturates, which only affects values clipped to 255 anyway
+        k = min(max(1, int(p)) | 1, 7)
+        lap = cv.Laplacian(diff, self.depth, dst=self._buffer("lap", diff.shape, np.int16), ksize=k)
+        return cv.convertScaleAbs(lap, dst=self._buffer("out", diff.shape))
+
+
+class UnsharpFilter(_Filter):
+    depth = cv.CV_32F
+
+    def apply(self, diff, p, gray, background_gray):
+        # diff + amount * (diff - blur) folded into one saturating addWeighted
+        amount = float(p) / 50.0
+        blur = cv.GaussianBlur(diff, (5, 5), 0, dst=self._buffer("blur", diff.shape))
+        return cv.addWeighted(diff, 1.0 + amount, blur, -amount, 0, dst=self._buffer("out", diff.shape))
+
+
+class RatioFilter(_Filter):
+    depth = cv.CV_32F
+
+    def __init__(self):
+        super().__init__()
+        self._ratio = RatioBackground()  # reciprocal follows the background array
+
+    def apply(self, diff, p, gray, background_gray):
+        return self._ratio.ratio8(gray, background_gray, float(p))
+
+
+# GUI filter names and their implementations
+FILTERS = {
+    "Gaussian Blur":    GaussianFilter,
+    "Median Filter":    MedianFilter,
+    "Bilateral Filter": BilateralFilter,
+    "Sobel Edges":      SobelFilter,
+    "Laplacian Edges":  LaplacianFilter,
+    "Unsharp Masking":  UnsharpFilter,
+    "Ratio":            RatioFilter,
+}
+
+
+def _legacy_filter(name, diff, p, gray, background_gray):
+    # The float64 implementations the filter classes replace, kept for the benchmark
+    if name == "Sobel Edges":
+        k = min(max(1, int(p)) | 1, 7)
+        sx = cv.Sobel(diff, cv.CV_64F, 1, 0, ksize=k)
+        sy = cv.Sobel(diff, cv.CV_64F, 0, 1, ksize=k)
+        return cv.convertScaleAbs(np.hypot(sx, sy))
+    if name == "Laplacian Edges":
+        k = min(max(1, int(p)) | 1, 7)
+        return cv.convertScaleAbs(cv.Laplacian(diff, cv.CV_64F, ksize=k))
+    if name == "Unsharp Masking":
+        amount = float(p) / 50.0
+        blur = cv.GaussianBlur(diff, (5, 5), 0)
+        high = diff.astype(np.float32) - blur.astype(np.float32)
+        return np.clip(diff.astype(np.float32) + amount * high, 0, 255).astype(np.uint8)
+    if name == "Ratio":
+        ratio_diff = np.abs(gray.astype(np.float32) / (background_gray.astype(np.float32) + 1e-6) - 1.0)
+        return np.clip(ratio_diff * 255 * float(p), 0, 255).astype(np.uint8)
+    return FILTERS[name]().apply(diff, p, gray, background_gray)
+
+
+# Per-frame cost at 1920x1080, one thread (cv.setNumThreads(1)), 100 frames per row:
+#
+#   filter              param | float64 ms | filter ms | speedup | max diff
+#   Gaussian Blur           5 |       1.89 |      1.50 |    1.3x |   0
+#   Median Filter           5 |       4.09 |      4.12 |    1.0x |   0
+#   Bilateral Filter       50 |      51.98 |     54.92 |    0.9x |   0
+#   Sobel Edges             3 |      78.30 |      5.30 |   14.8x |  27
+#   Sobel Edges (exact)     3 |      65.30 |      6.63 |    9.8x |   0
+#   Laplacian Edges         3 |       5.11 |      1.59 |    3.2x |   0
+#   Unsharp Masking        50 |      13.14 |      2.07 |    6.3x |   0
+#   Ratio                  10 |      11.07 |      2.03 |    5.5x |   1
+#
+# The blur filters already ran in uint8 and only gain the reused output buffer (their differences
+# are timing noise). Max diff is in gray levels against the float64 code; the Sobel approximation
+# overestimates the magnitude by at most 11.8%. Regenerate with `python BOS_Filters.py`.
+def benchmark(width=1920, height=1080, repeats=100, threads=1):
+    """
+    Time every GUI filter against its original float64 implementation and print a table.
+
+    Parameters:
+        width (int): Frame width.
+        height (int): Frame height.
+        repeats (int): Number of timed frames per filter.
+        threads (int): OpenCV thread count during the benchmark.
+    """
+    cv.setNumThreads(threads)
+    rng = np.random.default_rng(0)
+    background_gray = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    gray = cv.GaussianBlur(np.clip(background_gray + rng.integers(-12, 13, (height, width)), 0, 255).astype(np.uint8),
+                           (3, 3), 0)
+    diff = cv.absdiff(gray, background_gray)
+
+    cases = [("Gaussian Blur", 5, GaussianFilter()), ("Median Filter", 5, MedianFilter()),
+             ("Bilateral Filter", 50, BilateralFilter()), ("Sobel Edges", 3, SobelFilter()),
+             ("Sobel Edges", 3, SobelFilter("exact")), ("Laplacian Edges", 3, LaplacianFilter()),
+             ("Unsharp Masking", 50, UnsharpFilter()), ("Ratio", 10, RatioFilter())]
+
+    print(f"{'filter':<19} {'param':>5} | {'float64 ms':>10} | {'filter ms':>9} | {'speedup':>7} | max diff")
+    for name, p, filt in cases:
+        label = name + (" (exact)" if getattr(filt, "magnitude", None) == "exact" else "")
+        expected = _legacy_filter(name, diff, p, gray, background_gray)
+        max_diff = int(np.abs(expected.astype(np.int16) - filt.apply(diff, p, gray, background_gray)).max())
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            _legacy_filter(name, diff, p, gray, background_gray)
+        legacy_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            filt.apply(diff, p, gray, background_gray)
+        filter_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        print(f"{label:<19} {p:>5} | {legacy_ms:>10.2f} | {filter_ms:>9.2f} | {legacy_ms / filter_ms:>6.1f}x | {max_diff:>3}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,133 @@
+import importlib.util
+import time
+import cv2 as cv
+import numpy as np
+
+# Numba takes longer to import than the rest of the pipeline, so it is only imported (and the
+# kernel compiled) on the first call of `bos_fused`; the scripts importing this module stay fast.
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+_fused_kernel = None
+
+# Compare-exchange network whose element 12 is the median of 25 values (5x5 window,
+# row-major). Checked against every 0/1 input, so it is exact for all uint8 inputs.
+MEDIAN25_NETWORK = np.array([
+    (1, 2), (0, 1), (1, 2), (4, 5), (3, 4), (4, 5), (0, 3), (2, 5), (2, 3), (1, 4), (1, 2), (3, 4),
+    (7, 8), (6, 7), (7, 8), (10, 11), (9, 10), (10, 11), (6, 9), (8, 11), (8, 9), (7, 10), (7, 8),
+    (9, 10), (0, 6), (4, 10), (4, 6), (2, 8), (2, 4), (6, 8), (1, 7), (5, 11), (5, 7), (3, 9), (3, 5),
+    (7, 9), (1, 2), (3, 4), (5, 6), (7, 8), (9, 10), (13, 14), (12, 13), (13, 14), (16, 17), (15, 16),
+    (16, 17), (12, 15), (14, 17), (14, 15), (13, 16), (13, 14), (15, 16), (19, 20), (18, 19), (19, 20),
+    (21, 22), (23, 24), (21, 23), (22, 24), (22, 23), (18, 21), (20, 23), (20, 21), (19, 22), (22, 24),
+    (19, 20), (21, 22), (23, 24), (12, 18), (16, 22), (16, 18), (14, 20), (20, 24), (14, 16), (18, 20),
+    (22, 24), (13, 19), (17, 23), (17, 19), (15, 21), (15, 17), (19, 21), (13, 14), (15, 16), (17, 18),
+    (19, 20), (21, 22), (23, 24), (0, 12), (8, 20), (8, 12), (4, 16), (16, 24), (12, 16), (2, 14),
+    (10, 22), (10, 14), (6, 18), (6, 10), (10, 12), (1, 13), (9, 21), (9, 13), (5, 17), (13, 17),
+    (3, 15), (11, 23), (11, 15), (7, 19), (7, 11), (11, 13), (11, 12),
+], dtype=np.int64)
+
+
+def bos_lut(gain, colormap=cv.COLORMAP_JET):
+    """
+    Build the 256-entry BGR table equal to `applyColorMap(multiply(v, gain))` for every value v.
+
+    The table is produced by the OpenCV calls themselves, so rounding and saturation match
+    the standard chain exactly.
+
+    Parameters:
+        gain (int): Gain factor to amplify the intensity of the difference images.
+        colormap (int): OpenCV colormap used for visualization.
+
+    Returns:
+        ndarray: (256, 3) uint8 lookup table.
+    """
+    values = np.arange(256, dtype=np.uint8).reshape(1, 256)
+    return cv.applyColorMap(cv.multiply(values, gain), colormap).reshape(256, 3)
+
+
+def _compile_kernel():
+    """Import Numba and compile the fused kernel on first use."""
+    global _fused_kernel
+    if _fused_kernel is None:
+        if not HAVE_NUMBA:
+            raise RuntimeError("The fused BOS kernel requires numba (pip install numba).")
+        from BOS_FusedKernel import fused_kernel
+        _fused_kernel = fused_kernel
+    return _fused_kernel
+
+
+def bos_fused(frame_bw, reference_bw, gain, colormap=cv.COLORMAP_JET, out=None, band=32, lut=None):
+    """
+    Fused absdiff -> medianBlur(5) -> multiply(gain) -> applyColorMap in one tiled pass.
+
+    Each band of `band` rows is differenced into a small cached buffer, median-filtered with a
+    sorting network and mapped through a combined gain/colormap table; bands run in parallel on
+    all cores. The result is bit-exact with the OpenCV chain. Requires Numba.
+
+    Parameters:
+        frame_bw (ndarray): Grayscale uint8 frame.
+        reference_bw (ndarray): Grayscale uint8 reference frame.
+        gain (int): Gain factor to amplify the intensity of the difference images.
+        colormap (int): OpenCV colormap used for visualization.
+        out (ndarray): Optional preallocated (H, W, 3) uint8 output.
+        band (int): Rows per tile.
+        lut (ndarray): Optional table from `bos_lut(gain, colormap)` to skip rebuilding it.
+
+    Returns:
+        ndarray: (H, W, 3) colored BOS frame.
+    """
+    kernel = _compile_kernel()
+
+    if lut is None:
+        lut = bos_lut(gain, colormap)
+    if out is None:
+        out = np.empty(frame_bw.shape + (3,), dtype=np.uint8)
+    kernel(frame_bw, reference_bw, lut, MEDIAN25_NETWORK, out, band)
+    return out
+
+
+def bos_opencv(frame_bw, reference_bw, gain, colormap=cv.COLORMAP_JET):
+    """Reference OpenCV chain used by the BOS scripts."""
+    diff = cv.absdiff(frame_bw, reference_bw)
+    diff_smoothed = cv.medianBlur(diff, 5)
+    diff_amplified = cv.multiply(diff_smoothed, gain)
+    return cv.applyColorMap(diff_amplified, colormap)
+
+
+def benchmark(sizes=((64, 64), (256, 256), (640, 480), (1280, 720), (1920, 1080)), gain=10, repeats=50):
+    """
+    Compare the fused kernel with the OpenCV chain and print a per-frame timing table.
+
+    Parameters:
+        sizes (tuple): Frame sizes (width, height) to test.
+        gain (int): Gain factor used for both paths.
+        repeats (int): Number of timed frames per size.
+    """
+    rng = np.random.default_rng(0)
+    lut = bos_lut(gain)
+
+    print(f"{'size':>11} | {'OpenCV ms':>9} | {'fused ms':>8} | {'speedup':>7} | exact")
+    for width, height in sizes:
+        reference_bw = rng.integers(0, 256, (height, width), dtype=np.uint8)
+        noise = rng.integers(-8, 9, (height, width))
+        frame_bw = np.clip(reference_bw + noise, 0, 255).astype(np.uint8)
+        out = np.empty((height, width, 3), dtype=np.uint8)
+
+        # Warm up (and JIT-compile on the first call)
+        expected = bos_opencv(frame_bw, reference_bw, gain)
+        exact = np.array_equal(expected, bos_fused(frame_bw, reference_bw, gain, out=out, lut=lut))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            bos_opencv(frame_bw, reference_bw, gain)
+        opencv_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            bos_fused(frame_bw, reference_bw, gain, out=out, lut=lut)
+        fused_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        print(f"{width:>5}x{height:<5} | {opencv_ms:9.3f} | {fused_ms:8.3f} | {opencv_ms / fused_ms:6.2f}x | {exact}")
+
+
+if __name__ == "__main__":
+    benchmark()
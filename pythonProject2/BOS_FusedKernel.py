@@ -0,0 +1,49 @@
+import numpy as np
+from numba import njit, prange
+
+# Numba kernel of `BOS_Fused.bos_fused`, kept in its own module so that numba is only
+# imported (and the kernel compiled) when the fused path is first used.
+
+
+@njit(parallel=True, cache=True)
+def fused_kernel(frame_bw, reference_bw, lut, network, out, band):
+    height, width = frame_bw.shape
+    bands = (height + band - 1) // band
+
+    for b in prange(bands):
+        y0 = b * band
+        y1 = min(height, y0 + band)
+
+        # Difference of this band plus a 2-pixel replicated halo, kept in cache
+        rows = np.empty((y1 - y0 + 4, width + 4), dtype=np.uint8)
+        for r in range(y1 - y0 + 4):
+            y = min(max(y0 + r - 2, 0), height - 1)
+            for x in range(width):
+                a = frame_bw[y, x]
+                c = reference_bw[y, x]
+                rows[r, x + 2] = a - c if a > c else c - a
+            rows[r, 0] = rows[r, 2]
+            rows[r, 1] = rows[r, 2]
+            rows[r, width + 2] = rows[r, width + 1]
+            rows[r, width + 3] = rows[r, width + 1]
+
+        # Median of each 5x5 window for a whole row at once, then gain and colormap lookup
+        window = np.empty((25, width), dtype=np.uint8)
+        for y in range(y0, y1):
+            r = y - y0
+            for dy in range(5):
+                for dx in range(5):
+                    window[dy * 5 + dx, :] = rows[r + dy, dx:dx + width]
+            for k in range(network.shape[0]):
+                i = network[k, 0]
+                j = network[k, 1]
+                for x in range(width):
+                    a = window[i, x]
+                    c = window[j, x]
+                    window[i, x] = min(a, c)
+                    window[j, x] = max(a, c)
+            for x in range(width):
+                v = window[12, x]
+                out[y, x, 0] = lut[v, 0]
+                out[y, x, 1] = lut[v, 1]
+                out[y, x, 2] = lut[v, 2]
@@ -0,0 +1,333 @@
+import os
+import xml.etree.ElementTree as ET
+import cv2 as cv
+import numpy as np
+
+
+def read_photron_header(header_path):
+    """
+    Read the metadata of a Photron recording from its .cih (text) or .cihx (XML) header.
+
+    Parameters:
+        header_path (str): Path to the .cih or .cihx file.
+
+    Returns:
+        dict: Header entries; the keys used by `PhotronRaw` are normalised to `width`, `height`,
+            `bit_depth`, `effective_bit_depth`, `effective_bit_side`, `frame_count` and `fps`.
+    """
+    with open(header_path, "rb") as f:
+        data = f.read()
+
+    metadata = {}
+    if header_path.lower().endswith(".cihx"):
+        # .cihx files carry a binary preamble before the <cih> XML document
+        start, end = data.find(b"<cih>"), data.rfind(b"</cih>")
+        root = ET.fromstring(data[start:end + len(b"</cih>")])
+        for element in root.iter():
+            if len(element) == 0 and element.text:
+                metadata.setdefault(element.tag, element.text.strip())
+        keys = {"width": "width", "height": "height", "bit_depth": "bit", "frame_count": "totalFrame",
+                "fps": "recordRate", "effective_bit_depth": "depth", "effective_bit_side": "side"}
+    else:
+        for line in data.decode("latin-1").splitlines():
+            if " : " in line:
+                key, value = line.split(" : ", 1)
+                metadata[key.strip()] = value.strip()
+        keys = {"width": "Image Width", "height": "Image Height", "bit_depth": "Color Bit",
+                "frame_count": "Total Frame", "fps": "Record Rate(fps)",
+                "effective_bit_depth": "EffectiveBit Depth", "effective_bit_side": "EffectiveBit Side"}
+
+    for name, key in keys.items():
+        if key in metadata:
+            metadata[name] = metadata[key]
+    for name in ("width", "height", "bit_depth", "frame_count", "effective_bit_depth"):
+        if name in metadata:
+            metadata[name] = int(metadata[name])
+    if "fps" in metadata:
+        metadata["fps"] = float(metadata["fps"])
+
+    missing = [name for name in ("width", "height", "bit_depth") if name not in metadata]
+    if missing:
+        raise ValueError(f"Header {header_path} is missing {', '.join(missing)}.")
+    return metadata
+
+
+class PhotronRaw:
+    """
+    Memory-mapped reader for Photron .mraw sequences.
+
+    The raw file is mapped, not read, so opening a recording is instant and only the frames
+    that are accessed are paged in. 8- and 16-bit files are returned as views of the map;
+    12-bit packed files (two pixels in three bytes, big-endian) are unpacked to uint16 per frame.
+
+    Parameters:
+        header_path (str): Path to the .cih or .cihx header.
+        raw_path (str): Path to the .mraw file (defaults to the header path with a .mraw extension).
+    """
+
+    def __init__(self, header_path, raw_path=None):
+        self.metadata  = read_photron_header(header_path)
+        self.width     = self.metadata["width"]
+        self.height    = self.metadata["height"]
+        self.bit_depth = self.metadata["bit_depth"]
+        self.fps       = self.metadata.get("fps")
+        if self.bit_depth not in (8, 12, 16):
+            raise ValueError(f"Unsupported Photron bit depth {self.bit_depth}.")
+
+        # Significant bits; 16-bit files may hold fewer bits, aligned to the top of the word
+        self.effective_bit_depth = self.metadata.get("effective_bit_depth", self.bit_depth)
+        self._shift = 0
+        if self.bit_depth == 16 and self.metadata.get("effective_bit_side", "Lower").lower() == "higher":
+            self._shift = 16 - self.effective_bit_depth
+
+        raw_path = raw_path or os.path.splitext(header_path)[0] + ".mraw"
+        self._data = np.memmap(raw_path, dtype=np.uint8, mode="r")
+        self._frame_bytes = self.width * self.height * self.bit_depth // 8
+        available = len(self._data) // self._frame_bytes
+        self.frame_count = min(self.metadata.get("frame_count", available), available)
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        """
+        Return frame `index` as an (H, W) uint8 (8-bit files) or uint16 array.
+        """
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f"Frame {index} out of range (0-{self.frame_count - 1}).")
+
+        return self.rows(index, 0, self.height)
+
+    def rows(self, index, y0, y1):
+        """
+        Return rows `y0` to `y1` of frame `index` as an (y1 - y0, W) array.
+
+        Only the bytes of these rows are paged in (and, for 12-bit files, unpacked), so small
+        regions of interest are read at a fraction of the cost of whole frames.
+        """
+        row_bytes = self.width * self.bit_depth // 8
+        start = index * self._frame_bytes + y0 * row_bytes
+        raw = self._data[start:start + (y1 - y0) * row_bytes]
+        if self.bit_depth == 8:
+            return raw.reshape(y1 - y0, self.width)
+        if self.bit_depth == 16:
+            frame = raw.view("<u2").reshape(y1 - y0, self.width)
+            return frame >> self._shift if self._shift else frame
+
+        # 12-bit: bytes (a, b, c) hold pixels a<<4 | b>>4 and (b & 0xF)<<8 | c
+        packed = raw.reshape(-1, 3).astype(np.uint16)
+        frame = np.empty((packed.shape[0], 2), dtype=np.uint16)
+        frame[:, 0] = (packed[:, 0] << 4) | (packed[:, 1] >> 4)
+        frame[:, 1] = ((packed[:, 1] & 0xF) << 8) | packed[:, 2]
+        return frame.reshape(y1 - y0, self.width)
+
+    def __iter__(self):
+        for index in range(self.frame_count):
+            yield self[index]
+
+
+class Mono16Folder:
+    """
+    Folder of mono 8- or 16-bit images (e.g. Photron 12-bit TIFF exports) read at native depth.
+
+    Frames are decoded with `IMREAD_ANYDEPTH | IMREAD_GRAYSCALE`, so there is no BGR expansion
+    and no conversion to 8 bits. If the folder holds the .cih/.cihx header that Photron software
+    writes next to exported frames, its effective bit depth and frame rate are used.
+
+    Parameters:
+        image_folder (str): Folder containing the image sequence.
+    """
+
+    def __init__(self, image_folder):
+        self.images = sorted([os.path.join(image_folder, img) for img in os.listdir(image_folder)
+                              if img.endswith(('.png', '.tif', '.tiff'))])
+        self.frame_count = len(self.images)
+        self.fps = None
+        self.effective_bit_depth = None
+
+        headers = sorted(img for img in os.listdir(image_folder) if img.lower().endswith(('.cih', '.cihx')))
+        if headers:
+            try:
+                metadata = read_photron_header(os.path.join(image_folder, headers[0]))
+            except ValueError as exc:
+                print(f"Warning: {exc}")
+            else:
+                self.effective_bit_depth = metadata.get("effective_bit_depth", metadata["bit_depth"])
+                self.fps = metadata.get("fps")
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        frame = cv.imread(self.images[index], cv.IMREAD_ANYDEPTH | cv.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise IOError(f"Unable to read {self.images[index]}.")
+        return frame
+
+    def __iter__(self):
+        for index in range(self.frame_count):
+            yield self[index]
+
+
+def infer_bit_depth(frame):
+    """
+    Smallest common sensor depth (10, 12, 14 or 16 bits) holding the brightest pixel of a 16-bit frame.
+
+    A dark frame can underestimate the depth, so pass the real depth when it is known.
+
+    Returns:
+        int: Bit depth (8 for uint8 frames).
+    """
+    if frame.dtype == np.uint8:
+        return 8
+    peak = int(frame.max())
+    for bits in (10, 12, 14):
+        if peak < 2 ** bits:
+            return bits
+    return 16
+
+
+def open_mono_sequence(source):
+    """
+    Open a Photron .cih/.cihx recording or a folder of mono images.
+
+    Parameters:
+        source (str): Header path or image folder.
+
+    Returns:
+        PhotronRaw or Mono16Folder: Indexable, iterable frame sequence.
+    """
+    if source.lower().endswith((".cih", ".cihx")):
+        return PhotronRaw(source)
+    return Mono16Folder(source)
+
+
+def bos_mono16(frame_f32, reference_f32, gain, bit_depth, colormap=cv.COLORMAP_JET):
+    """
+    BOS chain on float32 frames holding native-depth gray levels.
+
+    Differencing and the median blur run in float32, so no dynamic range is lost; the gain
+    is only applied in the final mapping to 8 bits for the colormap. `gain` keeps its 8-bit
+    meaning: a difference of 1/256 of the full scale maps to `gain` display levels.
+
+    Parameters:
+        frame_f32 (ndarray): Frame as float32.
+        reference_f32 (ndarray): Reference frame as float32.
+        gain (float): Gain factor for the difference image.
+        bit_depth (int): Significant bits of the source (8, 12, 16, ...).
+        colormap (int): OpenCV colormap.
+
+    Returns:
+        ndarray: (H, W, 3) uint8 colored BOS frame.
+    """
+    diff = cv.absdiff(frame_f32, reference_f32)
+    diff_smoothed = cv.medianBlur(diff, 5)
+    diff_display = cv.convertScaleAbs(diff_smoothed, alpha=gain / 2 ** (bit_depth - 8))
+    return cv.applyColorMap(diff_display, colormap)
+
+
+def bos_from_mono16(
+    source,
+    output_video_path,
+    gain=10,
+    reference_interval=1,
+    blend_factor=0.5,
+    initial_reference=False,
+    start_frame=0,
+    reference_frame=None,
+    output_frame_rate=30,
+    display=False,
+    bit_depth=None):
+    """
+    Perform BOS processing on a native-depth mono sequence (16-bit TIFF/PNG folder or Photron .mraw).
+
+    Same parameters and reference handling as `bos_from_images`, but frames are never converted
+    to 8 bits: the reference is kept and blended in float32 and the difference is only mapped to
+    8 bits for the colormap.
+
+    Parameters:
+        source (str): Folder with the image sequence, or path to a Photron .cih/.cihx header.
+        output_video_path (str): Path to save the output BOS video.
+        gain (int): Gain factor to amplify the intensity of the difference images.
+        reference_interval (int): Number of frames after which the reference frame updates.
+        blend_factor (float): Factor for blending the current reference frame with the previous one (0 to 1).
+        initial_reference (bool): If True, only use the initial frame or `reference_frame` as the reference.
+        start_frame (int): Index of the frame to start the analysis from.
+        reference_frame (int): Specific frame number to use as the reference frame, regardless of `start_frame`.
+        output_frame_rate (int): Frames per second for the output video.
+        display (bool): Whether to display the BOS output during processing.
+        bit_depth (int): Significant bits of the data. Defaults to the Photron header (also one exported next to
+            the frames), otherwise it is inferred from the brightest pixel of the first frame (`infer_bit_depth`),
+            e.g. 12 for 12-bit data stored in 16-bit TIFFs.
+    """
+    sequence = open_mono_sequence(source)
+    if len(sequence) == 0:
+        print("Error: No images found in the specified folder.")
+        return None
+
+    # Validate start_frame and reference_frame
+    if start_frame >= len(sequence):
+        print(f"Error: Start frame {start_frame} exceeds the total number of frames ({len(sequence)}).")
+        return None
+
+    if reference_frame is not None and reference_frame >= len(sequence):
+        print(f"Error: Reference frame {reference_frame} exceeds the total number of frames ({len(sequence)}).")
+        return None
+
+    # Read the first frame to get dimensions and the data depth
+    first_frame = sequence[start_frame]
+    height, width = first_frame.shape
+    if bit_depth is None:
+        bit_depth = getattr(sequence, "effective_bit_depth", None)
+    if bit_depth is None:
+        bit_depth = infer_bit_depth(first_frame)
+        print(f"Bit depth {bit_depth} inferred from the first frame; pass bit_depth if it is wrong.")
+    print(f"Processing {len(sequence) - start_frame} frames of {width}x{height} at {bit_depth} bits.")
+
+    # Define the codec and create a VideoWriter object
+    fourcc = cv.VideoWriter_fourcc(*'mp4v')
+    out = cv.VideoWriter(output_video_path, fourcc, output_frame_rate, (width, height))
+
+    # Initialize the reference frame
+    if reference_frame is not None:
+        reference_f32 = np.float32(sequence[reference_frame])
+        print(f"Using frame {reference_frame} as the reference frame.")
+    else:
+        reference_f32 = None
+    previous_reference_f32 = None
+
+    for frame_index in range(start_frame, len(sequence)):
+        frame_f32 = np.float32(sequence[frame_index])
+
+        # Update the reference frame based on the interval or use the specific reference frame
+        if reference_f32 is None or (not initial_reference and frame_index % reference_interval == 0):
+            if previous_reference_f32 is None:
+                reference_f32 = frame_f32
+            else:
+                reference_f32 = cv.addWeighted(frame_f32, blend_factor, previous_reference_f32, 1 - blend_factor, 0)
+        previous_reference_f32 = reference_f32
+
+        diff_colored = bos_mono16(frame_f32, reference_f32, gain, bit_depth)
+        out.write(diff_colored)
+
+        # Optionally display the result
+        if display:
+            cv.imshow("BOS Effect", diff_colored)
+            if cv.waitKey(1) == 27:  # ESC key to exit display
+                break
+
+        if frame_index % 100 == 0:
+            print(f"Processed {frame_index + 1}/{len(sequence)} frames...")
+
+    # Release resources
+    out.release()
+    if display:
+        cv.destroyAllWindows()  # not available in headless OpenCV builds
+    print(f"BOS video saved as {output_video_path}")
+
+
+if __name__ == "__main__":
+    bos_from_mono16("C001H001S0002 50 CM/C001H001S0002.cih", "50_CM_Video_BOS_16bit.mp4", gain=10,
+                    initial_reference=True, reference_frame=1, start_frame=1, output_frame_rate=100)
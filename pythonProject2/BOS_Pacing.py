@@ -0,0 +1,96 @@
+import time
+import cv2 as cv
+
+
+class FrameScheduler:
+    """
+    Deadline-driven pacing for the live BOS loops.
+
+    Frame n is due at `start + (n + 1) * period`. Every captured frame is counted, but when a
+    frame is captured after its deadline the loop is told to skip its processing and display,
+    which lets a slow pipeline catch up without ever dropping captures, however far behind it
+    is. Only when capture itself is slower than the target (a skipped frame, which costs just
+    its capture, still took longer than one period) is the schedule moved to the present, since
+    skipping cannot help there. When playing back a file the loop waits until the deadline, so
+    playback runs at the source FPS instead of at decode speed plus a fixed delay. Live cameras
+    pace themselves, so no extra wait is added.
+
+    Parameters:
+        fps (float): Target frame rate (0 or None disables pacing and skipping).
+        live (bool): True for cameras and streams, False for file playback.
+        report_interval (float): Seconds between printed FPS reports (0 disables them).
+    """
+
+    def __init__(self, fps, live=False, report_interval=2.0):
+        self.fps    = fps if fps and fps > 0 else 0.0
+        self.period = 1.0 / self.fps if self.fps else 0.0
+        self.live   = live
+        self.report_interval = report_interval
+
+        self.captured  = 0
+        self.processed = 0
+        self.skipped   = 0
+
+        self._start        = None
+        self._first        = None
+        self._last_report  = None
+        self._last_call    = None
+        self._last_skipped = False
+
+    def should_process(self):
+        """
+        Register a captured frame and decide whether it should be processed and displayed.
+
+        Returns:
+            bool: False if the loop is behind schedule and should skip this frame's processing.
+        """
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = self._first = self._last_report = now
+
+        behind = self.period > 0 and now > self._start + (self.captured + 1) * self.period
+        if behind and self._last_skipped and now - self._last_call > self.period:
+            # The previous frame was only captured and still took a whole period, so capture
+            # itself is the bottleneck and skipping cannot catch up: rebase the schedule
+            self._start = now - self.captured * self.period
+            behind = False
+
+        self._last_call = now
+        self.captured += 1
+        self._last_skipped = behind
+        if behind:
+            self.skipped += 1
+        else:
+            self.processed += 1
+        return not behind
+
+    def wait_key(self):
+        """
+        Wait until the current frame's deadline (file playback) and poll the keyboard.
+
+        Returns:
+            int: Key code from `cv.waitKey`.
+        """
+        delay_ms = 1
+        if not self.live and self.period > 0 and self._start is not None:
+            remaining = self._start + self.captured * self.period - time.perf_counter()
+            delay_ms = max(1, int(remaining * 1000))
+        key = cv.waitKey(delay_ms)
+
+        now = time.perf_counter()
+        if self.report_interval and self._last_report is not None and now - self._last_report >= self.report_interval:
+            print(self.report())
+            self._last_report = now
+        return key
+
+    def achieved_fps(self):
+        """Processed (displayed) frames per second since the first capture."""
+        if self._first is None:
+            return 0.0
+        elapsed = time.perf_counter() - self._first
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        target = f"{self.fps:.1f}" if self.fps else "unpaced"
+        return (f"Achieved {self.achieved_fps():.1f} fps (target {target}), "
+                f"{self.processed} processed, {self.skipped} skipped of {self.captured} captured")
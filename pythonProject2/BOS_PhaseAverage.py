@@ -0,0 +1,266 @@
+import cv2 as cv
+import numpy as np
+from BOS_Block import read_frames
+from BOS_Export import SequenceExporter
+
+
+def estimate_frequency(signal, frame_rate):
+    """
+    Dominant frequency of a probe signal sampled once per frame.
+
+    The peak of the Hann-windowed spectrum is refined by fitting a parabola through the log
+    magnitudes of the peak bin and its neighbours, which gives a small fraction of a bin.
+    The result is always between 0 and the Nyquist frequency. A true frequency above Nyquist
+    shows up as its alias: in an even Nyquist zone (f - k * frame_rate) the alias bins every
+    frame to the same phase, but in an odd (folded) zone (k * frame_rate - f, e.g. 125 Hz at
+    240 fps estimates as 115 Hz) the phases are mirrored, so the cycle runs backwards. Use
+    `unfold_frequency` with the approximate true frequency to undo the folding.
+
+    Parameters:
+        signal (array): Probe value of each frame.
+        frame_rate (float): Frames per second.
+
+    Returns:
+        float: Frequency in Hz, or None if the signal is too short or flat.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    if signal.size < 8:
+        return None
+    signal = signal - np.polyval(np.polyfit(np.arange(signal.size), signal, 1), np.arange(signal.size))
+    spectrum = np.abs(np.fft.rfft(signal * np.hanning(signal.size)))
+    spectrum[0] = 0.0  # what is left of the mean and the trend
+    peak = int(np.argmax(spectrum))
+    if spectrum[peak] == 0:
+        return None
+
+    # Parabolic interpolation of the peak (skipped at the ends of the spectrum)
+    offset = 0.0
+    if 0 < peak < spectrum.size - 1:
+        left, centre, right = np.log(spectrum[peak - 1:peak + 2] + 1e-12)
+        denominator = left - 2 * centre + right
+        if denominator < 0:
+            offset = 0.5 * (left - right) / denominator
+    return (peak + offset) * frame_rate / signal.size
+
+
+def unfold_frequency(alias, frame_rate, nominal):
+    """
+    Map an estimated alias back to the true frequency closest to a nominal value.
+
+    Parameters:
+        alias (float): Frequency between 0 and Nyquist, as returned by `estimate_frequency`.
+        frame_rate (float): Frames per second.
+        nominal (float): Approximate true frequency (e.g. the drive frequency of the speaker).
+
+    Returns:
+        float: The candidate k * frame_rate +/- alias nearest to `nominal`.
+    """
+    k = round(nominal / frame_rate)
+    candidates = [m * frame_rate + sign * alias for m in (k - 1, k, k + 1) for sign in (1, -1)]
+    return min((c for c in candidates if c >= 0), key=lambda c: abs(c - nominal))
+
+
+def phase_bin(frame_index, frequency, frame_rate, bins, phase_offset=0.0):
+    """Phase bin floor(bins * frac(frequency * t + phase_offset)) of a frame at t = frame_index / frame_rate."""
+    phase = (frequency * frame_index / frame_rate + phase_offset) % 1.0
+    return min(int(phase * bins), bins - 1)
+
+
+def probe_signal(video, frames, probe=None, step=4):
+    """
+    Mean gray level of a probe box in each of the first `frames` frames of an opened video.
+
+    Parameters:
+        video (cv.VideoCapture): Opened capture object, positioned at the first frame to read.
+        frames (int): Number of frames to read (None reads to the end).
+        probe (tuple): (x, y, w, h) box on the actuator or on a strong part of the flow
+            (defaults to the whole frame).
+        step (int): Subsampling step inside the box.
+
+    Returns:
+        ndarray: Probe value of each frame read.
+    """
+    values = []
+    for frame in read_frames(video):
+        if probe is not None:
+            x, y, w, h = probe
+            frame = frame[y:y + h, x:x + w]
+        values.append(float(cv.cvtColor(frame[::step, ::step], cv.COLOR_BGR2GRAY).mean()))
+        if frames is not None and len(values) >= frames:
+            break
+    return np.array(values)
+
+
+class PhaseAccumulator:
+    """
+    Streaming per-phase sums of grayscale frames.
+
+    Every frame is added to the sum of its phase bin, so the memory is `bins` int32 frames
+    (about 8 MB per bin for 1080p) however long the recording is. The sums are exact integers,
+    and the mean of a bin keeps the sub-gray-level precision that averaging gains.
+
+    Parameters:
+        bins (int): Number of phase bins per period.
+        shape (tuple): (H, W) of the grayscale frames.
+    """
+
+    def __init__(self, bins, shape):
+        self.bins   = bins
+        self.sums   = np.zeros((bins,) + tuple(shape), dtype=np.int32)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def add(self, phase_bin, frame_bw):
+        np.add(self.sums[phase_bin], frame_bw, out=self.sums[phase_bin])
+        self.counts[phase_bin] += 1
+
+    def mean(self):
+        """Mean of all frames (the steady background)."""
+        return (self.sums.sum(axis=0, dtype=np.float64) / max(self.counts.sum(), 1)).astype(np.float32)
+
+    def means(self):
+        """
+        Mean frame of every phase bin.
+
+        Returns:
+            ndarray: (bins, H, W) float32 means; empty bins get the overall mean.
+        """
+        overall = self.mean()
+        means = np.empty(self.sums.shape, dtype=np.float32)
+        for phase_bin in range(self.bins):
+            if self.counts[phase_bin]:
+                np.multiply(self.sums[phase_bin], 1.0 / self.counts[phase_bin], out=means[phase_bin], dtype=np.float32)
+            else:
+                means[phase_bin] = overall
+        return means
+
+
+def phase_average_video(input_file, output_file, frequency=None, bins=24, gain=10, reference="mean", probe=None,
+                        probe_values=None, estimate_frames=1024, frame_rate=None, phase_offset=0.0, start_frame=0,
+                        output_frame_rate=12, export_dir=None, display=False, nominal_frequency=None):
+    """
+    Phase-locked averaging of a periodic flow (speaker, actuator) in one pass over the video.
+
+    Each frame is assigned the phase bin floor(bins * frac(frequency * t + phase_offset)), with
+    t = frame index / frame rate, and added to the streaming sum of its bin. After the pass the
+    BOS chain (absolute difference, median blur, gain, colormap) runs once per bin on the bin
+    mean, so each output frame has the noise of thousands of frames averaged out. The chain
+    runs in float32 up to the gain, because the averaged difference is often below one gray level.
+
+    Without `frequency`, it is estimated from a probe signal: `probe_values` if given (one value
+    per frame from `start_frame` on, e.g. the drive signal), otherwise the mean gray level of the
+    `probe` box over the first `estimate_frames` frames. The phase error grows with the
+    recording length, so for long recordings estimate over more frames or pass the frequency.
+    The estimate is an alias below Nyquist; if the true frequency lies in a folded Nyquist zone
+    (see `estimate_frequency`) the phase order is reversed, i.e. the cycle is written backwards
+    and `phase_offset` is mirrored, unless `nominal_frequency` is given to unfold it.
+
+    Parameters:
+        input_file (str): Path to the input video file.
+        output_file (str): Path to save the video with one averaged BOS frame per phase.
+        frequency (float): Frequency of the flow in Hz (estimated if None).
+        bins (int): Number of phase bins per period.
+        gain (float): Gain factor applied to the averaged difference.
+        reference (str): "mean" differences every bin against the mean of all frames, which shows only
+            the periodic part of the flow; "first" uses the first frame, which also shows the steady part.
+        probe (tuple): (x, y, w, h) box used for the frequency estimate (defaults to the whole frame).
+        probe_values (array): Probe signal of the frames, used instead of the probe box.
+        estimate_frames (int): Frames read for the probe box estimate (None reads the whole video).
+        frame_rate (float): Capture frame rate (defaults to the container's; set it for slow-motion recordings).
+        phase_offset (float): Phase (0 to 1) of the first frame.
+        start_frame (int): First frame of the video to use.
+        output_frame_rate (float): Frame rate of the output video.
+        export_dir (str): If set, also export the phase frames as a lossless PNG sequence.
+        display (bool): Whether to display the phase frames after processing.
+        nominal_frequency (float): Approximate true frequency, used to unfold an estimated alias
+            (`unfold_frequency`) so the phases run forwards.
+
+    Returns:
+        ndarray: (bins, H, W, 3) colored BOS frames, or None on error.
+    """
+    if reference not in ("mean", "first"):
+        print(f"Error: Unknown reference {reference!r}; use 'mean' or 'first'.")
+        return None
+
+    video = cv.VideoCapture(input_file)
+    if not video.isOpened():
+        print(f"Error: Unable to open video file {input_file}.")
+        return None
+    frame_rate = frame_rate or video.get(cv.CAP_PROP_FPS) or 30
+
+    # Estimate the frequency from the probe signal, then rewind for the averaging pass
+    if frequency is None:
+        if probe_values is None:
+            video.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+            probe_values = probe_signal(video, estimate_frames, probe)
+        frequency = estimate_frequency(probe_values, frame_rate)
+        if frequency is None:
+            print("Error: Could not estimate the frequency from the probe signal.")
+            video.release()
+            return None
+        if nominal_frequency is not None:
+            frequency = unfold_frequency(frequency, frame_rate, nominal_frequency)
+        print(f"Estimated frequency: {frequency:.4f} Hz from {len(probe_values)} frames at {frame_rate:g} fps")
+    video.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+
+    # Single pass: add every frame to the sum of its phase bin
+    accumulator = None
+    first_frame_bw = None
+    frame_index = 0
+    for frame in read_frames(video):
+        frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        if accumulator is None:
+            accumulator = PhaseAccumulator(bins, frame_bw.shape)
+            first_frame_bw = frame_bw.astype(np.float32)
+
+        accumulator.add(phase_bin(frame_index, frequency, frame_rate, bins, phase_offset), frame_bw)
+        frame_index += 1
+
+        if frame_index % 1000 == 0:
+            print(f"Accumulated {frame_index} frames...")
+    video.release()
+
+    if accumulator is None:
+        print("Error: No frames could be read.")
+        return None
+    print(f"Averaged {frame_index} frames into {bins} phase bins "
+          f"({accumulator.counts.min()} to {accumulator.counts.max()} frames per bin)")
+    if not accumulator.counts.all():
+        print("Warning: Some phase bins received no frames; they show the mean frame.")
+
+    # BOS chain on the bin means
+    reference_bw = accumulator.mean() if reference == "mean" else first_frame_bw
+    height, width = reference_bw.shape
+    phase_frames = np.empty((bins, height, width, 3), dtype=np.uint8)
+    for phase_bin, mean_bw in enumerate(accumulator.means()):
+        diff = cv.absdiff(mean_bw, reference_bw)
+        diff_smoothed = cv.medianBlur(diff, 5)
+        diff_amplified = np.clip(diff_smoothed * gain, 0, 255).astype(np.uint8)
+        phase_frames[phase_bin] = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+
+    # Write one frame per phase
+    fourcc = cv.VideoWriter_fourcc(*'mp4v')
+    out = cv.VideoWriter(output_file, fourcc, output_frame_rate, (width, height))
+    exporter = SequenceExporter(export_dir, "phase", block=True) if export_dir else None
+    for phase_bin, phase_frame in enumerate(phase_frames):
+        out.write(phase_frame)
+        if exporter is not None:
+            exporter.write(phase_frame, phase_bin)
+    out.release()
+    if exporter is not None:
+        exporter.close()
+        print(exporter.report())
+    print(f"Phase-averaged video saved as {output_file}")
+
+    if display:
+        for phase_frame in phase_frames:
+            cv.imshow("Phase Average", phase_frame)
+            if cv.waitKey(int(1000 / output_frame_rate)) == 27:  # ESC key to exit display
+                break
+        cv.destroyAllWindows()
+
+    return phase_frames
+
+
+if __name__ == "__main__":
+    phase_average_video('Procced BOS/125HZ IPAD.MOV', 'Procced BOS/125HZ_phase_average.mp4', frequency=125.0, bins=24, gain=40,
+                        frame_rate=240)
@@ -0,0 +1,240 @@
+import os
+import struct
+import cv2 as cv
+import numpy as np
+from BOS_Block import read_frames
+from BOS_Mono16 import PhotronRaw
+
+_HALO = 2  # half of the 5x5 median blur of the BOS chain
+
+
+def tiff_layout(path):
+    """
+    Strip layout of an uncompressed single-channel 8- or 16-bit TIFF, for reading rows directly.
+
+    Parameters:
+        path (str): TIFF file.
+
+    Returns:
+        tuple: (dtype, width, height, rows_per_strip, strip_offsets), or None if the file is
+            compressed, tiled, multi-channel or otherwise has to be decoded as a whole.
+    """
+    formats = {1: "B", 3: "H", 4: "I"}
+    with open(path, "rb") as f:
+        header = f.read(8)
+        order = {b"II": "<", b"MM": ">"}.get(header[:2])
+        if order is None or struct.unpack(order + "H", header[2:4])[0] != 42:
+            return None
+        f.seek(struct.unpack(order + "I", header[4:8])[0])
+        count = struct.unpack(order + "H", f.read(2))[0]
+        entries = f.read(12 * count)
+
+        tags = {}
+        for i in range(count):
+            tag, field_type, n, value = struct.unpack(order + "HHI4s", entries[12 * i:12 * i + 12])
+            if field_type not in formats:
+                continue
+            size = struct.calcsize(formats[field_type]) * n
+            if size > 4:
+                f.seek(struct.unpack(order + "I", value)[0])
+                value = f.read(size)
+            tags[tag] = struct.unpack(order + formats[field_type] * n, value[:size])
+
+    # ImageWidth, ImageLength, BitsPerSample, Compression, Photometric, StripOffsets, SamplesPerPixel, RowsPerStrip
+    if 256 not in tags or 257 not in tags or 273 not in tags or 322 in tags:
+        return None
+    bits = tags.get(258, (1,))[0]
+    if tags.get(259, (1,))[0] != 1 or tags.get(277, (1,))[0] != 1 or tags.get(262, (1,))[0] != 1 or bits not in (8, 16):
+        return None
+    width, height = tags[256][0], tags[257][0]
+    dtype = np.dtype(order + ("u1" if bits == 8 else "u2"))
+    return dtype, width, height, tags.get(278, (height,))[0], tags[273]
+
+
+def read_tiff_rows(path, layout, y0, y1):
+    """Read rows `y0` to `y1` of an uncompressed TIFF with the given `tiff_layout`, strip by strip."""
+    dtype, width, _, rows_per_strip, offsets = layout
+    rows = np.empty((y1 - y0, width), dtype=dtype)
+    row_bytes = width * dtype.itemsize
+    with open(path, "rb") as f:
+        y = y0
+        while y < y1:
+            strip = y // rows_per_strip
+            end = min(y1, (strip + 1) * rows_per_strip)
+            f.seek(offsets[strip] + (y - strip * rows_per_strip) * row_bytes)
+            f.readinto(memoryview(rows[y - y0:end - y0]).cast("B"))
+            y = end
+    return rows.astype(dtype.newbyteorder("="), copy=False)
+
+
+def _frames(source, start_frame, stride):
+    """
+    Yield (height, width, rows) for every frame, where rows(y0, y1) returns those gray rows.
+
+    Photron recordings and uncompressed TIFFs are read row range by row range; other images
+    and videos have to be decoded whole and are sliced afterwards.
+    """
+    if source.lower().endswith((".cih", ".cihx")):
+        raw = PhotronRaw(source)
+        for index in range(start_frame, len(raw), stride):
+            yield raw.height, raw.width, lambda y0, y1, index=index: raw.rows(index, y0, y1)
+    elif os.path.isdir(source):
+        images = sorted([os.path.join(source, img) for img in os.listdir(source)
+                         if img.endswith(('.png', '.jpg', '.tif', '.tiff'))])
+        for path in images[start_frame::stride]:
+            layout = tiff_layout(path) if path.endswith(('.tif', '.tiff')) else None
+            if layout is not None:
+                yield layout[2], layout[1], lambda y0, y1, path=path, layout=layout: read_tiff_rows(path, layout, y0, y1)
+            else:
+                frame = cv.imread(path, cv.IMREAD_ANYDEPTH | cv.IMREAD_GRAYSCALE)
+                if frame is None:
+                    print(f"Error: Unable to read {path}.")
+                    return
+                yield frame.shape[0], frame.shape[1], lambda y0, y1, frame=frame: frame[y0:y1]
+    else:
+        video = cv.VideoCapture(source)
+        if not video.isOpened():
+            print(f"Error: Unable to open video file {source}.")
+            return
+        video.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+        for frame in read_frames(video, stride):
+            frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+            yield frame_bw.shape[0], frame_bw.shape[1], lambda y0, y1, frame=frame_bw: frame[y0:y1]
+        video.release()
+
+
+class _Probe:
+    """A point (x, y), a line ((x0, y0), (x1, y1)) or a box (x, y, w, h), with the window it is read from."""
+
+    def __init__(self, name, spec, height, width):
+        self.name = name
+        self.spec = np.asarray(spec, dtype=np.int64)
+        if self.spec.shape == (2,):
+            xs, ys = self.spec[:1], self.spec[1:]
+            bounds = (ys[0], ys[0] + 1, xs[0], xs[0] + 1)
+        elif self.spec.shape == (2, 2):
+            (x0, y0), (x1, y1) = self.spec
+            samples = max(abs(x1 - x0), abs(y1 - y0)) + 1
+            xs = np.rint(np.linspace(x0, x1, samples)).astype(np.int64)
+            ys = np.rint(np.linspace(y0, y1, samples)).astype(np.int64)
+            bounds = (ys.min(), ys.max() + 1, xs.min(), xs.max() + 1)
+        elif self.spec.shape == (4,):
+            x, y, w, h = self.spec
+            xs = ys = None
+            bounds = (y, y + h, x, x + w)
+        else:
+            raise ValueError(f"Probe {name}: expected (x, y), ((x0, y0), (x1, y1)) or (x, y, w, h), got {spec!r}.")
+        by0, by1, bx0, bx1 = bounds
+        if by0 < 0 or bx0 < 0 or by1 > height or bx1 > width or by0 >= by1 or bx0 >= bx1:
+            raise ValueError(f"Probe {name} {spec!r} lies outside the {width}x{height} frame.")
+
+        # Window with a halo for the median blur, so the values equal those of the full-frame chain
+        self.y0, self.y1 = max(by0 - _HALO, 0), min(by1 + _HALO, height)
+        self.x0, self.x1 = max(bx0 - _HALO, 0), min(bx1 + _HALO, width)
+        if xs is None:
+            self.box = (slice(by0 - self.y0, by1 - self.y0), slice(bx0 - self.x0, bx1 - self.x0))
+            self.ys = self.xs = None
+        else:
+            self.ys, self.xs = ys - self.y0, xs - self.x0
+        self.reference = None
+
+    def window(self, rows):
+        return rows(self.y0, self.y1)[:, self.x0:self.x1].astype(np.float32)
+
+    def sample(self, diff):
+        if self.ys is None:
+            return diff[self.box].mean()
+        values = diff[self.ys, self.xs]
+        return values[0] if len(values) == 1 and self.spec.shape == (2,) else values
+
+
+def extract_probes(source, probes, output_path, mode="signed", start_frame=0, end_frame=None, stride=1,
+                   frame_rate=None):
+    """
+    Probe-only BOS: the difference time series at a few points, lines or boxes of a recording.
+
+    Only a small window around each probe is read and differenced against the same window of
+    the reference (the first frame read), so the cost is dominated by reading the data, not by
+    full-frame processing and encoding. Photron .cih/.cihx recordings and uncompressed TIFF
+    sequences are read row range by row range straight from disk; compressed images and
+    videos have to be decoded whole, so for them the saving is the processing, not the decoding.
+
+    Parameters:
+        source (str): Video file, image folder, or Photron .cih/.cihx header.
+        probes (dict): Probe name -> (x, y) point, ((x0, y0), (x1, y1)) line or (x, y, w, h) box.
+            A list is named probe_0, probe_1, ...
+        output_path (str): .npz file receiving `frame`, `time` (if the frame rate is known), one series per
+            probe (N values for points and boxes, N x L samples for lines) and `<name>_spec`.
+        mode (str): "signed" gives frame - reference, suited to frequency analysis; "abs" gives the BOS chain's
+            median-blurred absolute difference (identical to the full-frame values).
+        start_frame (int): First frame (also the reference).
+        end_frame (int): Frame to stop before (None: the end of the recording).
+        stride (int): Use every `stride`-th frame.
+        frame_rate (float): Capture frame rate for the `time` array (defaults to the Photron header or the video).
+
+    Returns:
+        dict: The saved arrays, or None on error.
+    """
+    if mode not in ("signed", "abs"):
+        print(f"Error: Unknown probe mode {mode!r}; use 'signed' or 'abs'.")
+        return None
+    if not isinstance(probes, dict):
+        probes = {f"probe_{i}": spec for i, spec in enumerate(probes)}
+
+    if frame_rate is None:
+        if source.lower().endswith((".cih", ".cihx")):
+            frame_rate = PhotronRaw(source).fps
+        elif not os.path.isdir(source):
+            video = cv.VideoCapture(source)
+            frame_rate = video.get(cv.CAP_PROP_FPS) or None
+            video.release()
+
+    windows = None
+    series = {name: [] for name in probes}
+    frames = []
+    for frame_index, (height, width, rows) in enumerate(_frames(source, start_frame, stride)):
+        frame_number = start_frame + frame_index * stride
+        if end_frame is not None and frame_number >= end_frame:
+            break
+
+        if windows is None:
+            # The first frame sets up the probe windows and their references
+            try:
+                windows = [_Probe(name, spec, height, width) for name, spec in probes.items()]
+            except ValueError as exc:
+                print(f"Error: {exc}")
+                return None
+            for probe in windows:
+                probe.reference = probe.window(rows)
+
+        for probe in windows:
+            window = probe.window(rows)
+            if mode == "signed":
+                diff = window - probe.reference
+            else:
+                diff = cv.medianBlur(cv.absdiff(window, probe.reference), 5)
+            series[probe.name].append(probe.sample(diff))
+        frames.append(frame_number)
+
+        if len(frames) % 10000 == 0:
+            print(f"Probed {len(frames)} frames...")
+
+    if windows is None:
+        print(f"Error: No frames could be read from {source}.")
+        return None
+
+    result = {"frame": np.array(frames)}
+    if frame_rate:
+        result["time"] = (result["frame"] - start_frame) / float(frame_rate)
+    for probe in windows:
+        result[probe.name] = np.array(series[probe.name], dtype=np.float32)
+        result[f"{probe.name}_spec"] = probe.spec
+    np.savez(output_path, **result)
+    print(f"Probe series of {len(frames)} frames saved as {output_path}")
+    return result
+
+
+if __name__ == "__main__":
+    extract_probes('Procced BOS/125HZ IPAD.MOV',
+                   {"jet": (640, 360), "profile": ((500, 360), (780, 360)), "plume": (600, 200, 40, 40)},
+                   'Procced BOS/125HZ_probes.npz')
@@ -0,0 +1,56 @@
+import cv2 as cv
+import numpy as np
+
+
+class RatioBackground:
+    """
+    Cached reciprocal of the background for the normalized-ratio BOS output.
+
+    The ratio filter computes |frame / background - 1|, which cancels global illumination
+    flicker. The float32 reciprocal 1 / (background + eps) is computed only when the
+    background changes (tracked by array identity, so assign a new array rather than
+    modifying it in place), which leaves one multiply per frame instead of two
+    conversions and a division.
+
+    Parameters:
+        eps (float): Added to the background to avoid dividing by zero on black pixels.
+    """
+
+    def __init__(self, eps=1e-6):
+        self.eps = eps
+        self.reciprocal = None
+        self._source = None
+
+    def update(self, background_gray):
+        """Recompute the reciprocal if `background_gray` is not the array it was built from."""
+        if background_gray is not self._source:
+            # Black background pixels saturate like the division would, without overflowing the 8-bit mapping
+            self.reciprocal = np.minimum(1.0 / (np.float32(background_gray) + np.float32(self.eps)), np.float32(256))
+            self._source = background_gray
+        return self.reciprocal
+
+    def ratio(self, gray, background_gray):
+        """
+        Return the float32 normalized ratio |gray / background - 1|.
+
+        Parameters:
+            gray (ndarray): Grayscale frame.
+            background_gray (ndarray): Grayscale background (reference) frame.
+        """
+        ratio = cv.multiply(gray, self.update(background_gray), dtype=cv.CV_32F)
+        return cv.absdiff(ratio, 1.0)
+
+    def ratio8(self, gray, background_gray, scale=1.0):
+        """
+        Return the normalized ratio mapped to uint8 as |gray / background - 1| * 255 * scale.
+
+        The subtraction, absolute value, scaling and saturation happen in one `convertScaleAbs` pass.
+
+        Parameters:
+            gray (ndarray): Grayscale frame.
+            background_gray (ndarray): Grayscale background (reference) frame.
+            scale (float): Extra amplification of the ratio before the 8-bit mapping.
+        """
+        ratio = cv.multiply(gray, self.update(background_gray), dtype=cv.CV_32F)
+        alpha = 255.0 * scale
+        return cv.convertScaleAbs(ratio, alpha=alpha, beta=-alpha)
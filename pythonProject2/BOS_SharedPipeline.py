@@ -0,0 +1,382 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+import cv2 as cv
+import numpy as np
+from BOS_Filters import FILTERS
+from BOS_Stabilize import FrameStabilizer
+
+
+class LiveProcessor:
+    """
+    BOS processing of the live viewer, independent of Qt and of the thread or process it runs in.
+
+    The parameters are plain attributes (see `PARAMETERS`) that may be changed between frames.
+    Used by the GUI's `VideoThread` and by the processing process of `ProcessPipeline`.
+
+    Parameters:
+        filter_name (str): Name of the filter in `BOS_Filters.FILTERS` applied to the difference.
+    """
+
+    PARAMETERS = ("filter_name", "param_value", "bg_update_interval", "gain", "colormap", "stabilize", "auto_gain")
+
+    def __init__(self, filter_name="Gaussian Blur"):
+        # Processing parameters (defaults)
+        self.filter_name        = filter_name
+        self.param_value        = 5
+        self.bg_update_interval = 0
+        self.gain               = 1.0
+        self.colormap           = None
+        self.stabilize          = False
+        self.auto_gain          = None  # AutoGain instance when the gain is automatic
+
+        # Internal state
+        self._background_gray = None
+        self._frame_count     = 0
+        self._reset_pending   = False
+        self._filters         = {name: filt() for name, filt in FILTERS.items()}
+        self._stabilizer      = FrameStabilizer()  # reference spectrum follows _background_gray
+
+    def reset(self):
+        """Start over with a new background on the next frame (e.g. after a reconnect)."""
+        self._reset_pending = True
+
+    def bos_frame(self, frame):
+        """
+        Process one BGR frame.
+
+        Returns:
+            ndarray: BGR BOS frame, or None for the frame that becomes the background.
+        """
+        # Reference state is only touched here, so a reconnect is applied on the next frame
+        if self._reset_pending:
+            self._background_gray = None
+            self._frame_count     = 0
+            self._reset_pending   = False
+
+        if self._background_gray is None:
+            self._background_gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+            return None
+
+        gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        if self.stabilize:
+            # Register the frame to the background so camera shake does not show up as flow
+            gray = self._stabilizer.stabilize(gray, self._background_gray)
+        if self.bg_update_interval > 0:
+            self._frame_count += 1
+            if self._frame_count >= self.bg_update_interval:
+                self._background_gray = gray.copy()
+                self._frame_count     = 0
+
+        diff = cv.absdiff(gray, self._background_gray)
+
+        # Apply selected filter (each filter works in its own depth with reused buffers)
+        try:
+            bos = self._filters[self.filter_name].apply(diff, self.param_value, gray, self._background_gray)
+        except Exception:
+            bos = diff
+
+        # Apply gain (automatic gain maps the recent high percentile of the filtered image to full scale)
+        gain = self.gain
+        auto_gain = self.auto_gain
+        if auto_gain is not None:
+            gain = auto_gain.update(bos)
+        bos_f = bos.astype(np.float32) * gain
+        bos8  = np.clip(bos_f, 0, 255).astype(np.uint8)
+
+        # Apply colormap
+        if self.colormap is not None:
+            return cv.applyColorMap(bos8, self.colormap)
+        return cv.cvtColor(bos8, cv.COLOR_GRAY2BGR)
+
+
+def _attach(name):
+    """Attach to an existing shared memory block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # The pipeline's processes share the GUI process's resource tracker, which keeps one entry
+        # per name, so attaching adds nothing and the owner's unlink clears the entry
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """
+    Ring of frame slots in one shared memory block.
+
+    The producer writes frame after frame into the next slot and passes only the small
+    descriptor `(name, shape, slots)` plus the slot index and sequence number to the consumer,
+    which maps the same block and reads the frame in place, without pickling or copying it.
+    Each slot carries the sequence number of the frame it holds; the writer invalidates it
+    (-1) while writing, so a reader that checks `valid(slot, seq)` after using a frame knows
+    whether the ring wrapped around and overwrote it in the meantime.
+
+    Parameters:
+        shape (tuple): Frame shape, e.g. (H, W, 3).
+        slots (int): Number of slots; more slots give slow readers more time before a frame is overwritten.
+        name (str): Name of an existing ring to attach to; None creates a new ring.
+    """
+
+    def __init__(self, shape, slots=8, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = name is None
+
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = 8 * slots
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=header_bytes + frame_bytes * slots)
+        else:
+            self._shm = _attach(name)
+        self.name = self._shm.name
+
+        self._sequence = np.ndarray((slots,), dtype=np.int64, buffer=self._shm.buf)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self._shm.buf, offset=header_bytes)
+        if self.owner:
+            self._sequence[:] = -1
+        self._next_seq = 0
+
+    @property
+    def descriptor(self):
+        """What a consumer needs to attach: (name, shape, slots)."""
+        return self.name, self.shape, self.slots
+
+    @classmethod
+    def attach(cls, descriptor):
+        name, shape, slots = descriptor
+        return cls(shape, slots, name)
+
+    def write(self, frame):
+        """
+        Copy a frame into the next slot.
+
+        Returns:
+            tuple: (slot, seq) identifying the frame.
+        """
+        seq = self._next_seq
+        slot = seq % self.slots
+        self._sequence[slot] = -1
+        self._frames[slot] = frame
+        self._sequence[slot] = seq
+        self._next_seq += 1
+        return slot, seq
+
+    def view(self, slot, seq):
+        """
+        Zero-copy view of a frame, or None if it has already been overwritten.
+
+        The view is only valid while `valid(slot, seq)` holds; check again after using it.
+        """
+        if not self.valid(slot, seq):
+            return None
+        return self._frames[slot]
+
+    def valid(self, slot, seq):
+        return int(self._sequence[slot]) == seq
+
+    def close(self):
+        # Drop the views before closing the mapping
+        self._sequence = self._frames = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class RingReader:
+    """Keeps the rings a consumer has attached to, re-attaching when a producer replaces its ring."""
+
+    def __init__(self):
+        self._rings = {}
+
+    def ring(self, descriptor):
+        ring = self._rings.get(descriptor[0])
+        if ring is None:
+            ring = self._rings[descriptor[0]] = FrameRing.attach(descriptor)
+        return ring
+
+    def forget(self, keep):
+        """Close every ring whose name is not in `keep`."""
+        for name in list(self._rings):
+            if name not in keep:
+                self._rings.pop(name).close()
+
+    def close(self):
+        self.forget(())
+
+
+def _capture_main(source, frames, events, stop, slots):
+    """Capture process: read frames into a raw ring and pass their slots to the processing process."""
+    cap = None
+    ring = None
+    captured = 0
+    reset = False
+    try:
+        while not stop.is_set():
+            if cap is None or not cap.isOpened():
+                cap = cv.VideoCapture(source)
+                if not cap.isOpened():
+                    events.put(("error", "Unable to connect to stream. Retrying..."))
+                    stop.wait(1.0)
+                    continue
+                events.put(("error", ""))
+                reset = True
+
+            ret, frame = cap.read()
+            if not ret:
+                cap.release()
+                cap = None
+                continue
+
+            # A new resolution gets a new ring; readers attach to it when they see its name
+            if ring is None or ring.shape != frame.shape:
+                if ring is not None:
+                    ring.close()
+                ring = FrameRing(frame.shape, slots)
+
+            slot, seq = ring.write(frame)
+            captured += 1
+            frames.put((ring.descriptor, slot, seq, reset, captured))
+            reset = False
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cap is not None:
+            cap.release()
+        if ring is not None:
+            ring.close()
+
+
+def _process_main(frames, control, events, stop, slots):
+    """Processing process: BOS-process the newest captured frame into a result ring."""
+    processor = LiveProcessor()
+    reader = RingReader()
+    ring = None
+    processed = dropped = captured = 0
+    try:
+        while not stop.is_set():
+            try:
+                message = frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # Only the newest frame is processed; older ones are dropped (but a reset is kept)
+            reset = message[3]
+            while True:
+                try:
+                    message = frames.get_nowait()
+                except queue.Empty:
+                    break
+                dropped += 1
+                reset = reset or message[3]
+            raw_descriptor, raw_slot, raw_seq, _, captured = message
+
+            # Parameter changes from the GUI
+            while True:
+                try:
+                    name, value = control.get_nowait()
+                except queue.Empty:
+                    break
+                if name in LiveProcessor.PARAMETERS:
+                    setattr(processor, name, value)
+
+            # A reconnect resets the background even if this frame turns out to be lost
+            if reset:
+                processor.reset()
+
+            try:
+                raw_ring = reader.ring(raw_descriptor)
+            except FileNotFoundError:
+                # The capture process has already replaced this ring (new resolution)
+                dropped += 1
+                continue
+            reader.forget((raw_descriptor[0],))
+            frame = raw_ring.view(raw_slot, raw_seq)
+            if frame is None:
+                dropped += 1
+                continue
+
+            bos_color = processor.bos_frame(frame)
+            if not raw_ring.valid(raw_slot, raw_seq):
+                # The capture process wrapped around while the frame was being processed
+                dropped += 1
+                continue
+            if bos_color is None:
+                continue
+
+            if ring is None or ring.shape != bos_color.shape:
+                if ring is not None:
+                    ring.close()
+                ring = FrameRing(bos_color.shape, slots)
+            bos_slot, bos_seq = ring.write(bos_color)
+            processed += 1
+
+            auto_gain = processor.auto_gain
+            stats = {"captured": captured, "processed": processed, "dropped": dropped,
+                     "gain": auto_gain.gain if auto_gain is not None else processor.gain}
+            events.put(("frame", raw_descriptor, raw_slot, raw_seq, ring.descriptor, bos_slot, bos_seq, stats))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+        if ring is not None:
+            ring.close()
+
+
+class ProcessPipeline:
+    """
+    Runs each live stream as a capture process and a processing process.
+
+    Counterpart of `BOS_Streams.FramePool` for the GUI's multi-process mode: capture, BOS
+    processing and display (the GUI process) run in separate interpreters, so neither the
+    capture loop nor heavy filters compete with the Qt event loop for the GIL. Frames stay in
+    shared memory rings; only slot indices and sequence numbers travel through the queues.
+
+    Parameters:
+        slots (int): Slots per ring.
+    """
+
+    def __init__(self, slots=8):
+        self.slots   = slots
+        self.workers = 0  # processes started so far
+        self._context = mp.get_context("spawn")  # fork is unsafe once Qt threads are running
+        self._streams = []
+
+    def start(self, source):
+        """
+        Start the capture and processing processes of one stream.
+
+        Returns:
+            tuple: (control queue, events queue, stop event) for the stream.
+        """
+        ctx = self._context
+        frames, control, events = ctx.Queue(), ctx.Queue(), ctx.Queue()
+        stop = ctx.Event()
+        processes = [ctx.Process(target=_capture_main, args=(source, frames, events, stop, self.slots), daemon=True),
+                     ctx.Process(target=_process_main, args=(frames, control, events, stop, self.slots), daemon=True)]
+        for process in processes:
+            process.start()
+        self.workers += len(processes)
+        # Keep the queues referenced: the child processes may still be attaching to them
+        self._streams.append((stop, processes, (frames, control, events)))
+        return control, events, stop
+
+    def stop(self, stop, timeout=2.0):
+        """Stop the processes of one stream."""
+        stop.set()
+        for stream_stop, processes, _ in self._streams:
+            if stream_stop is stop:
+                deadline = time.perf_counter() + timeout
+                for process in processes:
+                    process.join(max(0.0, deadline - time.perf_counter()))
+                    if process.is_alive():
+                        process.terminate()
+
+    def stats(self, stream):
+        """Return a snapshot of the counters of a stream (kept by the stream itself)."""
+        return stream.stats.snapshot()
+
+    def close(self):
+        for stop, _, _ in self._streams:
+            self.stop(stop)
+        self._streams = []
@@ -0,0 +1,231 @@
+import os
+import cv2 as cv
+import numpy as np
+from BOS_Block import read_frames
+
+
+class WelchSpectrum:
+    """
+    Out-of-core per-pixel power spectra of a frame sequence (Welch's method).
+
+    Frames are added one at a time into a time chunk of `segment` frames (uint8, `segment`
+    bytes per pixel). Each full chunk is one Welch segment: tile by tile, `tile_pixels` pixel
+    time series are mean-removed, Hann-windowed and transformed with one batched real FFT
+    along time, and their power is added to a float32 (frequencies, H, W) array memory-mapped
+    in `output_dir`. The chunk then keeps its last `segment - hop` frames for the overlapping
+    next segment. Memory therefore depends on the frame size and `segment`, not on the number
+    of frames: a 1-megapixel recording with 256-frame segments holds a 256 MB chunk and about
+    100 MB of FFT work space, while its 129 x 1M float32 spectrum (516 MB) lives on disk.
+
+    The mean removal makes the spectra independent of the (fixed) reference, so adding the
+    grayscale frames gives the spectra of the signed BOS difference, without the frequency
+    doubling of the rectified absolute difference. The result is scaled as a one-sided power
+    spectral density (gray levels squared per Hz), like `scipy.signal.welch` with a Hann window.
+
+    Parameters:
+        output_dir (str): Folder for the spectrum (psd.npy, frequencies.npy) and the maps.
+        frame_rate (float): Capture frame rate in frames per second.
+        segment (int): Frames per Welch segment (frequency resolution frame_rate / segment).
+        overlap (float): Overlap of consecutive segments (0 to <1).
+        bands (list): (low, high) frequency bands in Hz for band-power maps.
+        fmin (float): Lowest frequency considered for the dominant-frequency map (default: first bin above 0).
+        fmax (float): Highest frequency considered for the dominant-frequency map (default: Nyquist).
+        smooth (int): Median blur kernel applied to each frame before it is added, as in the BOS chain (0: none).
+        tile_pixels (int): Pixels transformed per batched FFT.
+    """
+
+    def __init__(self, output_dir, frame_rate, segment=256, overlap=0.5, bands=(), fmin=None, fmax=None, smooth=5,
+                 tile_pixels=32768):
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+        self.output_dir  = output_dir
+        self.frame_rate  = float(frame_rate)
+        self.segment     = segment
+        self.hop         = max(1, int(round(segment * (1 - overlap))))
+        self.bands       = list(bands)
+        self.fmin        = fmin
+        self.fmax        = fmax
+        self.smooth      = smooth
+        self.tile_pixels = tile_pixels
+
+        self.frequencies = np.fft.rfftfreq(segment, 1.0 / self.frame_rate)
+        self.segments    = 0
+        self.frames      = 0
+
+        window = np.hanning(segment + 1)[:-1].astype(np.float32)  # periodic Hann, as scipy's default window
+        self._window = window[:, None]
+        # One-sided density scaling; DC and Nyquist are not doubled
+        self._scale = np.full(self.frequencies.size, 2.0 / (self.frame_rate * float(np.sum(window ** 2))),
+                              dtype=np.float32)
+        self._scale[0] /= 2
+        if segment % 2 == 0:
+            self._scale[-1] /= 2
+
+        self.shape  = None
+        self.psd    = None
+        self._chunk = None
+        self._fill  = 0
+
+    def add(self, frame_bw):
+        """Add the next grayscale frame (allocates the chunk and the spectrum on the first frame)."""
+        if self._chunk is None:
+            self.shape = frame_bw.shape[:2]
+            pixels = self.shape[0] * self.shape[1]
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._chunk = np.empty((self.segment, pixels), dtype=np.uint8)
+            self.psd = np.lib.format.open_memmap(os.path.join(self.output_dir, "psd.npy"), mode="w+",
+                                                 dtype=np.float32, shape=(self.frequencies.size, pixels))  # zero-filled
+
+        if self.smooth:
+            frame_bw = cv.medianBlur(frame_bw, self.smooth)
+        self._chunk[self._fill] = frame_bw.reshape(-1)
+        self._fill += 1
+        self.frames += 1
+
+        if self._fill == self.segment:
+            self._add_segment()
+            # Keep the overlapping frames for the next segment
+            keep = self.segment - self.hop
+            self._chunk[:keep] = self._chunk[self.hop:]
+            self._fill = keep
+
+    def _add_segment(self):
+        pixels = self._chunk.shape[1]
+        for start in range(0, pixels, self.tile_pixels):
+            stop = min(start + self.tile_pixels, pixels)
+            series = self._chunk[:, start:stop].astype(np.float32)
+            series -= series.mean(axis=0)
+            series *= self._window
+            spectrum = np.fft.rfft(series, axis=0)
+            self.psd[:, start:stop] += spectrum.real ** 2 + spectrum.imag ** 2
+        self.segments += 1
+
+    def close(self):
+        """
+        Finish the averaging, save the dominant-frequency and band-power maps and report.
+
+        Frames after the last full segment are not used.
+
+        Returns:
+            ndarray: (frequencies, H, W) memory-mapped power spectral density, or None without a full segment.
+        """
+        if self.segments == 0:
+            print(f"Error: Spectral analysis needs at least {self.segment} frames, got {self.frames}.")
+            return None
+
+        # Average over the segments and scale to a density, tile by tile
+        pixels = self.psd.shape[1]
+        factor = self._scale[:, None] / self.segments
+        for start in range(0, pixels, self.tile_pixels):
+            self.psd[:, start:start + self.tile_pixels] *= factor
+        self.psd.flush()
+        np.save(os.path.join(self.output_dir, "frequencies.npy"), self.frequencies)
+        psd = self.psd.reshape((self.frequencies.size,) + self.shape)
+
+        save_map(os.path.join(self.output_dir, "dominant_frequency"),
+                 dominant_frequency(psd, self.frequencies, self.fmin, self.fmax, self.tile_pixels))
+        for low, high in self.bands:
+            save_map(os.path.join(self.output_dir, f"band_{low:g}-{high:g}Hz"),
+                     band_power(psd, self.frequencies, low, high, self.tile_pixels))
+
+        print(f"Spectra of {self.frames} frames ({self.segments} segments of {self.segment}, "
+              f"{self.frequencies[1]:.3g} Hz resolution) saved in {self.output_dir}")
+        return psd
+
+
+def _rows(shape, tile_pixels):
+    """Row ranges of about `tile_pixels` pixels, for tiled passes over an (F, H, W) spectrum."""
+    rows = max(1, tile_pixels // shape[2])
+    return [(y, min(y + rows, shape[1])) for y in range(0, shape[1], rows)]
+
+
+def dominant_frequency(psd, frequencies, fmin=None, fmax=None, tile_pixels=32768):
+    """
+    Frequency of the largest spectral peak at every pixel.
+
+    Parameters:
+        psd (ndarray): (F, H, W) power spectral density (may be memory-mapped).
+        frequencies (ndarray): Frequencies of the F bins.
+        fmin (float): Lowest frequency considered (default: first bin above 0).
+        fmax (float): Highest frequency considered (default: Nyquist).
+        tile_pixels (int): Pixels read per step.
+
+    Returns:
+        ndarray: (H, W) float32 frequencies in Hz.
+    """
+    low = np.searchsorted(frequencies, fmin) if fmin is not None else 1
+    high = np.searchsorted(frequencies, fmax, side="right") if fmax is not None else frequencies.size
+    dominant = np.empty(psd.shape[1:], dtype=np.float32)
+    for y0, y1 in _rows(psd.shape, tile_pixels):
+        dominant[y0:y1] = frequencies[low + np.argmax(psd[low:high, y0:y1], axis=0)]
+    return dominant
+
+
+def band_power(psd, frequencies, low, high, tile_pixels=32768):
+    """
+    Power in the band [low, high] Hz at every pixel (density integrated over the band).
+
+    Returns:
+        ndarray: (H, W) float32 power in gray levels squared.
+    """
+    selected = (frequencies >= low) & (frequencies <= high)
+    df = frequencies[1] - frequencies[0]
+    power = np.empty(psd.shape[1:], dtype=np.float32)
+    for y0, y1 in _rows(psd.shape, tile_pixels):
+        power[y0:y1] = psd[selected, y0:y1].sum(axis=0) * df
+    return power
+
+
+def save_map(path, values, colormap=cv.COLORMAP_JET):
+    """
+    Save a map as <path>.npy and as a colormapped <path>.png scaled from 0 to its 99.5th percentile.
+    """
+    np.save(path + ".npy", values)
+    top = float(np.percentile(values, 99.5)) or 1.0
+    scaled = np.clip(values * (255.0 / top), 0, 255).astype(np.uint8)
+    cv.imwrite(path + ".png", cv.applyColorMap(scaled, colormap))
+
+
+def spectrum_from_video(input_file, output_dir, frame_rate=None, segment=256, overlap=0.5, bands=(), fmin=None,
+                        fmax=None, start_frame=0, stride=1, smooth=5):
+    """
+    Per-pixel spectral analysis of a BOS recording in one streaming pass.
+
+    See `WelchSpectrum`; the same stage can be fed from `bos_from_video` and `bos_from_images`
+    with their `spectrum` parameter.
+
+    Parameters:
+        input_file (str): Path to the input video file.
+        output_dir (str): Folder for psd.npy, frequencies.npy and the maps.
+        frame_rate (float): Capture frame rate (defaults to the container's; set it for slow-motion recordings).
+        segment (int): Frames per Welch segment.
+        overlap (float): Overlap of consecutive segments.
+        bands (list): (low, high) bands in Hz for band-power maps.
+        fmin (float): Lower limit of the dominant-frequency search.
+        fmax (float): Upper limit of the dominant-frequency search.
+        start_frame (int): First frame to analyse.
+        stride (int): Analyse every `stride`-th frame (the Nyquist frequency drops accordingly).
+        smooth (int): Median blur kernel applied to each frame (0: none).
+
+    Returns:
+        ndarray: (frequencies, H, W) memory-mapped power spectral density, or None on error.
+    """
+    video = cv.VideoCapture(input_file)
+    if not video.isOpened():
+        print(f"Error: Unable to open video file {input_file}.")
+        return None
+    frame_rate = (frame_rate or video.get(cv.CAP_PROP_FPS) or 30) / stride
+    video.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+
+    spectrum = WelchSpectrum(output_dir, frame_rate, segment, overlap, bands, fmin, fmax, smooth)
+    for frame in read_frames(video, stride):
+        spectrum.add(cv.cvtColor(frame, cv.COLOR_BGR2GRAY))
+        if spectrum.frames % 1000 == 0:
+            print(f"Analysed {spectrum.frames} frames...")
+    video.release()
+    return spectrum.close()
+
+
+if __name__ == "__main__":
+    spectrum_from_video('Procced BOS/125HZ IPAD.MOV', 'Procced BOS/125HZ_spectrum', frame_rate=240,
+                        bands=[(100, 120), (20, 60)])
@@ -0,0 +1,238 @@
+import math
+import time
+import cv2 as cv
+import numpy as np
+
+
+def _peak(corr):
+    """
+    Sub-pixel location of the correlation peak, with wrap-around, as a signed shift.
+
+    Along each axis the offset follows from the ratio of the larger neighbour to the peak
+    (Foroosh et al.), which unlike a parabola fit is unbiased for the sinc-shaped peak of
+    phase correlation.
+    """
+    h, w = corr.shape
+    _, response, _, (px, py) = cv.minMaxLoc(corr)
+
+    def refine(c_minus, c_0, c_plus):
+        if c_plus >= c_minus:
+            return c_plus / (c_plus + c_0) if c_plus > 0 else 0.0
+        return -c_minus / (c_minus + c_0) if c_minus > 0 else 0.0
+
+    dx = px + refine(corr[py, (px - 1) % w], corr[py, px], corr[py, (px + 1) % w])
+    dy = py + refine(corr[(py - 1) % h, px], corr[py, px], corr[(py + 1) % h, px])
+
+    # Peaks past the middle are negative shifts
+    if dx >= w / 2:
+        dx -= w
+    if dy >= h / 2:
+        dy -= h
+    return dx, dy, response
+
+
+def shift_frame(frame_bw, dx, dy):
+    """
+    Sample the frame at (x + dx, y + dy) with bilinear interpolation and replicated borders.
+
+    Separable: an integer offset by slicing plus one two-tap `addWeighted` per axis, several
+    times cheaper than `cv.warpAffine` for a pure translation (within one gray level of it).
+
+    Parameters:
+        frame_bw (ndarray): Grayscale frame.
+        dx (float): Horizontal shift in pixels.
+        dy (float): Vertical shift in pixels.
+
+    Returns:
+        ndarray: Shifted frame of the same size.
+    """
+    h, w = frame_bw.shape
+    ix, iy = math.floor(dx), math.floor(dy)
+    fx, fy = dx - ix, dy - iy
+    pad = max(abs(ix), abs(iy)) + 1
+    padded = cv.copyMakeBorder(frame_bw, pad, pad, pad, pad, cv.BORDER_REPLICATE)
+
+    x0, y0 = pad + ix, pad + iy
+    rows = cv.addWeighted(padded[:, x0:x0 + w], 1 - fx, padded[:, x0 + 1:x0 + 1 + w], fx, 0)
+    return cv.addWeighted(rows[y0:y0 + h], 1 - fy, rows[y0 + 1:y0 + 1 + h], fy, 0)
+
+
+class FrameStabilizer:
+    """
+    Global sub-pixel registration of frames to the BOS reference by phase correlation.
+
+    Only a central `window_size` patch (optionally downsampled) is correlated, under a Hann
+    window. The spectrum of the reference patch is cached and recomputed only when a different
+    reference array is passed, so a fixed reference costs one forward and one inverse FFT of
+    the patch per frame. The frame is then warped by the inverse shift (and rotation) before
+    differencing.
+
+    Parameters:
+        window_size (int): Edge length of the central patch used for the estimate.
+        downsample (int): Downsampling factor applied before cropping (1 keeps full resolution).
+        rotation (bool): Also estimate a small global rotation, from the vertical shifts of two patches left and
+            right of the centre (see `estimate`). This doubles the correlation work and replaces the cheap shift
+            with a full affine warp: about 16 ms per 1080p frame instead of about 5 ms, beyond the few-ms budget
+            of a live loop, so enable it only when the camera really rotates.
+        min_response (float): Peak correlation below which the estimate is distrusted and the
+            frame is returned unchanged (e.g. featureless or heavily disturbed frames).
+        min_shift (float): Shifts smaller than this (in pixels) are not worth a warp.
+    """
+
+    def __init__(self, window_size=256, downsample=1, rotation=False, min_response=0.05, min_shift=0.02):
+        self.window_size  = window_size
+        self.downsample   = downsample
+        self.rotation     = rotation
+        self.min_response = min_response
+        self.min_shift    = min_shift
+
+        self.last = (0.0, 0.0, 0.0, 0.0)  # dx, dy, angle (deg), response of the last estimate
+
+        self._source          = None
+        self._hann            = None
+        self._reference_specs = None
+
+    def _patches(self, image_bw):
+        """
+        Crop the correlation patches from the (downsampled) image as float32.
+
+        One central patch, or with `rotation` two patches left and right of the centre.
+
+        Returns:
+            tuple: List of patches and the horizontal offsets of their centres from the image centre.
+        """
+        if self.downsample > 1:
+            image_bw = cv.resize(image_bw, None, fx=1 / self.downsample, fy=1 / self.downsample,
+                                 interpolation=cv.INTER_AREA)
+        h, w = image_bw.shape
+        ph = min(self.window_size, h)
+        pw = min(self.window_size, w // 2 if self.rotation else w)
+        offsets = [-(w // 4), w // 4] if self.rotation else [0]
+
+        y0 = (h - ph) // 2
+        patches = []
+        for offset in offsets:
+            x0 = (w - pw) // 2 + offset
+            patches.append(np.float32(image_bw[y0:y0 + ph, x0:x0 + pw]))
+
+        if self._hann is None or self._hann.shape != (ph, pw):
+            self._hann = cv.createHanningWindow((pw, ph), cv.CV_32F)
+        return patches, offsets
+
+    def _spectrum(self, patch):
+        # Mean removal keeps the window edge from dominating the correlation
+        windowed = cv.multiply(cv.subtract(patch, cv.mean(patch)[0]), self._hann)
+        return cv.dft(windowed, flags=cv.DFT_COMPLEX_OUTPUT)
+
+    def set_reference(self, reference_bw):
+        """Cache the spectra of the reference patches."""
+        patches, _ = self._patches(reference_bw)
+        self._reference_specs = [self._spectrum(patch) for patch in patches]
+        self._source = reference_bw
+
+    @staticmethod
+    def _correlate(spec, reference_spec):
+        # Normalised cross-power spectrum -> correlation surface
+        cross = cv.mulSpectrums(spec, reference_spec, 0, conjB=True)
+        magnitude = cv.magnitude(cross[..., 0], cross[..., 1]) + 1e-9
+        cross /= magnitude[..., None]
+        return cv.idft(cross, flags=cv.DFT_REAL_OUTPUT | cv.DFT_SCALE)
+
+    def estimate(self, frame_bw, reference_bw):
+        """
+        Estimate how far the frame is displaced from the reference.
+
+        With `rotation`, the shifts of the two side patches give both the translation at the
+        centre (their mean) and the rotation (their vertical difference over their distance),
+        which is accurate for the small angles of camera vibration.
+
+        Returns:
+            tuple: (dx, dy, angle, response) with the shift in full-resolution pixels, the
+                rotation in degrees (clockwise on screen; 0 unless `rotation` is enabled) and
+                the peak correlation.
+        """
+        if reference_bw is not self._source:
+            self.set_reference(reference_bw)
+
+        patches, offsets = self._patches(frame_bw)
+        shifts = [_peak(self._correlate(self._spectrum(patch), reference_spec))
+                  for patch, reference_spec in zip(patches, self._reference_specs)]
+
+        dx = np.mean([shift[0] for shift in shifts])
+        dy = np.mean([shift[1] for shift in shifts])
+        response = min(shift[2] for shift in shifts)
+        angle = 0.0
+        if self.rotation:
+            (dx_left, dy_left, _), (dx_right, dy_right, _) = shifts
+            angle = np.degrees(np.arctan2(dy_right - dy_left, offsets[1] - offsets[0] + dx_right - dx_left))
+
+        self.last = (float(dx) * self.downsample, float(dy) * self.downsample, float(angle), float(response))
+        return self.last
+
+    def stabilize(self, frame_bw, reference_bw):
+        """
+        Register the frame to the reference.
+
+        Parameters:
+            frame_bw (ndarray): Grayscale frame.
+            reference_bw (ndarray): Grayscale reference frame.
+
+        Returns:
+            ndarray: The warped frame (or `frame_bw` itself if no correction is needed or trusted).
+        """
+        dx, dy, angle, response = self.estimate(frame_bw, reference_bw)
+        if response < self.min_response or (max(abs(dx), abs(dy)) < self.min_shift and angle == 0.0):
+            return frame_bw
+
+        if angle == 0.0:
+            return shift_frame(frame_bw, dx, dy)
+
+        # Inverse of "rotate by angle about the centre, then shift by (dx, dy)"
+        h, w = frame_bw.shape
+        center = np.array([w / 2, h / 2])
+        c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+        inverse = np.array([[c, s], [-s, c]])
+        matrix = np.hstack([inverse, (center - inverse @ (center + (dx, dy)))[:, None]])
+        return cv.warpAffine(frame_bw, matrix, (w, h), flags=cv.INTER_LINEAR, borderMode=cv.BORDER_REPLICATE)
+
+
+def benchmark(width=1920, height=1080, repeats=50, shift=(1.37, -0.62), angle=0.4):
+    """
+    Print the accuracy and per-frame cost of the stabilizer on a synthetic 1080p speckle background.
+
+    Parameters:
+        width (int): Frame width.
+        height (int): Frame height.
+        repeats (int): Number of timed frames.
+        shift (tuple): Applied (dx, dy) shift in pixels.
+        angle (float): Applied rotation in degrees for the rotation test.
+    """
+    rng = np.random.default_rng(0)
+    reference_bw = cv.GaussianBlur(rng.integers(0, 256, (height, width), dtype=np.uint8), (0, 0), 1.2)
+    reference_bw = cv.normalize(reference_bw, None, 0, 255, cv.NORM_MINMAX)
+
+    for rotation in (False, True):
+        applied = angle if rotation else 0.0
+        matrix = cv.getRotationMatrix2D((width / 2, height / 2), -applied, 1.0)
+        matrix[:, 2] += shift
+        frame_bw = cv.warpAffine(reference_bw, matrix, (width, height), flags=cv.INTER_CUBIC,
+                                 borderMode=cv.BORDER_REFLECT)
+
+        stabilizer = FrameStabilizer(rotation=rotation)
+        stabilizer.stabilize(frame_bw, reference_bw)  # caches the reference spectrum
+        start = time.perf_counter()
+        for _ in range(repeats):
+            stabilized = stabilizer.stabilize(frame_bw, reference_bw)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        dx, dy, found_angle, response = stabilizer.last
+        inner = (slice(50, -50), slice(50, -50))
+        before = cv.mean(cv.absdiff(frame_bw[inner], reference_bw[inner]))[0]
+        after = cv.mean(cv.absdiff(stabilized[inner], reference_bw[inner]))[0]
+        print(f"rotation={rotation}: applied ({shift[0]:.2f}, {shift[1]:.2f}) px {applied:.2f} deg, "
+              f"found ({dx:.3f}, {dy:.3f}) px {found_angle:.3f} deg, response {response:.2f}, "
+              f"{elapsed_ms:.2f} ms/frame, mean |diff| {before:.1f} -> {after:.1f}")
+
+
+if __name__ == "__main__":
+    benchmark()
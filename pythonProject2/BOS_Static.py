@@ -0,0 +1,99 @@
+import cv2 as cv
+import numpy as np
+
+
+def difference_energy(frame_bw, reference_bw, step=8):
+    """
+    Mean absolute difference between a frame and its reference, read at every `step`-th pixel.
+
+    Parameters:
+        frame_bw (ndarray): Grayscale frame.
+        reference_bw (ndarray): Grayscale reference frame.
+        step (int): Subsampling step in both directions.
+
+    Returns:
+        float: Difference energy in gray levels.
+    """
+    a = frame_bw[::step, ::step]
+    b = reference_bw[::step, ::step]
+    return cv.norm(a, b, cv.NORM_L1) / a.size
+
+
+class StaticFrameGate:
+    """
+    Cheap change detection in front of the expensive BOS stages.
+
+    The difference energy is the mean absolute difference between the frame and the reference,
+    read only at every `step`-th pixel in both directions. Below `threshold` the frame is treated
+    as static and the caller reuses the output of the first frame of the static stretch (or a
+    blank frame) instead of running the blur, colormap, resize and encode stages. The scripts'
+    `static_threshold` parameter is passed straight to this gate, so it is off unless set.
+
+    Parameters:
+        threshold (float): Energy (mean gray-level difference) below which a frame is static.
+            None (the default) disables the gate; about 1.0 suits a camera with a few gray
+            levels of sensor noise.
+        step (int): Subsampling step; only 1 / step**2 of the pixels are read.
+        mode (str): "reuse" repeats the last static output, "blank" emits an empty BOS frame.
+        colormap (int): OpenCV colormap used to build the blank frame.
+    """
+
+    def __init__(self, threshold=None, step=8, mode="reuse", colormap=cv.COLORMAP_JET):
+        if mode not in ("reuse", "blank"):
+            raise ValueError(f"Unknown static frame mode '{mode}' (use 'reuse' or 'blank').")
+        self.threshold = threshold
+        self.step      = step
+        self.mode      = mode
+        self.colormap  = colormap
+
+        self.checked = 0
+        self.skipped = 0
+
+        self._static_output = None   # output of the first static frame, reused afterwards
+        self._pending       = False
+        self._blank         = None
+
+    def energy(self, frame_bw, reference_bw):
+        """Mean absolute difference over the subsampled pixels."""
+        return difference_energy(frame_bw, reference_bw, self.step)
+
+    def check(self, frame_bw, reference_bw):
+        """
+        Decide whether the frame can skip the expensive stages.
+
+        The first static frame after a change is still processed, and its output (or a blank
+        frame of the same size) is returned for the following static frames.
+
+        Returns:
+            ndarray: The output to use for a static frame, or None if the frame must be processed.
+        """
+        if self.threshold is None:
+            return None
+
+        self.checked += 1
+        if self.energy(frame_bw, reference_bw) >= self.threshold:
+            self._static_output = None
+            return None
+        if self._static_output is None:
+            self._pending = True
+            return None
+
+        self.skipped += 1
+        if self.mode == "reuse":
+            return self._static_output
+        if self._blank is None or self._blank.shape != self._static_output.shape:
+            zeros = np.zeros(self._static_output.shape[:2], dtype=np.uint8)
+            self._blank = cv.applyColorMap(zeros, self.colormap)
+        return self._blank
+
+    def store(self, output):
+        """Pass every processed output; the one of the first static frame is kept for reuse."""
+        if self._pending:
+            self._static_output = output
+            self._pending = False
+
+    def skip_rate(self):
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def report(self):
+        return f"Static early-out skipped {self.skipped} of {self.checked} frames ({100 * self.skip_rate():.1f}%)"
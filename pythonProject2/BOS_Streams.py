@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class StreamStats:
+    """Per-stream capture, processing, drop and failure counters with a one-second FPS window."""
+
+    def __init__(self):
+        self.captured  = 0
+        self.processed = 0
+        self.dropped   = 0
+        self.failed    = 0
+        self.fps       = 0.0
+
+        self._window_start = time.perf_counter()
+        self._window_count = 0
+
+    def tick(self):
+        """Record one processed frame and refresh the FPS estimate once per second."""
+        self.processed += 1
+        self._window_count += 1
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.fps = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+    def snapshot(self):
+        return {
+            "captured":  self.captured,
+            "processed": self.processed,
+            "dropped":   self.dropped,
+            "failed":    self.failed,
+            "fps":       self.fps,
+        }
+
+
+class FramePool:
+    """
+    Bounded worker pool shared by several live streams.
+
+    Each stream holds at most one pending frame: a newer frame replaces the pending one and
+    counts as a drop, so a slow or high-resolution stream never builds a backlog. Workers take
+    the stream that has been waiting longest and never run two frames of the same stream at
+    once, which gives round-robin fairness between streams.
+
+    Parameters:
+        workers (int): Number of worker threads (defaults to the CPU count).
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+
+        self._cond    = threading.Condition()
+        self._pending = OrderedDict()   # stream -> latest unprocessed frame, oldest first
+        self._busy    = set()
+        self._stats   = {}
+        self._running = True
+
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, stream, frame):
+        """
+        Queue `frame` for `stream.process(frame)`, replacing any frame still pending for it.
+
+        Returns:
+            bool: False if a pending frame was dropped to make room.
+        """
+        with self._cond:
+            stats = self._stats.setdefault(stream, StreamStats())
+            stats.captured += 1
+            dropped = stream in self._pending
+            if dropped:
+                stats.dropped += 1
+            self._pending[stream] = frame
+            self._cond.notify()
+        return not dropped
+
+    def stats(self, stream):
+        """Return a snapshot of the counters for `stream`."""
+        with self._cond:
+            return self._stats.setdefault(stream, StreamStats()).snapshot()
+
+    def remove(self, stream):
+        """Forget a stream and discard its pending frame."""
+        with self._cond:
+            self._pending.pop(stream, None)
+            self._stats.pop(stream, None)
+
+    def close(self):
+        """Stop the workers after their current frame."""
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(1.0)
+
+    def _next(self):
+        # Oldest waiting stream that is not already being processed
+        for stream in self._pending:
+            if stream not in self._busy:
+                return stream
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                stream = self._next()
+                while self._running and stream is None:
+                    self._cond.wait()
+                    stream = self._next()
+                if not self._running:
+                    return
+                frame = self._pending.pop(stream)
+                self._busy.add(stream)
+
+            ok = False
+            try:
+                stream.process(frame)
+                ok = True
+            except Exception as exc:
+                print(f"Error processing frame: {exc}")
+            finally:
+                with self._cond:
+                    self._busy.discard(stream)
+                    if stream in self._stats:
+                        # Only frames that made it through count as processed
+                        if ok:
+                            self._stats[stream].tick()
+                        else:
+                            self._stats[stream].failed += 1
+                    self._cond.notify_all()
@@ -0,0 +1,209 @@
+import csv
+import os
+import queue
+import threading
+import time
+import cv2 as cv
+import numpy as np
+from BOS_Block import read_frames, update_reference
+
+# Smoothing filters selectable per configuration
+FILTERS = {
+    "none":      lambda diff: diff,
+    "median3":   lambda diff: cv.medianBlur(diff, 3),
+    "median5":   lambda diff: cv.medianBlur(diff, 5),
+    "gaussian5": lambda diff: cv.GaussianBlur(diff, (5, 5), 0),
+}
+
+DEFAULT_CONFIG = {
+    "gain": 10,
+    "reference_interval": 1,
+    "blend_factor": 0.5,
+    "initial_reference": False,
+    "reference_frame": None,
+    "filter": "median5",
+}
+
+
+class _SweepJob:
+    """One parameter configuration of a sweep: its own reference state, output video and metrics file."""
+
+    def __init__(self, number, config, output_folder, frame_rate, reference_bw=None):
+        self.config = dict(DEFAULT_CONFIG, **config)
+        if self.config["filter"] not in FILTERS:
+            raise ValueError(f"Unknown filter '{self.config['filter']}' (choose from {', '.join(FILTERS)}).")
+
+        c = self.config
+        self.name = c.get("name") or (f"{number:02d}_gain{c['gain']}_int{c['reference_interval']}_blend{c['blend_factor']}"
+                                      f"_{c['filter']}" + ("_initial" if c["initial_reference"] else ""))
+        self.output_path  = os.path.join(output_folder, f"{self.name}.mp4")
+        self.metrics_path = os.path.join(output_folder, f"{self.name}_metrics.csv")
+        self.frame_rate   = frame_rate
+        self.failed       = False
+
+        self._filter = FILTERS[c["filter"]]
+        self._reference_bw = reference_bw
+        self._previous_reference_bw = None
+        self._out = None
+
+        self._metrics_file = open(self.metrics_path, "w", newline="")
+        self._metrics = csv.writer(self._metrics_file)
+        self._metrics.writerow(["frame", "mean_diff", "max_diff", "saturated_fraction"])
+
+    def process(self, frame_index, frame_bw):
+        c = self.config
+        if self._reference_bw is None or (not c["initial_reference"] and frame_index % c["reference_interval"] == 0):
+            self._reference_bw = update_reference(frame_bw, self._previous_reference_bw, c["blend_factor"])
+        self._previous_reference_bw = self._reference_bw
+
+        diff = cv.absdiff(frame_bw, self._reference_bw)
+        diff_amplified = cv.multiply(self._filter(diff), c["gain"])
+        diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+
+        if self._out is None:
+            height, width = frame_bw.shape
+            fourcc = cv.VideoWriter_fourcc(*'mp4v')
+            self._out = cv.VideoWriter(self.output_path, fourcc, self.frame_rate, (width, height))
+        self._out.write(diff_colored)
+
+        _, max_diff, _, _ = cv.minMaxLoc(diff)
+        saturated = np.count_nonzero(diff_amplified == 255) / diff_amplified.size
+        self._metrics.writerow([frame_index, f"{cv.mean(diff)[0]:.4f}", int(max_diff), f"{saturated:.6f}"])
+
+    def close(self):
+        if self._out is not None:
+            self._out.release()
+        self._metrics_file.close()
+
+
+def _worker(jobs, frames):
+    while True:
+        item = frames.get()
+        if item is None:
+            return
+        frame_index, frame_bw = item
+        for job in jobs:
+            if job.failed:
+                continue
+            try:
+                job.process(frame_index, frame_bw)
+            except Exception as exc:
+                job.failed = True
+                print(f"Error in configuration {job.name} at frame {frame_index}: {exc}")
+
+
+def bos_sweep(source, configs, output_folder, start_frame=0, output_frame_rate=30, workers=None, queue_size=8):
+    """
+    Run many BOS parameter configurations over a recording while decoding each frame only once.
+
+    Frames are decoded and converted to grayscale on the calling thread and handed to `workers`
+    threads, each of which runs a share of the configurations. Every configuration writes its
+    own BOS video and a per-frame metrics CSV (mean and max difference, saturated fraction), so a
+    20-point sweep costs about one decode instead of twenty.
+
+    Parameters:
+        source (str): Folder with an image sequence, or a video file.
+        configs (list): Dicts with any of `gain`, `reference_interval`, `blend_factor`,
+            `initial_reference`, `reference_frame`, `filter` (see FILTERS) and an optional `name`.
+            Missing keys use the `bos_from_images` defaults.
+        output_folder (str): Folder for the output videos and metrics files.
+        start_frame (int): Index of the frame to start the analysis from.
+        output_frame_rate (int): Frames per second for the output videos.
+        workers (int): Number of worker threads (defaults to the CPU count, at most one per configuration).
+        queue_size (int): Frames buffered per worker; bounds memory when a worker falls behind.
+    """
+    # Validate every configuration before any output file is created
+    for config in configs:
+        name = dict(DEFAULT_CONFIG, **config)["filter"]
+        if name not in FILTERS:
+            print(f"Error: Unknown filter '{name}' (choose from {', '.join(FILTERS)}).")
+            return None
+    if not os.path.isdir(source) and any(config.get("reference_frame") is not None for config in configs):
+        print("Error: reference_frame is only supported for image sequences.")
+        return None
+
+    video = None
+    if os.path.isdir(source):
+        images = sorted([os.path.join(source, img) for img in os.listdir(source) if img.endswith(('.png', '.jpg', '.tif'))])
+        if not images:
+            print("Error: No images found in the specified folder.")
+            return None
+        # Validate start_frame and every reference_frame against the sequence
+        if start_frame >= len(images):
+            print(f"Error: Start frame {start_frame} exceeds the total number of frames ({len(images)}).")
+            return None
+        for config in configs:
+            reference_frame = config.get("reference_frame")
+            if reference_frame is not None and reference_frame >= len(images):
+                print(f"Error: Reference frame {reference_frame} exceeds the total number of frames ({len(images)}).")
+                return None
+        frames =(cv.imread(image_path) for image_path in images[start_frame:])
+        load_reference = lambda index: cv.imread(images[index], cv.IMREAD_GRAYSCALE)
+    else:
+        video = cv.VideoCapture(source)
+        if not video.isOpened():
+            print(f"Error: Unable to open video file {source}.")
+            return None
+        video.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+        frames = read_frames(video)
+        load_reference = None
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Fixed reference frames are decoded once and shared between configurations
+    references = {}
+    jobs = []
+    try:
+        for number, config in enumerate(configs):
+            reference_bw = None
+            index = config.get("reference_frame")
+            if index is not None:
+                if index not in references:
+                    references[index] = load_reference(index)
+                reference_bw = references[index]
+            jobs.append(_SweepJob(number, config, output_folder, output_frame_rate, reference_bw))
+    except Exception:
+        # Do not leave the metrics files of the jobs created so far open
+        for job in jobs:
+            job.close()
+        if video is not None:
+            video.release()
+        raise
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+    threads = [threading.Thread(target=_worker, args=(jobs[i::workers], queues[i]), daemon=True)
+               for i in range(workers)]
+    for t in threads:
+        t.start()
+
+    print(f"Sweeping {len(jobs)} configurations on {workers} worker(s)...")
+    start = time.perf_counter()
+    frame_index = start_frame
+    for frame in frames:
+        frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        for q in queues:
+            q.put((frame_index, frame_bw))
+        frame_index += 1
+        if frame_index % 100 == 0:
+            print(f"Decoded {frame_index} frames...")
+    if video is not None:
+        video.release()
+
+    for q in queues:
+        q.put(None)
+    for t in threads:
+        t.join()
+    for job in jobs:
+        job.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Sweep of {len(jobs)} configurations over {frame_index - start_frame} frames took {elapsed:.1f} s")
+    return [job.output_path for job in jobs if not job.failed]
+
+
+if __name__ == "__main__":
+    sweep = [{"gain": g, "reference_interval": 1, "blend_factor": b, "initial_reference": True, "reference_frame": 1}
+             for g in (5, 10, 20) for b in (0.5, 1.0)]
+    sweep += [{"gain": 20, "filter": f, "initial_reference": True, "reference_frame": 1} for f in ("none", "gaussian5")]
+    bos_sweep("C001H001S0002 50 CM", sweep, "sweep_50_CM", start_frame=1, output_frame_rate=100)
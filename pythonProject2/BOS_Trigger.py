@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+import cv2 as cv
+import numpy as np
+
+_STOP = object()
+
+
+class TriggerRecorder:
+    """
+    Pre-trigger ring buffer with event-triggered recording of raw frames.
+
+    The last `pre_seconds` of raw frames are kept in a preallocated in-memory ring. When a
+    trigger fires (difference energy above `threshold`, or `trigger()` called on a key press)
+    the buffered frames and the next `post_seconds` of frames are written to a new video file
+    by a background thread, so the capture loop never waits on the disk. A trigger during an
+    active recording extends it.
+
+    On a trigger the filled ring itself is handed to the writer and capture continues in a
+    second ring, so no frames are copied in the capture loop; the writer hands the ring back
+    once it is written. If both rings are still being written, the new event starts without
+    pre-trigger frames. At most `max_pending` post-trigger frames wait for the writer; when the
+    disk falls that far behind, further frames are dropped and counted instead of piling up.
+
+    Parameters:
+        fps (float): Frame rate of the source (also used for the saved files).
+        pre_seconds (float): Length of the pre-trigger ring in seconds.
+        post_seconds (float): Seconds recorded after the last trigger.
+        threshold (float): Difference energy that fires a trigger (None: key triggers only).
+        prefix (str): File name prefix of the saved events.
+        fourcc (str): Codec of the saved events.
+        max_pending (int): Post-trigger frames that may wait for the writer (defaults to the length of the
+            pre-trigger ring, which lets a writer running at the source rate catch up after writing the ring).
+    """
+
+    def __init__(self, fps, pre_seconds=2.0, post_seconds=5.0, threshold=None, prefix="bos_event", fourcc="mp4v",
+                 max_pending=None):
+        self.fps         = fps if fps and fps > 0 else 30.0
+        self.pre_frames  = max(1, int(round(pre_seconds * self.fps)))
+        self.post_frames = max(1, int(round(post_seconds * self.fps)))
+        self.threshold   = threshold
+        self.prefix      = prefix
+        self.fourcc      = fourcc
+
+        self.events  = 0
+        self.dropped = 0
+
+        self._ring      = None
+        self._rings     = 0               # rings allocated, at most two
+        self._free      = queue.Queue()   # rings handed back by the writer
+        self._head      = 0
+        self._count     = 0
+        self._remaining = 0
+
+        # Only post-trigger frames take a slot; rings, file names and end markers are always queued
+        self._slots  = threading.BoundedSemaphore(max_pending or self.pre_frames)
+        self._queue  = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def recording(self):
+        return self._remaining > 0
+
+    def update(self, frame, energy=None):
+        """
+        Add a captured frame to the ring (and to the active recording) and check the energy trigger.
+
+        The frame must not be modified afterwards, since a recording may still reference it.
+
+        Parameters:
+            frame (ndarray): Raw frame as captured.
+            energy (float): Difference energy of this frame, or None to skip the threshold check.
+        """
+        if self._ring is None:
+            self._ring = np.empty((self.pre_frames,) + frame.shape, dtype=frame.dtype)
+            self._rings = 1
+
+        if self._remaining > 0:
+            self._put_frame(frame)
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._queue.put(None)
+
+        self._ring[self._head] = frame
+        self._head = (self._head + 1) % self.pre_frames
+        self._count = min(self._count + 1, self.pre_frames)
+
+        if self.threshold is not None and energy is not None and energy >= self.threshold:
+            self.trigger()
+
+    def trigger(self):
+        """Start a recording with the buffered pre-trigger frames, or extend the active one."""
+        if self._remaining > 0:
+            self._remaining = self.post_frames
+            return
+        if self._ring is None:
+            return
+
+        self.events += 1
+        filename = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{self.events}.mp4"
+        print(f"Event triggered, recording {filename}")
+        self._queue.put(filename)
+
+        # Hand the filled ring to the writer and continue in a free one instead of copying it
+        try:
+            spare = self._free.get_nowait()
+        except queue.Empty:
+            spare = None
+            if self._rings < 2:
+                spare = np.empty_like(self._ring)
+                self._rings += 1
+        if spare is None:
+            self.dropped += self._count
+        else:
+            order = (self._head - self._count + np.arange(self._count)) % self.pre_frames  # oldest first
+            self._queue.put((self._ring, order))
+            self._ring, self._head, self._count = spare, 0, 0
+        self._remaining = self.post_frames
+
+    def _put_frame(self, frame):
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            return
+        self._queue.put(frame)
+
+    def close(self):
+        """Finish the active recording and wait for all frames to be written."""
+        if self._remaining > 0:
+            self._queue.put(None)
+            self._remaining = 0
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.dropped:
+            print(f"Dropped {self.dropped} event frame(s) while the writer was behind")
+
+    def _write_loop(self):
+        filename = None
+        writer   = None
+
+        def write(frame):
+            nonlocal writer
+            if writer is None:
+                height, width = frame.shape[:2]
+                fourcc = cv.VideoWriter_fourcc(*self.fourcc)
+                writer = cv.VideoWriter(filename, fourcc, self.fps, (width, height), frame.ndim == 3)
+            writer.write(frame)
+
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if isinstance(item, str):
+                filename = item
+            elif item is None:
+                if writer is not None:
+                    writer.release()
+                    print(f"Event saved as {filename}")
+                writer = None
+            elif isinstance(item, tuple):
+                # Pre-trigger ring, given back for reuse once it is written
+                ring, order = item
+                for index in order:
+                    write(ring[index])
+                self._free.put(ring)
+            else:
+                write(item)
+                self._slots.release()
+        if writer is not None:
+            writer.release()
@@ -25,5 +25,6 @@ def convert_mov_to_mp4(input_path, output_path):
     out.release()
     print(f"conversion completed: {output_path}")
 
-# example usage
-convert_mov_to_mp4("Procced BOS/115hz iPad .mov", "Procced BOS/115hz iPad .mp4")
+# example usage (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    convert_mov_to_mp4("Procced BOS/115hz iPad .mov", "Procced BOS/115hz iPad .mp4")
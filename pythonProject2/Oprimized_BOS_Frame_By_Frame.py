@@ -1,6 +1,18 @@
 import cv2 as cv
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+from BOS_AutoGain import AutoGain
+from BOS_Block import bos_blocks, smoothed_differences, update_reference
+from BOS_Cache import ResultCache, input_signature
+from BOS_Checkpoint import CheckpointedOutput
+from BOS_Export import SequenceExporter
+from BOS_Fused import bos_fused, bos_lut
+from BOS_Mono16 import bos_from_mono16
+from BOS_Stabilize import FrameStabilizer
+from BOS_Spectrum import WelchSpectrum
+from BOS_Static import StaticFrameGate
+from BOS_Tiles import bos_tiled
 
 def bos_from_images(
     image_folder,
@@ -12,7 +24,25 @@ def bos_from_images(
     start_frame=0,
     reference_frame=None,
     output_frame_rate=30,  # New parameter to control video speed
-    display=False):
+    display=False,
+    block_size=None,
+    fused=False,
+    static_threshold=None,
+    cache_dir=None,
+    cache_max_gb=20,
+    tile_size=None,
+    tile_workers=None,
+    mono16=False,
+    bit_depth=None,
+    stabilize=False,
+    checkpoint_interval=None,
+    resume=False,
+    auto_gain=False,
+    export_dir=None,
+    export_format="png",
+    export_compression=3,
+    spectrum=False,
+    frame_rate=None):
     """
     Perform Background Oriented Schlieren (BOS) processing on a sequence of images.
 
@@ -27,7 +57,66 @@ def bos_from_images(
         reference_frame (int): Specific frame number to use as the reference frame, regardless of `start_frame`.
         output_frame_rate (int): Frames per second for the output video.
         display (bool): Whether to display the BOS output during processing.
+        block_size (int): If set, load and process this many frames at a time as one (N, H, W) block.
+            The output is identical to the per-frame path.
+        fused (bool): Use the Numba fused kernel (`BOS_Fused.bos_fused`) for the per-frame path.
+        static_threshold (float): `BOS_Static.StaticFrameGate` threshold (None disables the gate).
+            Only used on the per-frame path.
+        cache_dir (str): If set, cache the decoded frames and the smoothed differences in this folder, keyed by
+            the input files and stage parameters, so a rerun that only changes `gain` skips decoding and
+            differencing, and one that changes the reference parameters skips decoding.
+        cache_max_gb (float): Disk size limit of the cache; least recently used entries are evicted.
+        tile_size (int): If set, process each frame in overlapping tiles of this size across threads. Only the
+            difference, blur, gain and colormap temporaries shrink to tile size: the decoded BGR frame, the
+            grayscale frame, the reference and the output frame are still full size (about 8 bytes per pixel,
+            one more with `auto_gain`), so peak memory still grows with the frame size. The output is identical
+            to the per-frame path.
+        tile_workers (int): Number of threads for the tiled path (defaults to the CPU count).
+        mono16 (bool): Read the frames as native-depth mono (e.g. 12-bit TIFFs) and run the difference pipeline in
+            float32 (see `BOS_Mono16.bos_from_mono16`). Implied when `image_folder` is a Photron .cih/.cihx header.
+            Only the reference, gain, frame range and display options apply; the others are rejected.
+        bit_depth (int): Significant bits of mono input (defaults to the Photron header, otherwise inferred from
+            the first frame, see `BOS_Mono16.infer_bit_depth`).
+        stabilize (bool): Register each frame to the reference by phase correlation before differencing, to remove
+            camera vibration. Pass a `BOS_Stabilize.FrameStabilizer` to tune it. Per-frame and tiled paths; rejected
+            with `cache_dir` or `block_size`.
+        checkpoint_interval (int): If set, write the output in segments and save the frame index and reference
+            state every this many frames, so an interrupted run can be resumed. Per-frame path only; rejected
+            with `cache_dir`, `block_size` or `tile_size`.
+        resume (bool): Continue from the checkpoint of an interrupted run with the same parameters. The output is
+            identical to an uninterrupted run with the same `checkpoint_interval`.
+        auto_gain (bool): Choose the gain automatically so the 99.5th percentile of the smoothed difference maps to
+            full scale, from a subsampled histogram averaged over recent frames (`gain` is the starting value).
+            Pass a `BOS_AutoGain.AutoGain` to tune it. Not combined with `fused`.
+        export_dir (str): If set, also write every output frame to this folder as a lossless image sequence numbered
+            by frame index, encoded in parallel by a thread pool while the next frames are processed.
+        export_format (str): "png" or "tif".
+        export_compression (int): PNG compression level (0-9); for TIFF, 0 is uncompressed and anything else LZW.
+        spectrum (bool): Also compute per-pixel Welch power spectra of the frames out of core, with dominant-frequency
+            and band-power maps, into <output_video_path stem>_spectrum (per-frame path, not resumed from
+            checkpoints). Requires `frame_rate`, or pass a `BOS_Spectrum.WelchSpectrum` to also choose the
+            segment length and bands.
+        frame_rate (float): Capture frame rate of the sequence, for the spectrum's frequency axis
+            (`output_frame_rate` is only the playback rate of the output video).
     """
+    # Native-depth mono input keeps its dynamic range up to the display mapping
+    if mono16 or image_folder.lower().endswith(('.cih', '.cihx')):
+        options = {"block_size": block_size, "fused": fused, "static_threshold": static_threshold is not None,
+                   "cache_dir": cache_dir, "tile_size": tile_size, "stabilize": stabilize,
+                   "checkpoint_interval": checkpoint_interval, "resume": resume, "auto_gain": auto_gain,
+                   "export_dir": export_dir, "spectrum": spectrum}
+        unsupported = [name for name, value in options.items() if value]
+        if unsupported:
+            print(f"Error: The native-depth mono path does not support {', '.join(unsupported)}.")
+            return None
+        return bos_from_mono16(image_folder, output_video_path, gain, reference_interval, blend_factor,
+                               initial_reference, start_frame, reference_frame, output_frame_rate, display, bit_depth)
+
+    # The spectrum needs the capture rate, which image files do not carry
+    if spectrum is True and not frame_rate:
+        print("Error: spectrum=True requires the capture frame_rate of the image sequence.")
+        return None
+
     # Get a sorted list of image files
     images = sorted([os.path.join(image_folder, img) for img in os.listdir(image_folder) if img.endswith(('.png', '.jpg', '.tif'))])
     if not images:
@@ -43,13 +132,41 @@ def bos_from_images(
         print(f"Error: Reference frame {reference_frame} exceeds the total number of frames ({len(images)}).")
         return None
 
+    # Checkpoints are only written by the per-frame loop
+    if checkpoint_interval and (cache_dir or block_size or tile_size):
+        print("Error: Checkpoints are only supported on the per-frame path; "
+              "run without cache_dir, block_size and tile_size.")
+        return None
+
+    # The cached and block paths difference the frames as decoded
+    if stabilize and (cache_dir or block_size):
+        print("Error: Stabilization is not supported with cache_dir or block_size; use the per-frame or tiled path.")
+        return None
+
     # Read the first image to get dimensions
     first_image = cv.imread(images[0])
     height, width, _ = first_image.shape
 
     # Define the codec and create a VideoWriter object
     fourcc = cv.VideoWriter_fourcc(*'mp4v')
-    out = cv.VideoWriter(output_video_path, fourcc, output_frame_rate, (width, height))
+    if checkpoint_interval:
+        # Segmented output plus a checkpoint file, so a crash only loses the current segment
+        params = (input_signature(images), gain, reference_interval, blend_factor, initial_reference, start_frame,
+                  reference_frame, static_threshold, bool(stabilize), bool(auto_gain), bool(cache_dir), block_size,
+                  tile_size)
+        try:
+            out = CheckpointedOutput(output_video_path, fourcc, output_frame_rate, (width, height),
+                                     checkpoint_interval, params, resume)
+        except ValueError as exc:
+            print(f"Error: {exc}")
+            return None
+    else:
+        out = cv.VideoWriter(output_video_path, fourcc, output_frame_rate, (width, height))
+
+    # Lossless frame export; offline every frame is kept, so writes wait when the encoders are behind
+    exporter = None
+    if export_dir:
+        exporter = SequenceExporter(export_dir, "bos", export_format, export_compression, block=True)
 
     # Initialize the reference frame
     if reference_frame is not None:
@@ -60,70 +177,226 @@ def bos_from_images(
     else:
         reference_frame_bw = None
 
-    previous_reference_frame_bw = None
+    # Reference update rule shared by the cached, block and tiled paths
+    def should_update(index, reference_bw):
+        return reference_bw is None or (not initial_reference and index % reference_interval == 0)
 
-    # Process frames starting from the specified start frame
-    for frame_index, image_path in enumerate(images[start_frame:], start=start_frame):
-        # Read and convert the current image to grayscale
-        frame = cv.imread(image_path)
-        frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+    # Only the per-frame path checks for static frames
+    if static_threshold is not None and (cache_dir or block_size or tile_size):
+        print("Warning: The static frame gate is only used on the per-frame path; "
+              "it is off with cache_dir, block_size or tile_size.")
 
-        # Update the reference frame based on the interval or use the specific reference frame
-        if reference_frame_bw is None or (not initial_reference and frame_index % reference_interval == 0):
-            if previous_reference_frame_bw is None:
-                # First reference frame
-                reference_frame_bw = frame_bw
-            else:
-                # Blend the current reference frame with the previous one
-                reference_frame_bw = cv.addWeighted(frame_bw, blend_factor, previous_reference_frame_bw, 1 - blend_factor, 0)
+    # Only the per-frame path feeds the spectrum
+    if spectrum and (cache_dir or block_size or tile_size):
+        print("Warning: The spectrum is only computed on the per-frame path; "
+              "it is skipped with cache_dir, block_size or tile_size.")
 
-        # Ensure the reference frame exists before computing the difference
-        if reference_frame_bw is not None:
-            # Compute the absolute difference
-            diff = cv.absdiff(frame_bw, reference_frame_bw)
+    if cache_dir:
+        # Reuse cached upstream stages; only the stages after a changed parameter are recomputed
+        cache = ResultCache(cache_dir, int(cache_max_gb * 2**30))
+        gray_key = ResultCache.key("gray", input_signature(images), start_frame)
+        diff_key = ResultCache.key("median5", gray_key, reference_interval, blend_factor, initial_reference,
+                                   reference_frame)
 
-            # Smooth the difference image and amplify intensity
-            diff_smoothed = cv.medianBlur(diff, 5)
-            diff_amplified = cv.multiply(diff_smoothed, gain)
+        diff_stack = cache.load(diff_key)
+        if diff_stack is None:
+            gray_stack = cache.load(gray_key)
+            if gray_stack is None:
+                frames = (cv.cvtColor(cv.imread(image_path), cv.COLOR_BGR2GRAY) for image_path in images[start_frame:])
+                gray_stack = cache.store(gray_key, frames)
+            else:
+                print("Using cached grayscale frames.")
+            diff_stack = cache.store(diff_key, smoothed_differences(gray_stack, start_frame, should_update,
+                                                                    blend_factor, reference_frame_bw))
+        else:
+            print("Using cached difference frames.")
 
-            # Apply a color map for visualization
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        for frame_index, diff_smoothed in enumerate(diff_stack, start=start_frame):
+            if auto_gain is not None:
+                gain = auto_gain.update(diff_smoothed)
+            diff_amplified = cv.multiply(diff_smoothed, gain)
             diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+            out.write(diff_colored)
+            if exporter is not None:
+                exporter.write(diff_colored, frame_index)
+
+            if display:
+                cv.imshow("BOS Effect", diff_colored)
+                if cv.waitKey(1) == 27:  # ESC key to exit display
+                    break
 
-            # Write the processed frame to the output video
+            if frame_index % 100 == 0:
+                print(f"Processed {frame_index + 1}/{len(images)} images...")
+    elif block_size:
+        # Process whole blocks of frames with one call per stage
+        frames = (cv.imread(image_path) for image_path in images[start_frame:])
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        for frame_index, diff_colored in bos_blocks(frames, start_frame, block_size, should_update, blend_factor,
+                                                    gain, reference_frame_bw, auto_gain):
             out.write(diff_colored)
+            if exporter is not None:
+                exporter.write(diff_colored, frame_index)
 
-            # Optionally display the result
             if display:
                 cv.imshow("BOS Effect", diff_colored)
                 if cv.waitKey(1) == 27:  # ESC key to exit display
                     break
 
-        # Store the current reference frame for the next iteration
-        previous_reference_frame_bw = reference_frame_bw
+            if frame_index % 100 == 0:
+                print(f"Processed {frame_index + 1}/{len(images)} images...")
+    elif tile_size:
+        # The chain's temporaries are tile-sized; the decoded frames, the reference and the output are not
+        previous_reference_frame_bw = None
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        stabilizer = FrameStabilizer() if stabilize is True else stabilize or None
+        diff_colored = np.empty((height, width, 3), dtype=np.uint8)
+        with ThreadPoolExecutor(tile_workers) as executor:
+            for frame_index, image_path in enumerate(images[start_frame:], start=start_frame):
+                # Read and convert the current image to grayscale, as the other paths do
+                frame_bw = cv.cvtColor(cv.imread(image_path), cv.COLOR_BGR2GRAY)
+
+                # Register the frame to the current reference before it is blended in or differenced
+                if stabilizer is not None and reference_frame_bw is not None:
+                    frame_bw = stabilizer.stabilize(frame_bw, reference_frame_bw)
 
-        if frame_index % 100 == 0:
-            print(f"Processed {frame_index + 1}/{len(images)} images...")
+                if should_update(frame_index, reference_frame_bw):
+                    reference_frame_bw = update_reference(frame_bw, previous_reference_frame_bw, blend_factor)
+                previous_reference_frame_bw = reference_frame_bw
+
+                # Difference, blur, gain and colormap tile by tile
+                bos_tiled(frame_bw, reference_frame_bw, gain, diff_colored, tile_size, executor, auto_gain=auto_gain)
+                out.write(diff_colored)
+                if exporter is not None:
+                    exporter.write(diff_colored, frame_index)
+
+                if display:
+                    cv.imshow("BOS Effect", diff_colored)
+                    if cv.waitKey(1) == 27:  # ESC key to exit display
+                        break
+
+                if frame_index % 100 == 0:
+                    print(f"Processed {frame_index + 1}/{len(images)} images...")
+    else:
+        previous_reference_frame_bw = None
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        lut = bos_lut(gain) if fused and auto_gain is None else None
+        static_gate = StaticFrameGate(static_threshold)
+        stabilizer = FrameStabilizer() if stabilize is True else stabilize or None
+        if spectrum is True:
+            spectrum = WelchSpectrum(os.path.splitext(output_video_path)[0] + "_spectrum", frame_rate)
+        spectrum = spectrum or None
+        first_frame = start_frame
+
+        if checkpoint_interval and out.state is not None:
+            # Restore the reference model and continue after the last checkpointed frame
+            first_frame = out.state["frame_index"]
+            reference_frame_bw = previous_reference_frame_bw = out.state["reference"]
+            static_gate = out.state["static_gate"]
+            auto_gain = out.state["auto_gain"]
+            if spectrum is not None:
+                print("Warning: The spectrum is not checkpointed; it only covers the frames processed after the resume.")
+
+        # Process frames starting from the specified start frame
+        for frame_index, image_path in enumerate(images[first_frame:], start=first_frame):
+            # Read and convert the current image to grayscale
+            frame = cv.imread(image_path)
+            frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+
+            # Register the frame to the current reference before it is blended in or differenced
+            if stabilizer is not None and reference_frame_bw is not None:
+                frame_bw = stabilizer.stabilize(frame_bw, reference_frame_bw)
+
+            # Per-pixel spectra of the (stabilized) frames
+            if spectrum is not None:
+                spectrum.add(frame_bw)
+
+            # Update the reference frame based on the interval or use the specific reference frame
+            if reference_frame_bw is None or (not initial_reference and frame_index % reference_interval == 0):
+                if previous_reference_frame_bw is None:
+                    # First reference frame
+                    reference_frame_bw = frame_bw
+                else:
+                    # Blend the current reference frame with the previous one
+                    reference_frame_bw = cv.addWeighted(frame_bw, blend_factor, previous_reference_frame_bw, 1 - blend_factor, 0)
+
+            # Ensure the reference frame exists before computing the difference
+            if reference_frame_bw is not None:
+                # Reuse the previous output and skip the expensive stages when the frame is static
+                diff_colored = static_gate.check(frame_bw, reference_frame_bw)
+                if diff_colored is None:
+                    if lut is not None:
+                        # Difference, blur, gain and colormap in one tiled pass
+                        diff_colored = bos_fused(frame_bw, reference_frame_bw, gain, lut=lut)
+                    else:
+                        # Compute the absolute difference
+                        diff = cv.absdiff(frame_bw, reference_frame_bw)
+
+                        # Smooth the difference image and amplify intensity
+                        diff_smoothed = cv.medianBlur(diff, 5)
+                        if auto_gain is not None:
+                            # Map the recent high percentile of the difference to full scale
+                            gain = auto_gain.update(diff_smoothed)
+                        diff_amplified = cv.multiply(diff_smoothed, gain)
+
+                        # Apply a color map for visualization
+                        diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+                    static_gate.store(diff_colored)
+
+                # Write the processed frame to the output video
+                out.write(diff_colored)
+                if exporter is not None:
+                    exporter.write(diff_colored, frame_index)
+
+                # Optionally display the result
+                if display:
+                    cv.imshow("BOS Effect", diff_colored)
+                    if cv.waitKey(1) == 27:  # ESC key to exit display
+                        break
+
+            # Store the current reference frame for the next iteration
+            previous_reference_frame_bw = reference_frame_bw
+
+            if checkpoint_interval:
+                out.step(lambda: {"frame_index": frame_index + 1, "reference": reference_frame_bw,
+                                  "static_gate": static_gate, "auto_gain": auto_gain})
+
+            if frame_index % 100 == 0:
+                print(f"Processed {frame_index + 1}/{len(images)} images...")
+
+        if static_threshold is not None:
+            print(static_gate.report())
+        if spectrum is not None:
+            spectrum.close()
+
+    if auto_gain is not None:
+        print(f"Final automatic gain: {auto_gain.gain:.2f}")
 
     # Release resources
     out.release()
-    cv.destroyAllWindows()
+    if exporter is not None:
+        exporter.close()
+        print(exporter.report())
+    if display:
+        cv.destroyAllWindows()  # not available in headless OpenCV builds
     print(f"BOS video saved as {output_video_path}")
 
 
-# Example usage
-image_folder = "C001H001S0002 50 CM"  # Folder containing image sequence
-bos_video_path = "50_CM_Video_BOS.mp4"  # Final BOS video file
+# Example usage (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    image_folder = "C001H001S0002 50 CM"  # Folder containing image sequence
+    bos_video_path = "50_CM_Video_BOS.mp4"  # Final BOS video file
 
-# Perform BOS processing directly on images
-bos_from_images(
-    image_folder=image_folder,
-    output_video_path=bos_video_path,
-    gain=20,
-    reference_interval=1,  # Adjust reference update interval
-    blend_factor=0.5,
-    initial_reference=True,  # Use only the reference frame if True
-    start_frame=1,  # Start analysis from frame 1000
-    reference_frame=1,  # Use frame  as the reference frame
-    output_frame_rate=100,  # Set video speed (higher value = faster video)
-    display=True
-)
+    # Perform BOS processing directly on images
+    bos_from_images(
+        image_folder=image_folder,
+        output_video_path=bos_video_path,
+        gain=20,
+        reference_interval=1,  # Adjust reference update interval
+        blend_factor=0.5,
+        initial_reference=True,  # Use only the reference frame if True
+        start_frame=1,  # Start analysis from frame 1000
+        reference_frame=1,  # Use frame  as the reference frame
+        output_frame_rate=100,  # Set video speed (higher value = faster video)
+        display=True
+    )
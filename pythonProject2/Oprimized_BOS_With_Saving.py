@@ -1,7 +1,11 @@
 import cv2 as cv
 import numpy as np
+from BOS_AutoGain import AutoGain
+from BOS_Startup import StartupTimer
+from BOS_Static import StaticFrameGate
 
-def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, output_filename="output.avi"):
+def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, output_filename="output.avi",
+                  static_threshold=None, stride=1, auto_gain=False):
     """
     Synthetic Schlieren System using a webcam and OpenCV, saving the processed video with progress updates.
 
@@ -11,7 +15,17 @@ def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, outpu
         update_interval (int): Number of frames after which the reference frame updates.
         blend_factor (float): Factor for blending the current reference frame with the previous one (0 to 1).
         output_filename (str): Name of the file to save the processed video.
+        static_threshold (float): `BOS_Static.StaticFrameGate` threshold (None disables the gate).
+        stride (int): Only process every `stride`-th frame. Skipped frames are advanced with `grab()` and never
+            retrieved, the reference only sees the retained frames, and the output is saved at the source FPS
+            divided by `stride`.
+        auto_gain (bool): Choose the gain automatically so the 99.5th percentile of the smoothed difference maps to
+            full scale, from a subsampled histogram averaged over recent frames (`gain` is the starting value).
+            Pass a `BOS_AutoGain.AutoGain` to tune it.
     """
+    # Time the start-up until the first processed frame
+    startup = StartupTimer()
+
     # Open the camera or video file
     webcam = cv.VideoCapture('Procced BOS/125HZ IPAD.MOV')
 
@@ -26,10 +40,13 @@ def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, outpu
     frame_width = int(webcam.get(cv.CAP_PROP_FRAME_WIDTH))
     frame_height = int(webcam.get(cv.CAP_PROP_FRAME_HEIGHT))
     total_frames = int(webcam.get(cv.CAP_PROP_FRAME_COUNT))
+
+    # Decimation: only the retained frames are counted and saved
+    total_frames = (total_frames + stride - 1) // stride
     fourcc = cv.VideoWriter_fourcc(*'MP4V')  # Codec for AVI format
 
     # Define video writer
-    out = cv.VideoWriter(output_filename, fourcc, fps, (1920, 1080))
+    out = cv.VideoWriter(output_filename, fourcc, fps / stride, (1920, 1080))
 
     # Frame processing variables
     frame_count = 0
@@ -37,8 +54,17 @@ def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, outpu
     previous_reference_frame_bw = None
     display_width, display_height = 1920, 1080
 
+    # Early-out for frames without flow
+    static_gate = StaticFrameGate(static_threshold)
+
+    # Automatic gain from the recent high percentile of the difference
+    auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+
     while True:
-        ret, frame = webcam.read()
+        # Grab the frames skipped by the stride without retrieving them, then retrieve the retained one
+        ret = all(webcam.grab() for _ in range(stride))
+        if ret:
+            ret, frame = webcam.retrieve()
         if not ret:
             print("End of video or unable to capture video.")
             break
@@ -54,15 +80,22 @@ def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, outpu
                 reference_frame_bw = cv.addWeighted(frame_bw, blend_factor, previous_reference_frame_bw, 1 - blend_factor, 0)
 
         if reference_frame_bw is not None:
-            # Compute Schlieren effect
-            diff = cv.absdiff(frame_bw, reference_frame_bw)
-            diff_smoothed = cv.medianBlur(diff, 5)
-            diff_amplified = cv.multiply(diff_smoothed, gain)
-            diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
-            diff_resized = cv.resize(diff_colored, (display_width, display_height), interpolation=cv.INTER_LINEAR)
+            # Reuse the previous output and skip the expensive stages when the frame is static
+            diff_resized = static_gate.check(frame_bw, reference_frame_bw)
+            if diff_resized is None:
+                # Compute Schlieren effect
+                diff = cv.absdiff(frame_bw, reference_frame_bw)
+                diff_smoothed = cv.medianBlur(diff, 5)
+                if auto_gain is not None:
+                    gain = auto_gain.update(diff_smoothed)
+                diff_amplified = cv.multiply(diff_smoothed, gain)
+                diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+                diff_resized = cv.resize(diff_colored, (display_width, display_height), interpolation=cv.INTER_LINEAR)
+                static_gate.store(diff_resized)
 
             # Write the frame to the output video file
             out.write(diff_resized)
+            startup.frame_processed()
 
             progress = (frame_count / total_frames) * 100
             print(f"Processing: {progress:.2f}%", end="\r")
@@ -74,10 +107,14 @@ def schlieren_cam(channel=0, gain=10, update_interval=4, blend_factor=0.5, outpu
         previous_reference_frame_bw = reference_frame_bw
         frame_count += 1
 
+    if static_threshold is not None:
+        print(f"\n{static_gate.report()}")
+
     # Release resources
     webcam.release()
     out.release()  # Release the video writer
     print(f"\nProcessed video saved as {output_filename}")
 
-# Run the Schlieren System
-schlieren_cam(channel=0, gain=7, update_interval=10, blend_factor=1, output_filename="200HZ_processed_video.mp4")
+# Run the Schlieren System (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    schlieren_cam(channel=0, gain=7, update_interval=10, blend_factor=1, output_filename="200HZ_processed_video.mp4")
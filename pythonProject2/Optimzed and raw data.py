@@ -1,6 +1,15 @@
 import cv2 as cv
 import numpy as np
 import os
+from BOS_AutoGain import AutoGain
+from BOS_Block import bos_blocks, read_frames, smoothed_differences
+from BOS_Cache import ResultCache, input_signature
+from BOS_Checkpoint import CheckpointedOutput
+from BOS_Fused import bos_fused, bos_lut
+from BOS_Ratio import RatioBackground
+from BOS_Stabilize import FrameStabilizer
+from BOS_Spectrum import WelchSpectrum
+from BOS_Static import StaticFrameGate
 
 def images_to_video(image_folder, output_video_path, frame_rate):
     """
@@ -35,7 +44,10 @@ def images_to_video(image_folder, output_video_path, frame_rate):
     return output_video_path
 
 
-def bos_from_video(input_file, output_file, gain=10, update_interval=4, blend_factor=0.5, display=False):
+def bos_from_video(input_file, output_file, gain=10, update_interval=4, blend_factor=0.5, display=False, block_size=None,
+                   fused=False, static_threshold=None, cache_dir=None, cache_max_gb=20, ratio=False,
+                   stabilize=False, checkpoint_interval=None, resume=False, stride=1,
+                   auto_gain=False, spectrum=False):
     """
     Perform Background Oriented Schlieren (BOS) processing on a video.
 
@@ -46,6 +58,35 @@ def bos_from_video(input_file, output_file, gain=10, update_interval=4, blend_fa
         update_interval (int): Number of frames after which the reference frame updates.
         blend_factor (float): Factor for blending the current reference frame with the previous one (0 to 1).
         display (bool): Whether to display the BOS output during processing.
+        block_size (int): If set, load and process this many frames at a time as one (N, H, W) block.
+            The output is identical to the per-frame path.
+        fused (bool): Use the Numba fused kernel (`BOS_Fused.bos_fused`) for the per-frame path.
+        static_threshold (float): `BOS_Static.StaticFrameGate` threshold (None disables the gate).
+            Only used on the per-frame path.
+        cache_dir (str): If set, cache the decoded frames and the smoothed differences in this folder, keyed by
+            the input file and stage parameters, so a rerun that only changes `gain` skips decoding and
+            differencing, and one that changes the reference parameters skips decoding.
+        cache_max_gb (float): Disk size limit of the cache; least recently used entries are evicted.
+        ratio (bool): Use the normalized ratio |frame / reference - 1| * 255 instead of the absolute difference,
+            which is robust to illumination flicker. Per-frame path only; rejected with `cache_dir` or `block_size`.
+        stabilize (bool): Register each frame to the reference by phase correlation before differencing, to remove
+            camera vibration. Pass a `BOS_Stabilize.FrameStabilizer` to tune it. Per-frame path only; rejected with
+            `cache_dir` or `block_size`.
+        checkpoint_interval (int): If set, write the output in segments and save the frame index and reference
+            state every this many frames, so an interrupted run can be resumed. Per-frame path only; rejected
+            with `cache_dir` or `block_size`.
+        resume (bool): Continue from the checkpoint of an interrupted run with the same parameters. The output is
+            identical to an uninterrupted run with the same `checkpoint_interval`.
+        stride (int): Only process every `stride`-th frame, e.g. for a quick preview or to view a high-speed
+            recording at a lower rate. Skipped frames are advanced with `grab()` and never retrieved or processed,
+            and the reference model only sees the retained frames (`update_interval` counts retained frames).
+            The output is written at the source FPS divided by `stride`, so it plays in real time.
+        auto_gain (bool): Choose the gain automatically so the 99.5th percentile of the smoothed difference maps to
+            full scale, from a subsampled histogram averaged over recent frames (`gain` is the starting value).
+            Pass a `BOS_AutoGain.AutoGain` to tune it. Not combined with `fused`.
+        spectrum (bool): Also compute per-pixel Welch power spectra of the frames out of core, with dominant-frequency
+            and band-power maps, into <output_file stem>_spectrum (per-frame path, not resumed from checkpoints).
+            Pass a `BOS_Spectrum.WelchSpectrum` to choose the folder, segment length and bands.
     """
     # Open the input video file
     video = cv.VideoCapture(input_file)
@@ -62,78 +103,231 @@ def bos_from_video(input_file, output_file, gain=10, update_interval=4, blend_fa
     print(f"Processing video: {input_file}")
     print(f"Resolution: {frame_width}x{frame_height}, FPS: {frame_rate}, Total frames: {frame_count}")
 
+    # Decimation: only every 'stride'-th frame is retrieved, and the output keeps the real-time rate
+    output_frame_rate = frame_rate / stride
+    if stride > 1:
+        frame_count = (frame_count + stride - 1) // stride
+        print(f"Processing every {stride}th frame ({frame_count} frames), output at {output_frame_rate:g} FPS")
+
+    # Checkpoints are only written by the per-frame loop
+    if checkpoint_interval and (cache_dir or block_size):
+        print("Error: Checkpoints are only supported on the per-frame path; run without cache_dir and block_size.")
+        video.release()
+        return
+
+    # The cached and block paths difference the frames as decoded
+    if stabilize and (cache_dir or block_size):
+        print("Error: Stabilization is only supported on the per-frame path; run without cache_dir and block_size.")
+        video.release()
+        return
+
+    # The cached and block paths only run the absolute-difference chain
+    if ratio and (cache_dir or block_size):
+        print("Error: The normalized ratio is only supported on the per-frame path; run without cache_dir and block_size.")
+        video.release()
+        return
+
     # Define the codec and create a VideoWriter object
     fourcc = cv.VideoWriter_fourcc(*'mp4v')
-    out = cv.VideoWriter(output_file, fourcc, frame_rate, (frame_width, frame_height))
-
-    # Initialize variables
-    reference_frame_bw = None
-    previous_reference_frame_bw = None
-    frame_index = 0
-
-    while True:
-        ret, frame = video.read()
-        if not ret:
-            break  # End of video
-
-        # Convert the current frame to grayscale
-        frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
-
-        # Update the reference frame every 'update_interval' frames
-        if frame_index % update_interval == 0:
-            if previous_reference_frame_bw is None:
-                # If this is the first reference frame, just assign it
-                reference_frame_bw = frame_bw
-            else:
-                # Blend the current reference frame with the previous one
-                reference_frame_bw = cv.addWeighted(frame_bw, blend_factor, previous_reference_frame_bw, 1 - blend_factor, 0)
+    if checkpoint_interval:
+        # Segmented output plus a checkpoint file, so a crash only loses the current segment
+        params = (os.path.abspath(input_file), gain, update_interval, blend_factor, static_threshold, ratio,
+                  bool(stabilize), stride, bool(auto_gain), bool(cache_dir), block_size)
+        try:
+            out = CheckpointedOutput(output_file, fourcc, output_frame_rate, (frame_width, frame_height),
+                                     checkpoint_interval, params, resume)
+        except ValueError as exc:
+            print(f"Error: {exc}")
+            video.release()
+            return
+    else:
+        out = cv.VideoWriter(output_file, fourcc, output_frame_rate, (frame_width, frame_height))
 
-        # Ensure the reference frame exists before computing the difference
-        if reference_frame_bw is not None:
-            # Compute the absolute difference
-            diff = cv.absdiff(frame_bw, reference_frame_bw)
+    # Reference update rule shared by the cached and block paths
+    def should_update(index, reference_bw):
+        return index % update_interval == 0
 
-            # Smooth the difference image and amplify intensity
-            diff_smoothed = cv.medianBlur(diff, 5)
-            diff_amplified = cv.multiply(diff_smoothed, gain)
+    # Only the per-frame path checks for static frames
+    if static_threshold is not None and (cache_dir or block_size):
+        print("Warning: The static frame gate is only used on the per-frame path; it is off with cache_dir or block_size.")
 
-            # Apply a color map for visualization
+    # Only the per-frame path feeds the spectrum
+    if spectrum and (cache_dir or block_size):
+        print("Warning: The spectrum is only computed on the per-frame path; it is skipped with cache_dir or block_size.")
+
+    if cache_dir:
+        # Reuse cached upstream stages; only the stages after a changed parameter are recomputed
+        cache = ResultCache(cache_dir, int(cache_max_gb * 2**30))
+        gray_key = ResultCache.key("gray", input_signature([input_file]), *([stride] if stride > 1 else []))
+        diff_key = ResultCache.key("median5", gray_key, update_interval, blend_factor)
+
+        diff_stack = cache.load(diff_key)
+        if diff_stack is None:
+            gray_stack = cache.load(gray_key)
+            if gray_stack is None:
+                frames = (cv.cvtColor(frame, cv.COLOR_BGR2GRAY) for frame in read_frames(video, stride))
+                gray_stack = cache.store(gray_key, frames)
+            else:
+                print("Using cached grayscale frames.")
+            diff_stack = cache.store(diff_key, smoothed_differences(gray_stack, 0, should_update, blend_factor))
+        else:
+            print("Using cached difference frames.")
+
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        for frame_index, diff_smoothed in enumerate(diff_stack):
+            if auto_gain is not None:
+                gain = auto_gain.update(diff_smoothed)
+            diff_amplified = cv.multiply(diff_smoothed, gain)
             diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+            out.write(diff_colored)
+
+            if display:
+                cv.imshow("BOS Effect", diff_colored)
+                if cv.waitKey(1) == 27:  # ESC key to exit display
+                    break
 
-            # Write the processed frame to the output video
+            if (frame_index + 1) % 100 == 0:
+                print(f"Processed {frame_index + 1}/{frame_count} frames...")
+    elif block_size:
+        # Process whole blocks of frames with one call per stage
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        for frame_index, diff_colored in bos_blocks(read_frames(video, stride), 0, block_size, should_update, blend_factor, gain,
+                                                    auto_gain=auto_gain):
             out.write(diff_colored)
 
-            # Optionally display the result
             if display:
                 cv.imshow("BOS Effect", diff_colored)
                 if cv.waitKey(1) == 27:  # ESC key to exit display
                     break
 
-        # Store the current reference frame for the next iteration
-        previous_reference_frame_bw = reference_frame_bw
+            if (frame_index + 1) % 100 == 0:
+                print(f"Processed {frame_index + 1}/{frame_count} frames...")
+    else:
+        # Initialize variables
+        reference_frame_bw = None
+        previous_reference_frame_bw = None
+        auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+        lut = bos_lut(gain) if fused and not ratio and auto_gain is None else None
+        static_gate = StaticFrameGate(static_threshold)
+        ratio_background = RatioBackground()
+        stabilizer = FrameStabilizer() if stabilize is True else stabilize or None
+        if spectrum is True:
+            spectrum = WelchSpectrum(os.path.splitext(output_file)[0] + "_spectrum", output_frame_rate)
+        spectrum = spectrum or None
+        frame_index = 0
+
+        if checkpoint_interval and out.state is not None:
+            # Restore the reference model and continue after the last checkpointed frame
+            frame_index = out.state["frame_index"]
+            reference_frame_bw = previous_reference_frame_bw = out.state["reference"]
+            static_gate = out.state["static_gate"]
+            auto_gain = out.state["auto_gain"]
+            if spectrum is not None:
+                print("Warning: The spectrum is not checkpointed; it only covers the frames processed after the resume.")
+            video.set(cv.CAP_PROP_POS_FRAMES, frame_index * stride)
+            if int(video.get(cv.CAP_PROP_POS_FRAMES)) != frame_index * stride:
+                # Seeking is not frame-accurate for this file; skip ahead by decoding instead
+                video.set(cv.CAP_PROP_POS_FRAMES, 0)
+                for _ in range(frame_index * stride):
+                    video.grab()
+
+        # Frames skipped by the stride are grabbed but never retrieved
+        for frame in read_frames(video, stride):
+            # Convert the current frame to grayscale
+            frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+
+            # Register the frame to the current reference before it is blended in or differenced
+            if stabilizer is not None and reference_frame_bw is not None:
+                frame_bw = stabilizer.stabilize(frame_bw, reference_frame_bw)
+
+            # Per-pixel spectra of the (stabilized) frames
+            if spectrum is not None:
+                spectrum.add(frame_bw)
+
+            # Update the reference frame every 'update_interval' frames
+            if frame_index % update_interval == 0:
+                if previous_reference_frame_bw is None:
+                    # If this is the first reference frame, just assign it
+                    reference_frame_bw = frame_bw
+                else:
+                    # Blend the current reference frame with the previous one
+                    reference_frame_bw = cv.addWeighted(frame_bw, blend_factor, previous_reference_frame_bw, 1 - blend_factor, 0)
+
+            # Ensure the reference frame exists before computing the difference
+            if reference_frame_bw is not None:
+                # Reuse the previous output and skip the expensive stages when the frame is static
+                diff_colored = static_gate.check(frame_bw, reference_frame_bw)
+                if diff_colored is None:
+                    if lut is not None:
+                        # Difference, blur, gain and colormap in one tiled pass
+                        diff_colored = bos_fused(frame_bw, reference_frame_bw, gain, lut=lut)
+                    else:
+                        if ratio:
+                            # Normalized ratio; the reference reciprocal is cached until the reference changes
+                            diff = ratio_background.ratio8(frame_bw, reference_frame_bw)
+                        else:
+                            # Compute the absolute difference
+                            diff = cv.absdiff(frame_bw, reference_frame_bw)
+
+                        # Smooth the difference image and amplify intensity
+                        diff_smoothed = cv.medianBlur(diff, 5)
+                        if auto_gain is not None:
+                            # Map the recent high percentile of the difference to full scale
+                            gain = auto_gain.update(diff_smoothed)
+                        diff_amplified = cv.multiply(diff_smoothed, gain)
+
+                        # Apply a color map for visualization
+                        diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+                    static_gate.store(diff_colored)
+
+                # Write the processed frame to the output video
+                out.write(diff_colored)
+
+                # Optionally display the result
+                if display:
+                    cv.imshow("BOS Effect", diff_colored)
+                    if cv.waitKey(1) == 27:  # ESC key to exit display
+                        break
+
+            # Store the current reference frame for the next iteration
+            previous_reference_frame_bw = reference_frame_bw
+
+            # Increment the frame counter
+            frame_index += 1
+
+            if checkpoint_interval:
+                out.step(lambda: {"frame_index": frame_index, "reference": reference_frame_bw,
+                                  "static_gate": static_gate, "auto_gain": auto_gain})
+
+            if frame_index % 100 == 0:
+                print(f"Processed {frame_index}/{frame_count} frames...")
 
-        # Increment the frame counter
-        frame_index += 1
+        if static_threshold is not None:
+            print(static_gate.report())
+        if spectrum is not None:
+            spectrum.close()
 
-        if frame_index % 100 == 0:
-            print(f"Processed {frame_index}/{frame_count} frames...")
+    if auto_gain is not None:
+        print(f"Final automatic gain: {auto_gain.gain:.2f}")
 
     # Release resources
     video.release()
     out.release()
-    cv.destroyAllWindows()
+    if display:
+        cv.destroyAllWindows()  # not available in headless OpenCV builds
     print(f"BOS video saved as {output_file}")
 
 
-# Example usage
-image_folder = "C001H001S0002 50 CM"  # Folder containing image sequence
-temp_video_path = "50_CM_Video.mp4"  # Temporary video file
-bos_video_path = "50_CM_Video_BOS.mp4"  # Final BOS video file
-frame_rate = 30  # Adjust as per your image sequence
+# Example usage (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    image_folder = "C001H001S0002 50 CM"  # Folder containing image sequence
+    temp_video_path = "50_CM_Video.mp4"  # Temporary video file
+    bos_video_path = "50_CM_Video_BOS.mp4"  # Final BOS video file
+    frame_rate = 30  # Adjust as per your image sequence
 
-# Step 1: Convert images to video
-video_path = images_to_video(image_folder, temp_video_path, frame_rate)
+    # Step 1: Convert images to video
+    video_path = images_to_video(image_folder, temp_video_path, frame_rate)
 
-# Step 2: Perform BOS processing on the video
-if video_path:
-    bos_from_video(video_path, bos_video_path, gain=10, update_interval=16607, blend_factor=1, display=True)
+    # Step 2: Perform BOS processing on the video
+    if video_path:
+        bos_from_video(video_path, bos_video_path, gain=10, update_interval=16607, blend_factor=1, display=True)
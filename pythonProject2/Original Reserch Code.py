@@ -1,16 +1,36 @@
 import cv2 as cv
 import numpy as np
+from BOS_AutoGain import AutoGain
+from BOS_Export import SequenceExporter
+from BOS_Pacing import FrameScheduler
+from BOS_Startup import StartupTimer
+from BOS_Static import StaticFrameGate
 
 
-def schlieren_cam(channel=0, gain=5, delay=100):
+def schlieren_cam(channel=0, gain=5, delay=100, fps=None, static_threshold=None, auto_gain=False, export_dir=None,
+                  export_format="png", export_compression=3):
     """
     Runs a synthetic schlieren system using a webcam.
 
     Parameters:
         channel (int): Camera channel to use.
         gain (int): Gain factor to amplify the intensity of difference images.
-        delay (int): Delay in milliseconds between frames.
+        delay (int): Frame period in milliseconds, used when neither `fps` nor the source gives a frame rate.
+        fps (float): Target frame rate (defaults to the source FPS). Processing and display are skipped
+            when the loop falls behind. Playback runs at the source FPS.
+        static_threshold (float): `BOS_Static.StaticFrameGate` threshold (None disables the gate).
+        auto_gain (bool): Choose the gain automatically so the 99.5th percentile of the smoothed difference maps to
+            full scale, from a subsampled histogram averaged over recent frames (`gain` is the starting value).
+            Pass a `BOS_AutoGain.AutoGain` to tune it.
+        export_dir (str): If set, also write every processed frame (at processing resolution) to this folder as a
+            lossless numbered image sequence, encoded by a thread pool (see `BOS_Export.SequenceExporter`).
+            Frames are dropped from the export, never from the display, when the encoders fall behind.
+        export_format (str): "png" or "tif".
+        export_compression (int): PNG compression level (0-9); for TIFF, 0 is uncompressed and anything else LZW.
     """
+    # Time the start-up until the first processed frame
+    startup = StartupTimer()
+
     # Open the video file or webcam
     webcam = cv.VideoCapture('Hair Dryer  - original video.mp4')
     if not webcam.isOpened():
@@ -33,6 +53,22 @@ def schlieren_cam(channel=0, gain=5, delay=100):
     display_width = 1920
     display_height = 1080
 
+    # Pace the loop against a target frame period instead of a fixed delay
+    target_fps = fps or webcam.get(cv.CAP_PROP_FPS) or 1000.0 / delay
+    scheduler = FrameScheduler(target_fps, live=False)
+
+    # Early-out for frames without flow
+    static_gate = StaticFrameGate(static_threshold)
+
+    # Automatic gain from the recent high percentile of the difference
+    auto_gain = AutoGain(gain=gain) if auto_gain is True else auto_gain or None
+
+    # Lossless sequence export and Enter snapshots are encoded in background threads
+    if export_dir:
+        exporter = SequenceExporter(export_dir, "schlieren", export_format, export_compression)
+    else:
+        exporter = SequenceExporter(".", workers=1)  # snapshots only
+
     # Loop for video stream processing
     while True:
         ret, frame = webcam.read()
@@ -40,37 +76,60 @@ def schlieren_cam(channel=0, gain=5, delay=100):
             print("Error: Could not read a frame from the webcam.")
             break
 
-        # Convert current frame to grayscale
-        frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        # Skip processing and display (never capture) when behind schedule
+        if scheduler.should_process():
+            # Convert current frame to grayscale
+            frame_bw = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+
+            # Reuse the previous output and skip the expensive stages when the frame is static
+            diff_resized = static_gate.check(frame_bw, first_frame_bw)
+            if diff_resized is None:
+                # Compute the difference
+                diff = cv.absdiff(frame_bw, first_frame_bw)
 
-        # Compute the difference
-        diff = cv.absdiff(frame_bw, first_frame_bw)
+                # Apply a blur and amplify intensity
+                diff_smoothed = cv.medianBlur(diff, 5)
+                if auto_gain is not None:
+                    gain = auto_gain.update(diff_smoothed)
+                diff_amplified = cv.multiply(diff_smoothed, gain)
 
-        # Apply a blur and amplify intensity
-        diff_smoothed = cv.medianBlur(diff, 5)
-        diff_amplified = cv.multiply(diff_smoothed, gain)
+                # Apply a color map for better visualization
+                diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
 
-        # Apply a color map for better visualization
-        diff_colored = cv.applyColorMap(diff_amplified, cv.COLORMAP_JET)
+                # Resize the frame to fit the screen (1920x1080) while maintaining the aspect ratio
+                diff_resized = cv.resize(diff_colored, (display_width, display_height), interpolation=cv.INTER_LINEAR)
+                static_gate.store(diff_resized)
 
-        # Resize the frame to fit the screen (1920x1080) while maintaining the aspect ratio
-        diff_resized = cv.resize(diff_colored, (display_width, display_height), interpolation=cv.INTER_LINEAR)
+            # Queue the full-resolution frame for export (the latest computed one if this frame was static)
+            if export_dir:
+                exporter.write(diff_colored)
 
-        # Display the resized frame (entire frame, no cropping)
-        cv.imshow('Schlieren Effect', diff_resized)
+            # Display the resized frame (entire frame, no cropping)
+            cv.imshow('Schlieren Effect', diff_resized)
+            startup.frame_processed()
 
         # Capture key events
-        key = cv.waitKey(delay)
+        key = scheduler.wait_key()
         if key == 27:  # ESC key to exit
             break
         elif key == 13:  # Enter key to save the frame
-            cv.imwrite(f'schlieren_frame_{cv.getTickCount()}.jpg', diff_resized)
-            print("Frame saved.")
+            if exporter.save(f'schlieren_frame_{cv.getTickCount()}.jpg', diff_resized):
+                print("Frame saved.")
+            else:
+                print("Frame not saved: the encoders are still busy.")
+
+    print(scheduler.report())
+    if static_threshold is not None:
+        print(static_gate.report())
+    exporter.close()
+    if export_dir:
+        print(exporter.report())
 
     # Release resources
     webcam.release()
     cv.destroyAllWindows()
 
 
-# Run the schlieren system
-schlieren_cam(channel=0, gain=5, delay=5)
+# Run the schlieren system (only when run as a script, so the module can be imported)
+if __name__ == "__main__":
+    schlieren_cam(channel=0, gain=5, delay=5)
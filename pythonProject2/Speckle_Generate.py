@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
 import random
 import cv2  # Ensure you have OpenCV installed for circle drawing
 
@@ -87,7 +85,8 @@ def main():
     # Generate the speckle pattern
     speckle_pattern = generate_speckle_pattern((width_pixels, height_pixels), dot_diameter_pixels, dot_spacing_pixels)
 
-    # Convert the pattern into an image
+    # Convert the pattern into an image (PIL is only needed here, so import it lazily)
+    from PIL import Image
     speckle_image = Image.fromarray(speckle_pattern)
 
     # Save and show the speckle pattern
@@ -0,0 +1,77 @@
+import os
+import cv2 as cv
+import numpy as np
+import pytest
+from Oprimized_BOS_Frame_By_Frame import bos_from_images
+
+
+class _Crash(Exception):
+    pass
+
+
+def _write_images(folder, count=20, size=(48, 64)):
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, size + (3,), dtype=np.uint8)
+    for i in range(count):
+        frame = np.roll(background, i % 5, axis=1)
+        cv.imwrite(os.path.join(folder, f"frame_{i:03d}.png"), frame)
+
+
+def _read_video(path):
+    video = cv.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = video.read()
+        if not ret:
+            break
+        frames.append(frame)
+    video.release()
+    return frames
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path, monkeypatch):
+    images = tmp_path / "images"
+    images.mkdir()
+    _write_images(str(images))
+    options = dict(gain=10, reference_interval=2, blend_factor=0.4, start_frame=1, checkpoint_interval=4)
+
+    full_path = str(tmp_path / "full.mp4")
+    bos_from_images(str(images), full_path, **options)
+
+    # Crash in the middle of the third segment, after two checkpoints
+    calls = []
+    median_blur = cv.medianBlur
+
+    def crashing_median_blur(*args, **kwargs):
+        calls.append(None)
+        if len(calls) > 10:
+            raise _Crash()
+        return median_blur(*args, **kwargs)
+
+    resumed_path = str(tmp_path / "resumed.mp4")
+    monkeypatch.setattr(cv, "medianBlur", crashing_median_blur)
+    with pytest.raises(_Crash):
+        bos_from_images(str(images), resumed_path, **options)
+    monkeypatch.setattr(cv, "medianBlur", median_blur)
+    assert os.path.exists(resumed_path + ".ckpt")
+
+    bos_from_images(str(images), resumed_path, resume=True, **options)
+    assert not os.path.exists(resumed_path + ".ckpt")
+
+    full, resumed = _read_video(full_path), _read_video(resumed_path)
+    assert len(full) == len(resumed) == 19
+    assert all(np.array_equal(a, b) for a, b in zip(full, resumed))
+
+
+@pytest.mark.parametrize("path_option", [dict(block_size=8), dict(tile_size=32), dict(cache_dir="cache")])
+def test_checkpoints_are_rejected_off_the_per_frame_path(tmp_path, path_option):
+    images = tmp_path / "images"
+    images.mkdir()
+    _write_images(str(images), count=4)
+    if "cache_dir" in path_option:
+        path_option = dict(cache_dir=str(tmp_path / "cache"))
+
+    output_path = str(tmp_path / "out.mp4")
+    assert bos_from_images(str(images), output_path, checkpoint_interval=2, **path_option) is None
+    assert not os.path.exists(output_path)
+    assert not os.path.exists(output_path + ".ckpt")
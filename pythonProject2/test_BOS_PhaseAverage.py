@@ -0,0 +1,28 @@
+import numpy as np
+from BOS_PhaseAverage import estimate_frequency, phase_bin, unfold_frequency
+
+
+def _bins(frequency, frame_rate, frames, bins):
+    return np.array([phase_bin(n, frequency, frame_rate, bins) for n in range(frames)])
+
+
+def test_folded_alias_reverses_and_unfolding_restores_bin_order():
+    frame_rate, true_frequency, frames, bins = 240.0, 125.0, 512, 12
+    signal = np.sin(2 * np.pi * true_frequency * np.arange(frames) / frame_rate)
+    true_bins = _bins(true_frequency, frame_rate, frames, bins)
+
+    alias = estimate_frequency(signal, frame_rate)
+    assert abs(alias - (frame_rate - true_frequency)) < 0.05
+
+    # The folded alias runs through the phases backwards
+    alias_bins = _bins(alias, frame_rate, frames, bins)
+    assert np.mean(alias_bins == true_bins) < 0.2
+    step = (np.diff(alias_bins) % bins).mean()
+    assert abs(step - (-(true_frequency / frame_rate) * bins) % bins) < 1.0
+
+    # Unfolded with the nominal frequency, the bins match the true ones
+    unfolded = unfold_frequency(alias, frame_rate, 124.0)
+    assert abs(unfolded - true_frequency) < 0.05
+    # (the small estimation error lets the phase drift by at most one bin over the record)
+    distance = np.abs(_bins(unfolded, frame_rate, frames, bins) - true_bins)
+    assert np.all(np.minimum(distance, bins - distance) <= 1)